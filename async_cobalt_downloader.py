@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+نسخة غير متزامنة من معالج Cobalt تعمل داخل حلقة الأحداث
+Native asyncio Cobalt backend (httpx) with task cancellation
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple, Union
+
+import httpx
+
+from config import (
+    SOCKET_TIMEOUT, MAX_FILE_SIZE, HTTP_POOL_SIZE, PICKER_CONCURRENCY, TIKTOK_SLIDESHOW_AUDIO,
+)
+from cobalt_downloader import CobaltDownloader, cobalt_pool
+from cobalt_pool import CobaltInstance, CobaltPool
+from disk_cache import DiskMediaCache, media_cache
+from download_executor import DownloadExecutor
+from hedged_race import wait_for_guard_async
+from media_probe import MediaTooLargeError
+from media_stream import StreamedMedia
+from media_album import MediaAlbum
+from url_router import URLRouter
+from job_workspace import job_folder
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCobaltDownloader:
+    """
+    تنزيل عبر Cobalt بدون خيط لكل مهمة
+
+    طلب API وقراءة جسم الملف (tunnel/redirect) يتمان عبر httpx.AsyncClient
+    مشترك، فتعمل عدة تنزيلات بالتوازي داخل حلقة الأحداث نفسها. اختيار
+    الخادم وقاطع الدائرة من نفس مجموعة خوادم CobaltDownloader. الإلغاء يتم
+    بإلغاء المهمة: الاتصال يُغلق فوراً والملف الجزئي يُحذف.
+    """
+
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, pool: CobaltPool = cobalt_pool, timeout: float = SOCKET_TIMEOUT):
+        self.pool = pool
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # يُنشأ عند أول استخدام داخل حلقة الأحداث
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=HTTP_POOL_SIZE * 4,
+                                    max_keepalive_connections=HTTP_POOL_SIZE),
+                headers={'User-Agent': CobaltDownloader.USER_AGENT},
+            )
+        return self._client
+
+    @staticmethod
+    def _is_instance_failure(error: BaseException) -> bool:
+        """مثل CobaltDownloader._is_instance_failure لأخطاء httpx"""
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            return status >= 500 or status == 429
+        return isinstance(error, (httpx.TransportError, ValueError))
+
+    async def _post(self, api_url: str, url: str, download_mode: str) -> Dict[str, Any]:
+        response = await self._get_client().post(
+            api_url,
+            json=CobaltDownloader._payload(url, download_mode),
+            headers=CobaltDownloader._api_headers(),
+        )
+        response.raise_for_status()
+        data = response.json()
+        logger.info(f"استجابة Cobalt: {data.get('status')}")
+        return data
+
+    async def _request(self, instance: CobaltInstance, url: str, download_mode: str) -> Dict[str, Any]:
+        return await instance.request_async(
+            self._post, url, download_mode, is_failure=self._is_instance_failure
+        )
+
+    async def download(self, url: str, download_mode: str = "auto",
+                       max_bytes: int = MAX_FILE_SIZE) -> Union[str, MediaAlbum]:
+        """
+        تنزيل إلى ملف داخل مجلد المهمة الحالية
+
+        Returns:
+            str: مسار الملف المحفوظ (أو MediaAlbum لاستجابة picker)
+
+        Raises:
+            MediaTooLargeError: إذا تجاوز الحجم max_bytes
+            CircuitOpenError: إذا كانت جميع الخوادم مستبعدة
+            Exception: إذا فشل التنزيل
+        """
+        started = time.perf_counter()
+        async with self.pool.acquire_async() as instance:
+            data = await self._request(instance, url, download_mode)
+            # طلب API يعمل بالتوازي مع فحص الحجم، وقراءة البايتات تنتظر نجاحه
+            if data.get('status') == 'picker':
+                await wait_for_guard_async()
+                return await self._download_picker(data, url, max_bytes)
+
+            download_url, filename = CobaltDownloader._resolve_target(data)
+            await wait_for_guard_async()
+            save_path = os.path.join(job_folder(), filename)
+            written = await self._fetch_to_file(download_url, save_path, url, max_bytes)
+
+        logger.info(
+            f"⬇️ Cobalt (async) {written} بايت في {time.perf_counter() - started:.2f}s: {save_path}"
+        )
+        return save_path
+
+    async def _fetch_to_file(self, download_url: str, save_path: str, referer: str,
+                             max_bytes: Optional[int]) -> int:
+        """قراءة الرابط إلى ملف (.part ثم إعادة تسمية) وإرجاع عدد البايتات"""
+        # اسم جزئي فريد: عدة مهام في نفس الحلقة قد تنزل نفس الاسم
+        part_path = f'{save_path}.{uuid.uuid4().hex[:8]}.part'
+        written = 0
+        try:
+            async with self._get_client().stream(
+                'GET', download_url, headers={'Referer': referer}
+            ) as response:
+                response.raise_for_status()
+                length = response.headers.get('Content-Length')
+                if max_bytes is not None and length and length.isdigit() and int(length) > max_bytes:
+                    raise MediaTooLargeError(int(length), max_bytes)
+
+                with open(part_path, 'wb') as f:
+                    async for chunk in response.aiter_bytes(self.READ_SIZE):
+                        written += len(chunk)
+                        if max_bytes is not None and written > max_bytes:
+                            raise MediaTooLargeError(written, max_bytes)
+                        f.write(chunk)
+            os.replace(part_path, save_path)
+        except BaseException:
+            # يشمل CancelledError عند إلغاء المهمة
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        return written
+
+    async def _download_picker(self, data: Dict[str, Any], url: str,
+                               max_bytes: Optional[int]) -> MediaAlbum:
+        """تنزيل جميع عناصر picker بالتوازي (بحد PICKER_CONCURRENCY) في مجلد المهمة"""
+        picker_items = [item for item in data.get('picker', []) if item.get('url')]
+        if not picker_items:
+            raise Exception("لا توجد عناصر في picker")
+
+        sources = [(item['url'], item.get('type', 'photo')) for item in picker_items]
+        # موسيقى شرائح تيك توك (اختيارية)
+        if data.get('audio') and TIKTOK_SLIDESHOW_AUDIO:
+            sources.append((data['audio'], 'audio'))
+
+        album = MediaAlbum.create('picker')
+        semaphore = asyncio.Semaphore(PICKER_CONCURRENCY)
+
+        async def fetch(index: int, item_url: str, item_type: str) -> str:
+            async with semaphore:
+                save_path = album.item_path(index, item_type)
+                await self._fetch_to_file(item_url, save_path, url, max_bytes)
+                return save_path
+
+        try:
+            results = await asyncio.gather(
+                *[fetch(index, item_url, item_type) for index, (item_url, item_type) in enumerate(sources)],
+                return_exceptions=True
+            )
+            for index, ((_, item_type), result) in enumerate(zip(sources, results)):
+                if isinstance(result, Exception):
+                    # عنصر فاشل لا يُسقط بقية الألبوم
+                    logger.warning(f"فشل تنزيل عنصر picker رقم {index + 1}: {str(result)}")
+                elif isinstance(result, BaseException):
+                    raise result
+                else:
+                    album.add(result, item_type)
+            if not album.items:
+                raise Exception("فشل تنزيل جميع عناصر picker")
+        except BaseException:
+            album.close()
+            raise
+
+        logger.info(f"تم تنزيل {len(album)}/{len(picker_items)} عنصر من picker: {album.directory}")
+        return album
+
+    async def download_stream(self, url: str, download_mode: str = "auto",
+                              max_bytes: int = MAX_FILE_SIZE) -> Union[StreamedMedia, MediaAlbum]:
+        """
+        تنزيل إلى مخزن مؤقت محدود للرفع المباشر
+
+        Returns:
+            StreamedMedia: المحتوى جاهز للرفع (يجب إغلاقه بعد الإرسال)
+            MediaAlbum: لاستجابة picker (عدة ملفات في مجلد المهمة)
+        """
+        async with self.pool.acquire_async() as instance:
+            data = await self._request(instance, url, download_mode)
+            # طلب API يعمل بالتوازي مع فحص الحجم، وقراءة البايتات تنتظر نجاحه
+            if data.get('status') == 'picker':
+                await wait_for_guard_async()
+                return await self._download_picker(data, url, max_bytes)
+
+            download_url, filename = CobaltDownloader._resolve_target(data)
+            await wait_for_guard_async()
+            async with self._get_client().stream(
+                'GET', download_url, headers={'Referer': url}
+            ) as response:
+                response.raise_for_status()
+                return await StreamedMedia.from_async_response(response, filename, max_bytes)
+
+    async def close(self) -> None:
+        """إغلاق عميل HTTP"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# النسخة المشتركة للبوت
+async_cobalt = AsyncCobaltDownloader()
+
+
+class AsyncUniversalDownloader:
+    """واجهة UniversalDownloader غير المتزامنة (مع ذاكرة القرص)"""
+
+    @staticmethod
+    async def _download(url: str, media_kind: str, download_mode: str,
+                        max_bytes: int) -> Tuple[str, str]:
+        key = DiskMediaCache.key_for_url(url, media_kind)
+        filepath = await DownloadExecutor.run_db(media_cache.get, key) if key else None
+        if not filepath:
+            filepath = await async_cobalt.download(url, download_mode, max_bytes)
+            if key:
+                filepath = await DownloadExecutor.run_db(media_cache.put, key, filepath)
+        return filepath, URLRouter.get_platform_name(url)
+
+    @staticmethod
+    async def download_video(url: str, max_bytes: int = MAX_FILE_SIZE) -> Tuple[str, str]:
+        """تنزيل فيديو من أي منصة"""
+        return await AsyncUniversalDownloader._download(url, 'video', 'auto', max_bytes)
+
+    @staticmethod
+    async def download_audio(url: str, max_bytes: int = MAX_FILE_SIZE) -> Tuple[str, str]:
+        """تنزيل صوت/موسيقى من أي منصة"""
+        return await AsyncUniversalDownloader._download(url, 'audio', 'audio', max_bytes)
+
+    @staticmethod
+    async def download_image(url: str, max_bytes: int = MAX_FILE_SIZE) -> Tuple[str, str]:
+        """تنزيل صورة من أي منصة"""
+        return await AsyncUniversalDownloader._download(url, 'photo', 'auto', max_bytes)
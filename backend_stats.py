@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ترتيب طرق التنزيل حسب نجاحها وسرعتها الفعلية
+Adaptive backend ordering from live success and latency statistics
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Tuple
+
+from config import BACKEND_STATS_WINDOW, BACKEND_MIN_SAMPLES, BACKEND_RETRY_AFTER
+from hedged_race import DownloadCancelled
+
+logger = logging.getLogger(__name__)
+
+# (المنصة، نوع الوسائط، الطريقة)
+BackendKey = Tuple[str, str, str]
+
+
+class BackendScoreboard:
+    """
+    نافذة منزلقة لنتائج كل طريقة تنزيل
+
+    الطرق تُرتب حسب الزمن المتوقع حتى النجاح (متوسط الزمن ÷ نسبة النجاح
+    مع تنعيم حتى لا تُحكم طريقة جديدة من محاولة واحدة). الطريقة التي فشلت
+    في آخر BACKEND_MIN_SAMPLES محاولات تُتخطى، وتُجرب مرة واحدة كل
+    BACKEND_RETRY_AFTER ثانية لاكتشاف عودتها للعمل.
+    """
+
+    # الزمن الافتراضي لطريقة بدون عينات (ثانية)
+    PRIOR_LATENCY = 1.0
+
+    def __init__(self, window: int = BACKEND_STATS_WINDOW,
+                 min_samples: int = BACKEND_MIN_SAMPLES,
+                 retry_after: float = BACKEND_RETRY_AFTER):
+        self.window = window
+        self.min_samples = min_samples
+        self.retry_after = retry_after
+        self._results: Dict[BackendKey, Deque[Tuple[bool, float]]] = {}
+        self._last_attempt: Dict[BackendKey, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, platform: str, kind: str, method: str, success: bool, latency: float) -> None:
+        """تسجيل نتيجة محاولة"""
+        key = (platform, kind, method)
+        with self._lock:
+            self._results.setdefault(key, deque(maxlen=self.window)).append((success, latency))
+            self._last_attempt[key] = time.monotonic()
+
+    def _cost(self, key: BackendKey) -> float:
+        results = self._results.get(key, ())
+        successes = sum(1 for success, _ in results if success)
+        success_rate = (successes + 1) / (len(results) + 2)
+        if results:
+            latency = sum(latency for _, latency in results) / len(results)
+        else:
+            latency = self.PRIOR_LATENCY
+        return latency / success_rate
+
+    def _is_broken(self, key: BackendKey) -> bool:
+        results = self._results.get(key, ())
+        if len(results) < self.min_samples:
+            return False
+        recent = list(results)[-self.min_samples:]
+        if any(success for success, _ in recent):
+            return False
+        # وقت تجربة الاسترداد
+        return time.monotonic() - self._last_attempt.get(key, 0) < self.retry_after
+
+    def order(self, platform: str, kind: str, methods: List[str]) -> List[str]:
+        """
+        ترتيب الطرق من الأفضل إلى الأسوأ مع تخطي المعطلة
+
+        إذا كانت كل الطرق معطلة تُعاد جميعها مرتبة (لا يُرفض الطلب بدون محاولة).
+        """
+        with self._lock:
+            ranked = sorted(
+                methods,
+                key=lambda m: (self._cost((platform, kind, m)), methods.index(m))
+            )
+            healthy = [m for m in ranked if not self._is_broken((platform, kind, m))]
+        return healthy or ranked
+
+    def run(self, platform: str, kind: str, methods: List[Tuple[str, Callable[[], Any]]]) -> Any:
+        """
+        تجربة الطرق بالترتيب المتكيف وإرجاع أول نتيجة غير فارغة
+
+        Args:
+            platform: المنصة
+            kind: نوع الوسائط
+            methods: قائمة (اسم الطريقة، دالة بدون معاملات)
+
+        Returns:
+            أول نتيجة ناجحة
+
+        Raises:
+            Exception: إذا فشلت جميع الطرق
+        """
+        funcs = dict(methods)
+        order = self.order(platform, kind, [name for name, _ in methods])
+        skipped = [name for name in funcs if name not in order]
+        if skipped:
+            logger.info(f"⏭️ تخطي طرق معطلة ({platform}/{kind}): {', '.join(skipped)}")
+
+        last_error = None
+        for name in order:
+            started = time.monotonic()
+            try:
+                result = funcs[name]()
+            except DownloadCancelled:
+                raise
+            except Exception as e:
+                result = None
+                last_error = e
+                logger.warning(f"فشل {name}: {str(e)}")
+
+            self.record(platform, kind, name, bool(result), time.monotonic() - started)
+            if result:
+                return result
+
+        raise Exception(f"فشلت جميع الطرق ({platform}/{kind})"
+                        + (f": {str(last_error)}" if last_error else ""))
+
+    def get_stats(self) -> Dict[str, dict]:
+        """نسبة النجاح ومتوسط الزمن لكل طريقة"""
+        with self._lock:
+            stats = {}
+            for key, results in self._results.items():
+                successes = sum(1 for success, _ in results if success)
+                stats['/'.join(key)] = {
+                    'samples': len(results),
+                    'success_rate': successes / len(results),
+                    'avg_latency': sum(latency for _, latency in results) / len(results),
+                    'broken': self._is_broken(key),
+                }
+        return stats
+
+
+# السجل المشترك لجميع المعالجات
+backend_stats = BackendScoreboard()
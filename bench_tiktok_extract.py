@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+قياس أداء استخراج شرائح تيك توك: المسار المباشر مقارنة بالبحث العميق القديم
+TikTok slide extraction benchmark (time and peak memory)
+
+الاستخدام:
+    python3 bench_tiktok_extract.py [عدد التكرارات]
+"""
+
+import os
+import sys
+import json
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from tiktok_page import TikTokPage
+from tiktok_photo_api import TikTokPhotoDownloader
+
+
+def build_page(slides: int, related: int) -> str:
+    """
+    صفحة بنفس بنية __UNIVERSAL_DATA_FOR_REHYDRATION__ في تيك توك
+
+    المنشور نفسه صغير؛ معظم حجم الصفحة الحقيقية بيانات المستخدم والمنشورات
+    المقترحة والتعليقات، وهي ما يمر عليه البحث العميق.
+    """
+    def image(index: int, tag: str) -> dict:
+        return {
+            'imageURL': {'urlList': [
+                f'https://p16-sign.tiktokcdn.com/{tag}/{index:03d}~tplv-photomode.jpeg',
+                f'https://p19-sign.tiktokcdn.com/{tag}/{index:03d}~tplv-photomode.jpeg',
+            ]},
+            'imageWidth': 1080,
+            'imageHeight': 1440,
+        }
+
+    def item(tag: str, count: int) -> dict:
+        return {
+            'id': tag,
+            'desc': 'x' * 200,
+            'author': {'uniqueId': f'user_{tag}', 'avatarLarger': f'https://p16-sign.tiktokcdn.com/avatar/{tag}.jpeg'},
+            'video': {'cover': f'https://p16-sign.tiktokcdn.com/cover/{tag}.jpeg', 'playAddr': ''},
+            'music': {'playUrl': f'https://sf16-ies-music.tiktokcdn.com/{tag}.mp3', 'coverLarge': f'https://p16-sign.tiktokcdn.com/music/{tag}.jpeg'},
+            'imagePost': {'images': [image(i, tag) for i in range(count)], 'cover': image(0, tag)},
+            'stats': {'diggCount': 1000, 'shareCount': 10, 'commentCount': 100, 'playCount': 100000},
+            'textExtra': [{'hashtagName': f'tag{i}', 'start': i, 'end': i + 4} for i in range(10)],
+        }
+
+    data = {
+        '__DEFAULT_SCOPE__': {
+            'webapp.app-context': {'language': 'en', 'region': 'US', 'user': {}},
+            'webapp.user-detail': {'userInfo': item('profile', 0)},
+            'webapp.video-detail': {
+                'itemInfo': {'itemStruct': item('post', slides)},
+                'shareMeta': {'title': 'TikTok', 'desc': 'y' * 300},
+            },
+            'webapp.related-items': {'itemList': [item(f'related{i}', 4) for i in range(related)]},
+        }
+    }
+    return (
+        '<html><head></head><body>'
+        '<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">'
+        f'{json.dumps(data)}</script></body></html>'
+    )
+
+
+def legacy_extract(obj, depth=0, max_depth=15):
+    """البحث العميق القديم: قائمة جديدة لكل مستوى ثم list(set(...))"""
+    images = []
+    if depth > max_depth:
+        return images
+    if isinstance(obj, dict):
+        for field in TikTokPhotoDownloader.IMAGE_FIELDS:
+            if field in obj:
+                value = obj[field]
+                if isinstance(value, str) and ('http' in value or 'cdn' in value):
+                    images.append(value)
+                elif isinstance(value, list):
+                    for item in value:
+                        if isinstance(item, str) and ('http' in item or 'cdn' in item):
+                            images.append(item)
+        for value in obj.values():
+            images.extend(legacy_extract(value, depth + 1, max_depth))
+    elif isinstance(obj, list):
+        for item in obj:
+            images.extend(legacy_extract(item, depth + 1, max_depth))
+    return list(set(images))
+
+
+def generic_walk(data):
+    """البحث العام الجديد وحده (المسار الاحتياطي)"""
+    found = {}
+    TikTokPhotoDownloader._walk_images(data, 0, 15, found)
+    return list(found)
+
+
+def peak_kib(func) -> float:
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def run(number: int) -> None:
+    for slides, related in [(10, 20), (35, 120)]:
+        html = build_page(slides, related)
+        data = TikTokPage('0', '', html).rehydration
+
+        print(f"📊 صفحة {len(html) / 1024:.0f} KiB: {slides} شريحة، {related} منشور مقترح")
+        for label, func in [
+            ("legacy walk", lambda: legacy_extract(data)),
+            ("generic walk (fallback)", lambda: generic_walk(data)),
+            ("targeted path", lambda: TikTokPhotoDownloader._extract_images_from_json(data)),
+        ]:
+            seconds = timeit.timeit(func, number=number) / number
+            print(f"  {label:<26} {seconds * 1e3:9.3f} ms   ذروة {peak_kib(func):8.1f} KiB")
+        print()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
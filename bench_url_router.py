@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+قياس أداء موجّه الروابط مقارنة بالفحص القديم
+URL router micro-benchmark
+
+الاستخدام:
+    python3 bench_url_router.py [عدد التكرارات]
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from url_router import URLRouter
+
+SAMPLE_URLS = [
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42s',
+    'https://youtu.be/dQw4w9WgXcQ?si=abcdef',
+    'https://youtube.com/shorts/aqz-KE-bpKQ?feature=share',
+    'https://music.youtube.com/watch?v=dQw4w9WgXcQ&list=RDAMVM',
+    'https://www.tiktok.com/@someone/video/7301234567890123456?is_from_webapp=1',
+    'https://www.tiktok.com/@someone/photo/7301234567890123457',
+    'https://vm.tiktok.com/ZMabcdEF/',
+    'https://www.instagram.com/reel/C1a2b3c4d5e/?igsh=xyz',
+    'https://www.instagram.com/p/C1a2b3c4d5e/',
+    'https://www.instagram.com/stories/someone/3245678901234567890/',
+]
+
+
+def legacy_parse(url: str):
+    """المسار القديم: فحص نصي لكل منصة ثم أنماط غير مُجمّعة لكل مستخرج"""
+    if 'youtube.com' in url or 'youtu.be' in url:
+        platform = 'youtube'
+        match = re.search(r'(?:v=|youtu\.be/|shorts/)([A-Za-z0-9_-]{11})', url)
+    elif 'tiktok.com' in url or 'vm.tiktok.com' in url or 'vt.tiktok.com' in url:
+        platform = 'tiktok'
+        match = None
+        for pattern in [r'/photo/(\d+)', r'/video/(\d+)', r'tiktok\.com/.*?(\d{15,})']:
+            match = re.search(pattern, url)
+            if match:
+                break
+    elif 'instagram.com' in url or 'ig.me' in url:
+        platform = 'instagram'
+        match = None
+        for pattern in [r'/p/([A-Za-z0-9_-]+)', r'/reel/([A-Za-z0-9_-]+)', r'/tv/([A-Za-z0-9_-]+)']:
+            match = re.search(pattern, url)
+            if match:
+                break
+    else:
+        return None
+    return platform, match.group(1) if match else None
+
+
+def legacy_request(url: str):
+    """محاكاة طلب واحد في المسار القديم: عدة فحوصات وتحليلات متكررة للرابط"""
+    legacy_parse(url)   # _detect_media_type
+    legacy_parse(url)   # is_valid_url / download_*
+    legacy_parse(url)   # UniversalDownloader: تحديد المنصة
+    legacy_parse(url)   # extract_post_id داخل المعالج
+
+
+def router_request(url: str):
+    """نفس الطلب عبر الموجّه (التحليل الأول فقط يكلف، البقية من الذاكرة)"""
+    for _ in range(4):
+        URLRouter.parse(url)
+
+
+def run(number: int) -> None:
+    def bench(label, func):
+        seconds = timeit.timeit(lambda: [func(u) for u in SAMPLE_URLS], number=number)
+        per_call = seconds / (number * len(SAMPLE_URLS)) * 1e6
+        print(f"{label:<36} {per_call:8.2f} µs/رابط")
+
+    print(f"📊 {len(SAMPLE_URLS)} روابط × {number} تكرار\n")
+    bench("legacy parse (مرة واحدة)", legacy_parse)
+    bench("router parse بدون ذاكرة", URLRouter.parse.__wrapped__)
+    bench("legacy request (4 تحليلات)", legacy_request)
+    bench("router request (4 تحليلات)", router_request)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -6,20 +6,41 @@
 Telegram Bot with PayPal Subscription System
 """
 
+import asyncio
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import re
+import concurrent.futures
+from telegram import (
+    Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile,
+    InputMediaPhoto, InputMediaVideo,
+)
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, 
     CallbackQueryHandler, ContextTypes, filters
 )
-from datetime import datetime
+from typing import Optional, Tuple
 import os
 from dotenv import load_dotenv
 
 from downloader import MediaDownloader
 from database_models import Database
 from paypal_payment_system import PayPalPaymentManager
-from cobalt_downloader import CobaltDownloader, UniversalDownloader
+from cobalt_downloader import CobaltDownloader, UniversalDownloader, cobalt_pool
+from async_cobalt_downloader import AsyncUniversalDownloader, async_cobalt
+from download_executor import DownloadExecutor
+from job_scheduler import PriorityJobScheduler
+import config
+from config import SUPPORTED_PLATFORMS
+from disk_cache import DiskMediaCache, media_cache
+from single_flight import SingleFlight
+from url_router import URLRouter
+from short_link_resolver import short_link_resolver
+from media_probe import MediaProbe, MediaTooLargeError
+from media_stream import StreamedMedia
+from media_album import MediaAlbum
+from job_workspace import JobWorkspace, WorkspaceJanitor, bind_job_folder, job_folder
+from hedged_race import HedgedRace, DownloadCancelled, bind_guard, current_guard, raise_if_cancelled
+from http_client import http_client
 
 # تحميل المتغيرات
 load_dotenv()
@@ -36,6 +57,21 @@ logger = logging.getLogger(__name__)
 db = Database()
 payment_manager = PayPalPaymentManager(db)
 
+# مجدول التنزيل حسب أولوية الاشتراك
+scheduler = PriorityJobScheduler()
+
+# التنزيلات قيد التنفيذ (لدمج الطلبات المتكررة لنفس الوسائط)
+inflight = SingleFlight()
+
+# السباق المتحوط بين Cobalt و yt-dlp
+race = HedgedRace()
+
+# حذف مجلدات المهام المهجورة
+janitor = WorkspaceJanitor()
+
+# حفظ توسيعات الروابط المختصرة في قاعدة البيانات
+short_link_resolver.bind_database(db)
+
 
 class PayPalSubscriptionBot:
     """بوت تليجرام مع نظام الاشتراكات والدفع عبر PayPal"""
@@ -297,26 +333,31 @@ class PayPalSubscriptionBot:
             parse_mode="Markdown"
         )
     
+    # كلمات تدل على محتوى صوتي في روابط يوتيوب
+    AUDIO_HINT_RE = re.compile(r'music|song|audio', re.IGNORECASE)
+    
     def _detect_media_type(self, url: str) -> str:
         """الكشف عن نوع المحتوى من الرابط"""
-        url_lower = url.lower()
+        descriptor = URLRouter.parse(url)
+        if not descriptor:
+            return 'unknown'
         
         # الكشف عن الصور من انستقرام
-        if MediaDownloader.is_instagram_url(url):
-            if '/p/' in url or '/reel/' in url:
-                return 'video'
-            elif '/stories/' in url:
+        if descriptor.platform == 'instagram':
+            if descriptor.kind == 'story':
                 return 'image'
             return 'video'
         
         # الكشف عن الموسيقى من يوتيوب
-        if MediaDownloader.is_youtube_url(url):
-            if any(word in url_lower for word in ['music', 'song', 'audio', 'playlist']):
+        if descriptor.platform == 'youtube':
+            if descriptor.kind == 'playlist' or self.AUDIO_HINT_RE.search(url):
                 return 'audio'
             return 'video'
         
-        # الكشف عن الموسيقى من تيك توك
-        if MediaDownloader.is_tiktok_url(url):
+        # منشورات الصور (الشرائح) من تيك توك
+        if descriptor.platform == 'tiktok':
+            if descriptor.kind == 'photo':
+                return 'image'
             return 'video'
         
         return 'unknown'
@@ -331,11 +372,11 @@ class PayPalSubscriptionBot:
         if not url or not url.startswith(('http://', 'https://')):
             return
         
-        # التحقق من الاشتراك
-        tier = db.get_subscription_tier(telegram_id)
+        # التحقق من الاشتراك (استعلامات SQLite خارج حلقة الأحداث)
+        tier = await DownloadExecutor.run_db(db.get_subscription_tier, telegram_id)
         
         # التحقق من الحد الأقصى اليومي
-        downloads_today = db.get_user_downloads_today(telegram_id)
+        downloads_today = await DownloadExecutor.run_db(db.get_user_downloads_today, telegram_id)
         
         if tier == "free" and downloads_today >= 5:
             keyboard = [
@@ -360,101 +401,103 @@ class PayPalSubscriptionBot:
             )
             return
         
+        # توسيع روابط تيك توك المختصرة (من الذاكرة للروابط المكررة) لمعرفة معرف الوسائط
+        url = await short_link_resolver.resolve(url)
+        
         # الكشف عن نوع المحتوى
         media_type = self._detect_media_type(url)
         
-        # بدء التنزيل
-        await update.message.reply_text("⏳ جاري التنزيل...")
+        # الرد من ذاكرة file_id إذا سبق رفع نفس الوسائط (بدون تنزيل أو رفع)
+        media_key = URLRouter.get_media_key(url)
+        if media_key and await self._send_cached(update, media_key, media_type):
+            await DownloadExecutor.run_db(db.record_download, telegram_id)
+            logger.info(f"⚡ إرسال من الذاكرة: {media_key} - {telegram_id}")
+            return
+        
+        # الحد الأقصى لحجم الملف حسب خطة الاشتراك (يُفحص قبل التنزيل)
+        max_bytes = MediaProbe.max_bytes_for_tier(tier)
+        
+        # دمج الطلبات المتزامنة لنفس الوسائط في تنزيل واحد
+        flight_key = (media_key or url, media_type)
+        flight, is_leader = inflight.join(flight_key)
+        filename = None
         
         try:
-            filename = None
-            platform = None
-            media_category = None
-            
-            # الطريقة 1: محاولة Cobalt API (الأفضل)
-            try:
-                logger.info("محاولة Cobalt API...")
+            if is_leader:
+                # مجلد مستقل للمهمة يحذفه آخر مشارك في finally
+                flight.workspace = JobWorkspace()
                 
-                if media_type == 'audio':
-                    filename, platform = UniversalDownloader.download_audio(url)
-                    media_category = "موسيقى"
-                elif media_type == 'image':
-                    filename, platform = UniversalDownloader.download_image(url)
-                    media_category = "صورة"
-                else:
-                    filename, platform = UniversalDownloader.download_video(url)
-                    media_category = "فيديو"
+                # إضافة المهمة إلى قائمة الانتظار حسب أولوية الاشتراك
+                job = scheduler.submit(
+                    tier, self._download_media, url, media_type, max_bytes, flight.workspace
+                )
+                flight.future = job.future
                 
-                logger.info(f"نجح Cobalt API: {filename}")
+                # إبلاغ المستخدم بموقعه إذا كان جميع العمال مشغولين
+                waiting = scheduler.position(job) - scheduler.idle_workers()
+                if waiting > 0:
+                    await update.message.reply_text(
+                        f"⏳ طلبك في قائمة الانتظار (الموقع: {waiting})\n"
+                        "سيبدأ التنزيل تلقائياً عند وصول دورك..."
+                    )
+                else:
+                    await update.message.reply_text("⏳ جاري التنزيل...")
+            else:
+                await update.message.reply_text("⏳ جاري التنزيل...")
             
-            except Exception as cobalt_error:
-                logger.warning(f"فشل Cobalt API: {str(cobalt_error)}، محاولة الطرق البديلة...")
-                
-                # الطريقة 2: محاولة MediaDownloader (البديل)
-                # محاولة تنزيل الفيديو أولاً
-                if media_type in ['video', 'unknown']:
-                    try:
-                        filename, platform = MediaDownloader.download_video(url)
-                        media_category = "فيديو"
-                    except Exception as e:
-                        logger.warning(f"فشل تنزيل الفيديو، محاولة الصورة: {str(e)}")
-                        filename = None
-                
-                # محاولة تنزيل الصورة إذا فشل الفيديو
-                if not filename and MediaDownloader.is_instagram_url(url):
-                    try:
-                        filename, platform = MediaDownloader.download_image(url)
-                        media_category = "صورة"
-                    except Exception as e:
-                        logger.warning(f"فشل تنزيل الصورة: {str(e)}")
-                        filename = None
-                
-                # محاولة تنزيل الصوت
-                if not filename:
-                    try:
-                        filename, platform = MediaDownloader.download_audio(url)
-                        media_category = "موسيقى"
-                    except Exception as e:
-                        logger.warning(f"فشل تنزيل الصوت: {str(e)}")
-                        filename = None
+            # التنزيل يعمل على مجمع التنزيل حتى لا يتجمد البوت لبقية المستخدمين
+            filename, platform, media_category = await flight.wait_result()
             
-            # إرسال الملف إذا تم تنزيله بنجاح
-            if filename and os.path.exists(filename):
+            # إرسال الملف إذا تم تنزيله بنجاح (ملف على القرص أو مخزن مؤقت)
+            streamed = isinstance(filename, StreamedMedia)
+            album = isinstance(filename, MediaAlbum)
+            if streamed or album or (filename and os.path.exists(filename)):
+                # الحجم الفعلي قد يتجاوز التقدير (أو لم يتوفر تقدير)
+                file_size = filename.size if streamed or album else os.path.getsize(filename)
+                if file_size > max_bytes:
+                    raise MediaTooLargeError(file_size, max_bytes)
+                
                 # تسجيل التنزيل
-                db.record_download(telegram_id)
+                await DownloadExecutor.run_db(db.record_download, telegram_id)
                 
                 # إرسال الملف بناءً على نوعه
                 try:
-                    with open(filename, 'rb') as file:
-                        if media_category == "صورة":
-                            await update.message.reply_photo(
-                                photo=file,
-                                caption=f"✅ تم التنزيل من {platform}"
-                            )
-                        elif media_category == "موسيقى":
-                            await update.message.reply_audio(
-                                audio=file,
-                                caption=f"✅ تم التنزيل من {platform}"
-                            )
-                        else:  # فيديو
-                            await update.message.reply_video(
-                                video=file,
-                                caption=f"✅ تم التنزيل من {platform}"
-                            )
+                    sent = None
+                    
+                    # المنضمون لتنزيل قائم يرسلون file_id الناتج عن رفع القائد
+                    if not is_leader and not album:
+                        file_id = await flight.wait_file_id(timeout=config.DOWNLOAD_TIMEOUT)
+                        if file_id:
+                            try:
+                                sent = await self._send_media(update, file_id, media_category, platform)
+                            except Exception as e:
+                                logger.warning(f"فشل الإرسال بـ file_id المشترك: {str(e)}")
+                    
+                    if sent is None and album:
+                        # الألبوم كاملاً في رسائل مجموعة (بدون ذاكرة file_id)
+                        await self._send_album(update, filename, platform)
+                        flight.publish_file_id(None)
+                    elif sent is None:
+                        if streamed:
+                            upload = InputFile(filename.rewind(), filename=filename.filename)
+                            sent = await self._send_media(update, upload, media_category, platform)
+                        else:
+                            with open(filename, 'rb') as file:
+                                sent = await self._send_media(update, file, media_category, platform)
+                        
+                        # حفظ file_id لإعادة استخدامه مع الطلبات المكررة
+                        flight.publish_file_id(
+                            await self._remember_file_id(media_key, media_category, sent)
+                        )
                     
                     logger.info(f"✅ تم تنزيل {media_category}: {platform} - {telegram_id}")
                 
                 except Exception as e:
+                    flight.publish_file_id(None)
                     logger.error(f"خطأ في إرسال الملف: {str(e)}")
                     await update.message.reply_text(
                         f"❌ حدث خطأ في إرسال الملف: {str(e)}"
                     )
-                finally:
-                    # حذف الملف
-                    try:
-                        os.remove(filename)
-                    except:
-                        pass
             else:
                 await update.message.reply_text(
                     "❌ حدث خطأ في التنزيل\n\n"
@@ -465,12 +508,339 @@ class PayPalSubscriptionBot:
                     "• من منصة غير مدعومة"
                 )
         
+        except MediaTooLargeError as e:
+            logger.info(f"🚫 ملف كبير: {flight_key} - {telegram_id}")
+            await update.message.reply_text(
+                f"❌ {str(e)}\n\n"
+                "جرّب رابطاً لمحتوى أقصر أو تنزيل الصوت فقط"
+            )
+        
         except Exception as e:
             logger.error(f"❌ خطأ: {str(e)}")
             await update.message.reply_text(
                 f"❌ حدث خطأ: {str(e)}\n\n"
                 "يرجى المحاولة لاحقاً أو التواصل مع الدعم"
             )
+        
+        finally:
+            # آخر مشارك يحذف الملف ومجلد المهمة (الملفات المحفوظة في ذاكرة القرص تبقى لإعادة استخدامها)
+            if inflight.leave(flight, is_leader):
+                if filename is None:
+                    filename = self._flight_file(flight)
+                if isinstance(filename, (StreamedMedia, MediaAlbum)):
+                    filename.close()
+                elif filename and media_cache.owns(filename):
+                    media_cache.release(filename)
+                elif filename:
+                    try:
+                        os.remove(filename)
+                    except:
+                        pass
+                if flight.workspace is not None:
+                    flight.workspace.close()
+    
+    @staticmethod
+    def _flight_file(flight):
+        """ملف التنزيل المشترك إذا اكتمل (آخر مشارك قد يكون غادر قبل انتظار النتيجة)"""
+        future = flight.future
+        if future is None or not future.done() or future.cancelled() or future.exception():
+            return None
+        return future.result()[0]
+    
+    # نوع المحتوى المتوقع من نوع الرابط
+    EXPECTED_CATEGORY = {
+        'audio': "موسيقى",
+        'image': "صورة",
+    }
+    
+    # أنواع الوسائط المستخدمة في مفتاح ذاكرة file_id
+    MEDIA_KINDS = {
+        "فيديو": "video",
+        "صورة": "photo",
+        "موسيقى": "audio",
+    }
+    
+    async def _send_media(self, update: Update, media, media_category: str, platform: str):
+        """إرسال ملف أو file_id بناءً على نوع المحتوى وإرجاع الرسالة المرسلة"""
+        caption = f"✅ تم التنزيل من {platform}"
+        
+        if media_category == "صورة":
+            return await update.message.reply_photo(photo=media, caption=caption)
+        elif media_category == "موسيقى":
+            return await update.message.reply_audio(audio=media, caption=caption)
+        else:  # فيديو
+            return await update.message.reply_video(video=media, caption=caption)
+    
+    async def _send_album(self, update: Update, album: MediaAlbum, platform: str) -> None:
+        """إرسال عناصر الألبوم بـ send_media_group في مجموعات من 10 ثم الصوت"""
+        caption = f"✅ تم التنزيل من {platform} ({len(album)} عناصر)"
+        
+        for index, chunk in enumerate(album.chunks()):
+            files = [open(path, 'rb') for path, _ in chunk]
+            try:
+                item_caption = caption if index == 0 else None
+                if len(chunk) == 1:
+                    # مجموعة الوسائط تحتاج عنصرين على الأقل
+                    send = update.message.reply_video if chunk[0][1] == 'video' else update.message.reply_photo
+                    await send(files[0], caption=item_caption)
+                    continue
+                media = [
+                    (InputMediaVideo if kind == 'video' else InputMediaPhoto)(
+                        file, caption=item_caption if position == 0 else None
+                    )
+                    for position, (file, (_, kind)) in enumerate(zip(files, chunk))
+                ]
+                await update.message.reply_media_group(media=media)
+            finally:
+                for file in files:
+                    file.close()
+        
+        # الموسيقى لا تُخلط مع الصور في مجموعة واحدة
+        if album.audio:
+            with open(album.audio, 'rb') as audio:
+                await update.message.reply_audio(audio)
+    
+    async def _send_cached(self, update: Update, media_key: Tuple[str, str], media_type: str) -> bool:
+        """محاولة الإرسال من ذاكرة file_id، وإرجاع True عند النجاح"""
+        platform_key, media_id = media_key
+        media_category = self.EXPECTED_CATEGORY.get(media_type, "فيديو")
+        media_kind = self.MEDIA_KINDS[media_category]
+        
+        file_id = await DownloadExecutor.run_db(
+            db.get_cached_file_id, platform_key, media_id, media_kind
+        )
+        if not file_id:
+            return False
+        
+        platform = SUPPORTED_PLATFORMS.get(platform_key, {}).get('name', platform_key)
+        try:
+            await self._send_media(update, file_id, media_category, platform)
+            return True
+        except Exception as e:
+            # file_id لم يعد صالحاً: حذفه والعودة إلى التنزيل العادي
+            logger.warning(f"file_id غير صالح لـ {media_key}: {str(e)}")
+            await DownloadExecutor.run_db(
+                db.delete_cached_file_id, platform_key, media_id, media_kind
+            )
+            return False
+    
+    async def _remember_file_id(self, media_key: Optional[Tuple[str, str]],
+                                media_category: str, sent) -> Optional[str]:
+        """حفظ file_id الناتج عن الرفع في الذاكرة الدائمة وإرجاعه"""
+        if media_category == "صورة":
+            attachment = sent.photo[-1] if sent.photo else None
+        elif media_category == "موسيقى":
+            attachment = sent.audio
+        else:
+            attachment = sent.video
+        
+        if not attachment:
+            return None
+        
+        if not media_key:
+            return attachment.file_id
+        
+        platform_key, media_id = media_key
+        try:
+            await DownloadExecutor.run_db(
+                db.save_cached_file_id,
+                platform_key, media_id, self.MEDIA_KINDS[media_category],
+                attachment.file_id, file_unique_id=attachment.file_unique_id
+            )
+        except Exception as e:
+            logger.warning(f"فشل حفظ file_id: {str(e)}")
+        return attachment.file_id
+    
+    # حلقة أحداث البوت (تُحدد عند التشغيل) وفترة فحص الإلغاء أثناء انتظارها
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    LOOP_POLL = 0.5
+    # مهمة تسجيل الإحصائيات الدورية (STATS_LOG_INTERVAL)
+    _stats_task: Optional[asyncio.Task] = None
+    
+    @staticmethod
+    def _stream_uploads() -> bool:
+        """الرفع من مخزن مؤقت (ذاكرة القرص تحتاج إلى ملف فتُعطل هذا المسار)"""
+        return config.STREAM_UPLOADS and not media_cache.enabled
+    
+    def _download_media(self, url: str, media_type: str, max_bytes: int = config.MAX_FILE_SIZE,
+                        workspace: Optional[JobWorkspace] = None) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """
+        تنزيل المحتوى بالطرق المتاحة (دالة حاجبة - تُشغَّل على مجمع التنزيل)
+        
+        الملف الموجود في ذاكرة القرص يُعاد مباشرة بدون فحص أو تنزيل. Cobalt
+        يبدأ أولاً، وإذا لم ينتهِ خلال مهلة التحوط تبدأ yt-dlp بالتوازي وتُعتمد
+        أول نتيجة ناجحة. فحص الحجم يعمل بجانب السباق ويلغيه إذا تجاوز الحجم
+        max_bytes، ولا تُقرأ بايتات الوسائط قبل نجاحه، وyt-dlp تعيد استخدام
+        بياناته. إذا استُبعدت جميع خوادم Cobalt تُستخدم الطرق المحلية مباشرة.
+        جميع الملفات تُحفظ في مجلد المهمة.
+        
+        Returns:
+            tuple: (اسم الملف أو StreamedMedia، اسم المنصة، نوع المحتوى)
+        
+        Raises:
+            MediaTooLargeError: إذا أظهر الفحص أو التنزيل أن الحجم أكبر من max_bytes
+        """
+        cached = self._from_disk_cache(url, media_type)
+        if cached:
+            return cached
+        
+        with bind_job_folder(workspace.path if workspace else None):
+            return self._download_in_folder(url, media_type, max_bytes)
+    
+    def _from_disk_cache(self, url: str, media_type: str) -> Optional[Tuple[str, str, str]]:
+        """الملف المحفوظ في ذاكرة القرص للنوع المتوقع (None إذا لم يوجد)"""
+        media_category = self.EXPECTED_CATEGORY.get(media_type, "فيديو")
+        key = DiskMediaCache.key_for_url(url, self.MEDIA_KINDS[media_category])
+        filename = media_cache.get(key) if key else None
+        if not filename:
+            return None
+        return filename, URLRouter.get_platform_name(url), media_category
+    
+    def _download_in_folder(self, url: str, media_type: str,
+                            max_bytes: int) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """السباق بين Cobalt والطرق المحلية داخل مجلد المهمة المربوط"""
+        # فحص الحجم من البيانات فقط، بالتوازي مع طلب Cobalt API (قراءة البايتات تنتظره)
+        probe = race.submit(MediaProbe.check, url, media_type, max_bytes) if config.MEDIA_PROBE_ENABLED else None
+        try:
+            if cobalt_pool.is_open:
+                logger.info("🔌 جميع خوادم Cobalt مستبعدة، التنزيل بالطرق المحلية مباشرة")
+                return self._download_fallback(url, media_type, max_bytes, probe)
+            return race.run(
+                lambda: self._download_cobalt(url, media_type, max_bytes),
+                lambda: self._download_fallback(url, media_type, max_bytes, probe),
+                discard=self._discard_download,
+                guard=probe,
+            )
+        except MediaTooLargeError:
+            raise
+        except Exception as e:
+            logger.warning(f"فشلت جميع طرق التنزيل: {str(e)}")
+            return None, None, None
+    
+    def _download_cobalt(self, url: str, media_type: str, max_bytes: int) -> Tuple[str, str, str]:
+        """الطريقة 1: Cobalt API (الأفضل)"""
+        logger.info("محاولة Cobalt API...")
+        
+        if config.COBALT_ASYNC and self._loop is not None:
+            # الطلب وقراءة الملف داخل حلقة الأحداث، والخيط ينتظر النتيجة فقط
+            filename, platform, media_category = self._run_on_loop(
+                self._download_cobalt_async(url, media_type, max_bytes)
+            )
+        elif self._stream_uploads():
+            # تمرير الاستجابة إلى الرفع عبر مخزن محدود بدون ملف على القرص
+            download_mode = 'audio' if media_type == 'audio' else 'auto'
+            filename = CobaltDownloader.download_stream(url, download_mode, max_bytes)
+            platform = URLRouter.get_platform_name(url)
+            media_category = self.EXPECTED_CATEGORY.get(media_type, "فيديو")
+        elif media_type == 'audio':
+            filename, platform = UniversalDownloader.download_audio(url, max_bytes)
+            media_category = "موسيقى"
+        elif media_type == 'image':
+            filename, platform = UniversalDownloader.download_image(url, max_bytes)
+            media_category = "صورة"
+        else:
+            filename, platform = UniversalDownloader.download_video(url, max_bytes)
+            media_category = "فيديو"
+        
+        logger.info(f"نجح Cobalt API: {filename}")
+        return filename, platform, media_category
+    
+    async def _download_cobalt_async(self, url: str, media_type: str, max_bytes: int) -> Tuple[str, str, str]:
+        """الطريقة 1 داخل حلقة الأحداث (AsyncCobaltDownloader)"""
+        if self._stream_uploads():
+            download_mode = 'audio' if media_type == 'audio' else 'auto'
+            filename = await async_cobalt.download_stream(url, download_mode, max_bytes)
+            return filename, URLRouter.get_platform_name(url), self.EXPECTED_CATEGORY.get(media_type, "فيديو")
+        if media_type == 'audio':
+            filename, platform = await AsyncUniversalDownloader.download_audio(url, max_bytes)
+            return filename, platform, "موسيقى"
+        if media_type == 'image':
+            filename, platform = await AsyncUniversalDownloader.download_image(url, max_bytes)
+            return filename, platform, "صورة"
+        filename, platform = await AsyncUniversalDownloader.download_video(url, max_bytes)
+        return filename, platform, "فيديو"
+    
+    def _run_on_loop(self, coro):
+        """
+        تشغيل coroutine على حلقة البوت من خيط السباق وانتظار نتيجتها
+        
+        إذا أُلغيت الطريقة (فازت yt-dlp) تُلغى المهمة فيُغلق الاتصال فوراً.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._in_job_folder(job_folder(), current_guard(), coro), self._loop
+        )
+        while True:
+            done, _ = concurrent.futures.wait([future], timeout=self.LOOP_POLL)
+            if done:
+                return future.result()
+            try:
+                raise_if_cancelled()
+            except DownloadCancelled:
+                future.cancel()
+                raise
+    
+    @staticmethod
+    async def _in_job_folder(folder: str, guard: Optional[concurrent.futures.Future], coro):
+        """تشغيل coroutine مع ربط مجلد المهمة وحارس السباق بسياق مهمة asyncio"""
+        with bind_job_folder(folder), bind_guard(guard):
+            return await coro
+    
+    def _probe_info(self, probe: Optional[concurrent.futures.Future]) -> Optional[dict]:
+        """
+        انتظار نتيجة الفحص داخل طريقة yt-dlp (مع فحص الإلغاء) وإرجاع بياناته
+        
+        Raises:
+            MediaTooLargeError: إذا رفض الفحص الوسائط
+        """
+        if probe is None:
+            return None
+        while not concurrent.futures.wait([probe], timeout=self.LOOP_POLL).done:
+            raise_if_cancelled()
+        return probe.result().info
+    
+    def _download_fallback(self, url: str, media_type: str, max_bytes: int,
+                           probe: Optional[concurrent.futures.Future] = None) -> Tuple[str, str, str]:
+        """الطريقة 2: MediaDownloader (yt-dlp والمعالجات البديلة)"""
+        # بيانات الفحص مستخرجة بصيغة النوع المطلوب، فلا تُستخدم لمحاولات الأنواع الأخرى
+        info = self._probe_info(probe)
+        
+        # محاولة تنزيل الفيديو أولاً
+        if media_type in ['video', 'unknown']:
+            try:
+                filename, platform = MediaDownloader.download_video(url, max_bytes, info)
+                return filename, platform, "فيديو"
+            except DownloadCancelled:
+                raise
+            except Exception as e:
+                logger.warning(f"فشل تنزيل الفيديو، محاولة الصورة: {str(e)}")
+        
+        # محاولة تنزيل الصورة إذا فشل الفيديو (أو شرائح تيك توك)
+        if media_type == 'image' or MediaDownloader.is_instagram_url(url):
+            raise_if_cancelled()
+            try:
+                filename, platform = MediaDownloader.download_image(url)
+                return filename, platform, "صورة"
+            except DownloadCancelled:
+                raise
+            except Exception as e:
+                logger.warning(f"فشل تنزيل الصورة: {str(e)}")
+        
+        # محاولة تنزيل الصوت
+        raise_if_cancelled()
+        filename, platform = MediaDownloader.download_audio(url, info if media_type == 'audio' else None)
+        return filename, platform, "موسيقى"
+    
+    @staticmethod
+    def _discard_download(result: Tuple[Optional[str], Optional[str], Optional[str]]) -> None:
+        """حذف نتيجة الطريقة الخاسرة في السباق"""
+        filename = result[0]
+        if isinstance(filename, (StreamedMedia, MediaAlbum)):
+            filename.close()
+        elif filename and media_cache.owns(filename):
+            media_cache.release(filename)
+        elif filename and os.path.exists(filename):
+            os.remove(filename)
+            logger.info(f"🗑️ حذف نتيجة الطريقة الخاسرة: {filename}")
     
     async def button_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """معالج الأزرار"""
@@ -554,6 +924,22 @@ class PayPalSubscriptionBot:
         ]
         await app.bot.set_my_commands(commands)
         logger.info("✅ تم إعداد أوامر البوت في القائمة")
+        
+        # حلقة الأحداث التي تُشغَّل عليها تنزيلات Cobalt غير المتزامنة
+        self._loop = asyncio.get_running_loop()
+        janitor.start()
+        if config.STATS_LOG_INTERVAL > 0:
+            self._stats_task = self._loop.create_task(self._log_stats_periodically())
+    
+    async def _log_stats_periodically(self):
+        """تسجيل حالة خوادم Cobalt (القواطع) وإحصائيات السباق كل STATS_LOG_INTERVAL ثانية"""
+        while True:
+            await asyncio.sleep(config.STATS_LOG_INTERVAL)
+            try:
+                logger.info(f"📊 خوادم Cobalt:\n{cobalt_pool.summary()}")
+                logger.info(f"📊 السباق: {race.get_stats()}")
+            except Exception as e:
+                logger.warning(f"فشل تسجيل الإحصائيات: {str(e)}")
     
     async def cmd_subscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """معالج أمر /subscribe"""
@@ -619,7 +1005,7 @@ class PayPalSubscriptionBot:
 🆓 **اشتراكك الحالي: مجاني**
 
 📊 التنزيلات اليوم: {downloads_today}/5
-✅ الحالة: {'\u0646شط' if is_active else 'غير نشط'}
+✅ الحالة: {'نشط' if is_active else 'غير نشط'}
 
 🔒 **القيود:**
 • 5 تنزيلات يومياً
@@ -635,7 +1021,7 @@ class PayPalSubscriptionBot:
 
 💰 السعر: ${plan.get('price', 0)}/شهر
 📊 التنزيلات اليوم: {downloads_today}
-✅ الحالة: {'\u0646شط' if is_active else 'غير نشط'}
+✅ الحالة: {'نشط' if is_active else 'غير نشط'}
 
 ✨ **الميزات:**
             """
@@ -697,12 +1083,27 @@ class PayPalSubscriptionBot:
             parse_mode="Markdown"
         )
     
+    async def shutdown_executors(self, app):
+        """إيقاف المجدول ومجمعات التنفيذ وعميل HTTP عند إيقاف البوت"""
+        await scheduler.stop()
+        await janitor.stop()
+        if self._stats_task is not None:
+            self._stats_task.cancel()
+        await short_link_resolver.close()
+        await async_cobalt.close()
+        race.shutdown(wait=False)
+        cobalt_pool.shutdown()
+        media_cache.flush()
+        http_client.close()
+        DownloadExecutor.shutdown(wait=False)
+    
     def run(self):
         """تشغيل البوت"""
         app = Application.builder().token(BOT_TOKEN).build()
         
         # إعداد أوامر القائمة
         app.post_init = self.setup_bot_commands
+        app.post_shutdown = self.shutdown_executors
         
         # معالجات الأوامر
         app.add_handler(CommandHandler("start", self.start))
@@ -713,10 +1114,11 @@ class PayPalSubscriptionBot:
         # معالجات الأزرار
         app.add_handler(CallbackQueryHandler(self.button_handler))
         
-        # معالج الرسائل (الروابط)
+        # معالج الرسائل (الروابط) - غير حاجب حتى تُعالج روابط المستخدمين بالتوازي
         app.add_handler(MessageHandler(
             filters.TEXT & ~filters.COMMAND,
-            self.handle_url
+            self.handle_url,
+            block=False
         ))
         
         logger.info("🚀 البوت يعمل الآن مع PayPal (فيديو + صور + موسيقى)...")
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+محرك تنزيل الروابط المباشرة بطلبات Range متوازية
+Parallel ranged chunk downloader for direct media URLs
+"""
+
+import os
+import re
+import time
+import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from config import SOCKET_TIMEOUT, DOWNLOAD_CHUNKS, CHUNKED_MIN_SIZE, CHUNK_RETRIES
+from media_probe import MediaTooLargeError
+from hedged_race import current_cancel_event, raise_if_cancelled
+from http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+# Content-Range: bytes 0-1023/4096
+_CONTENT_RANGE_RE = re.compile(r'bytes\s+\d+-\d+/(\d+)')
+
+
+class ChunkedDownloader:
+    """
+    تنزيل ملف من رابط مباشر إلى القرص
+
+    الطلب الأول يُرسل مع Range مفتوح: إذا دعمه الخادم وكان الملف كبيراً
+    يُقسم إلى أجزاء تُنزل بالتوازي داخل ملف محجوز مسبقاً، مع إعادة محاولة
+    كل جزء من حيث توقف. غير ذلك تُقرأ نفس الاستجابة كتدفق واحد. الملف يُكتب
+    باسم .part ثم يُعاد تسميته بعد اكتماله.
+    """
+
+    READ_SIZE = 64 * 1024
+    # عدد البايتات الأولى التي تُمرر إلى sniff قبل كتابة أي شيء
+    SNIFF_SIZE = 4 * 1024
+    RETRY_BACKOFF = 0.5  # ثانية (تتضاعف مع كل محاولة)
+
+    @staticmethod
+    def _total_size(response: requests.Response) -> Optional[int]:
+        """الحجم الكلي من Content-Range (206) أو Content-Length (200)"""
+        if response.status_code == 206:
+            match = _CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+            return int(match.group(1)) if match else None
+        length = response.headers.get('Content-Length', '')
+        return int(length) if length.isdigit() else None
+
+    @staticmethod
+    def _split(size: int, chunks: int) -> List[Tuple[int, int]]:
+        """تقسيم الحجم إلى مجالات [البداية، النهاية] متقاربة"""
+        step = -(-size // chunks)
+        return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+    @staticmethod
+    def download(url: str, save_path: str, headers: Optional[Dict[str, str]] = None,
+                 max_bytes: Optional[int] = None, content_type: Optional[str] = None,
+                 chunks: int = DOWNLOAD_CHUNKS,
+                 sniff: Optional[Callable[[bytes], Any]] = None) -> str:
+        """
+        تنزيل رابط مباشر
+
+        Args:
+            url: رابط الملف
+            save_path: مسار الحفظ
+            headers: ترويسات إضافية (User-Agent / Referer)
+            max_bytes: أقصى حجم مسموح (None بدون حد)
+            content_type: بادئة نوع المحتوى المطلوب (مثل 'image')
+            chunks: عدد الطلبات المتوازية
+            sniff: فحص أول SNIFF_SIZE بايت (يرفع ValueError لإيقاف التنزيل مبكراً)
+
+        Returns:
+            str: مسار الملف المحفوظ
+
+        Raises:
+            MediaTooLargeError: إذا تجاوز الحجم max_bytes
+            ValueError: إذا لم يطابق نوع المحتوى أو رفضه sniff
+            requests.RequestException / IOError: إذا فشل التنزيل
+        """
+        headers = dict(headers or {})
+        part_path = save_path + '.part'
+        started = time.perf_counter()
+
+        response = http_client.get(url, headers={**headers, 'Range': 'bytes=0-'},
+                                stream=True, timeout=SOCKET_TIMEOUT)
+        try:
+            response.raise_for_status()
+
+            received_type = response.headers.get('Content-Type', '').lower()
+            if content_type and not received_type.startswith(content_type):
+                raise ValueError(f"نوع المحتوى غير متوقع: {received_type}")
+
+            size = ChunkedDownloader._total_size(response)
+            if max_bytes is not None and size is not None and size > max_bytes:
+                raise MediaTooLargeError(size, max_bytes)
+
+            # أول البايتات تُفحص قبل قراءة بقية الجسم (صفحة خطأ HTML مثلاً)
+            head = b''
+            if sniff is not None:
+                head = response.raw.read(ChunkedDownloader.SNIFF_SIZE, decode_content=True)
+                sniff(head)
+
+            ranged = (response.status_code == 206 and size is not None
+                      and size >= CHUNKED_MIN_SIZE and chunks > 1)
+            if not ranged:
+                mode = 'single'
+                ChunkedDownloader._write_stream(response, part_path, max_bytes, head)
+        finally:
+            response.close()
+
+        try:
+            if ranged:
+                mode = f'{chunks} chunks'
+                ChunkedDownloader._download_ranges(url, headers, part_path, size, chunks)
+            os.replace(part_path, save_path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+        logger.info(
+            f"⬇️ تنزيل مباشر ({mode}) {os.path.getsize(save_path)} بايت "
+            f"في {time.perf_counter() - started:.2f}s: {save_path}"
+        )
+        return save_path
+
+    @staticmethod
+    def _write_stream(response: requests.Response, path: str, max_bytes: Optional[int],
+                      head: bytes = b'') -> None:
+        """كتابة الاستجابة كتدفق واحد (بعد البايتات المقروءة مسبقاً للفحص)"""
+        written = 0
+        try:
+            with open(path, 'wb') as f:
+                chunks = response.iter_content(chunk_size=ChunkedDownloader.READ_SIZE)
+                for chunk in itertools.chain([head], chunks):
+                    raise_if_cancelled()
+                    if not chunk:
+                        continue
+                    written += len(chunk)
+                    if max_bytes is not None and written > max_bytes:
+                        raise MediaTooLargeError(written, max_bytes)
+                    f.write(chunk)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+
+    @staticmethod
+    def _download_ranges(url: str, headers: Dict[str, str], path: str,
+                         size: int, chunks: int) -> None:
+        """تنزيل الأجزاء بالتوازي داخل ملف محجوز مسبقاً"""
+        with open(path, 'wb') as f:
+            f.truncate(size)
+
+        # خيوط الأجزاء لا ترث سياق الخيط الحالي، فيُمرر حدث الإلغاء صراحة
+        cancel_event = current_cancel_event()
+        ranges = ChunkedDownloader._split(size, chunks)
+        with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix='chunk') as pool:
+            futures = [
+                pool.submit(ChunkedDownloader._fetch_range, url, headers, path, start, end, cancel_event)
+                for start, end in ranges
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    @staticmethod
+    def _fetch_range(url: str, headers: Dict[str, str], path: str, start: int, end: int,
+                     cancel_event: Optional[threading.Event] = None) -> None:
+        """تنزيل جزء واحد مع إعادة المحاولة من آخر بايت مكتوب"""
+        offset = start
+        last_error = None
+
+        for attempt in range(CHUNK_RETRIES):
+            try:
+                with http_client.get(url, headers={**headers, 'Range': f'bytes={offset}-{end}'},
+                                  stream=True, timeout=SOCKET_TIMEOUT) as response:
+                    if response.status_code != 206:
+                        raise IOError(f"الخادم لم يُرجع الجزء المطلوب (HTTP {response.status_code})")
+                    with open(path, 'r+b') as f:
+                        f.seek(offset)
+                        for chunk in response.iter_content(chunk_size=ChunkedDownloader.READ_SIZE):
+                            raise_if_cancelled(cancel_event)
+                            if offset + len(chunk) > end + 1:
+                                chunk = chunk[:end + 1 - offset]
+                            f.write(chunk)
+                            offset += len(chunk)
+                            if offset > end:
+                                break
+                if offset > end:
+                    return
+                raise IOError(f"جزء ناقص: {offset - start}/{end - start + 1} بايت")
+            except (requests.RequestException, IOError) as e:
+                last_error = e
+                logger.warning(
+                    f"فشل الجزء {start}-{end} (محاولة {attempt + 1}/{CHUNK_RETRIES}): {str(e)}"
+                )
+                if attempt + 1 < CHUNK_RETRIES:
+                    time.sleep(ChunkedDownloader.RETRY_BACKOFF * (2 ** attempt))
+
+        raise last_error
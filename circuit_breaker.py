@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+قاطع دائرة لخدمات التنزيل الخارجية (Cobalt)
+Circuit breaker with background half-open probes for remote backends
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Optional
+
+from config import (
+    BREAKER_ERROR_RATE, BREAKER_MIN_CALLS, BREAKER_WINDOW, BREAKER_COOLDOWN,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """الخدمة معطلة مؤقتاً (القاطع مفتوح) - لم يُرسل أي طلب"""
+
+
+class CircuitBreaker:
+    """
+    قاطع دائرة بنسبة أخطاء على نافذة منزلقة
+
+    الحالات:
+    - closed: الطلبات تمر وتُسجل نتائجها
+    - open: تُرفض الطلبات فوراً بـ CircuitOpenError بدلاً من انتظار المهلة
+    - half_open: خيط خلفي يُرسل طلب فحص خفيف بعد BREAKER_COOLDOWN ثانية،
+      فإذا نجح يُغلق القاطع وإلا يُفتح من جديد. طلبات المستخدمين لا تُستخدم
+      كفحص فلا ينتظر أحد خدمة معطلة.
+
+    on_change (اختياري) يُستدعى بعد كل فتح أو إغلاق خارج القفل، لتسجيل حالة
+    المجموعة كاملة عند كل انتقال.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, probe: Optional[Callable[[], Any]] = None,
+                 error_rate: float = BREAKER_ERROR_RATE,
+                 min_calls: int = BREAKER_MIN_CALLS,
+                 window: int = BREAKER_WINDOW,
+                 cooldown: float = BREAKER_COOLDOWN,
+                 on_change: Optional[Callable[['CircuitBreaker'], None]] = None):
+        self.name = name
+        self.probe = probe
+        self.on_change = on_change
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._results = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._prober: Optional[threading.Thread] = None
+        self.stats = {'calls': 0, 'failures': 0, 'rejected': 0, 'opened': 0, 'probes': 0}
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """هل تُرفض الطلبات حالياً (open أو half_open)"""
+        return self._state != self.CLOSED
+
+    def _failure_rate(self) -> float:
+        if not self._results:
+            return 0.0
+        return sum(1 for success in self._results if not success) / len(self._results)
+
+    def record(self, success: bool) -> None:
+        """تسجيل نتيجة طلب وفتح القاطع إذا تجاوزت نسبة الأخطاء الحد"""
+        with self._lock:
+            self.stats['calls'] += 1
+            if not success:
+                self.stats['failures'] += 1
+            if self._state != self.CLOSED:
+                # نتيجة طلب بدأ قبل فتح القاطع
+                return
+            self._results.append(success)
+            opened = len(self._results) >= self.min_calls and self._failure_rate() >= self.error_rate
+            if opened:
+                self._open()
+        if opened:
+            self._notify()
+
+    def _notify(self) -> None:
+        """إبلاغ on_change بانتقال الحالة (خارج القفل حتى يقرأ get_stats)"""
+        if self.on_change is None:
+            return
+        try:
+            self.on_change(self)
+        except Exception as e:
+            logger.warning(f"فشل إبلاغ تغير حالة قاطع {self.name}: {str(e)}")
+
+    def _open(self) -> None:
+        """فتح القاطع وبدء خيط الفحص (يُستدعى مع القفل)"""
+        logger.warning(
+            f"🔌 فتح قاطع {self.name}: نسبة الأخطاء {self._failure_rate():.0%} "
+            f"من آخر {len(self._results)} طلب"
+        )
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.stats['opened'] += 1
+        if self.probe is not None and (self._prober is None or not self._prober.is_alive()):
+            self._prober = threading.Thread(
+                target=self._probe_loop, name=f'{self.name}-breaker', daemon=True
+            )
+            self._prober.start()
+
+    def _close(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._results.clear()
+        logger.info(f"🔌 إغلاق قاطع {self.name}: الخدمة عادت للعمل")
+        self._notify()
+
+    def _probe_loop(self) -> None:
+        """فحص الخدمة في الخلفية كل BREAKER_COOLDOWN ثانية حتى تعود"""
+        while not self._stop.wait(self.cooldown):
+            with self._lock:
+                self._state = self.HALF_OPEN
+                self.stats['probes'] += 1
+            try:
+                self.probe()
+            except Exception as e:
+                with self._lock:
+                    self._state = self.OPEN
+                    self._opened_at = time.monotonic()
+                logger.info(f"فحص {self.name} فشل، القاطع يبقى مفتوحاً: {str(e)}")
+                continue
+            self._close()
+            return
+
+    def call(self, func: Callable[..., Any], *args,
+             is_failure: Callable[[BaseException], bool] = lambda e: True, **kwargs) -> Any:
+        """
+        تنفيذ طلب عبر القاطع
+
+        Args:
+            func: الطلب
+            is_failure: هل الاستثناء يدل على تعطل الخدمة (وليس خطأ في المحتوى)
+
+        Raises:
+            CircuitOpenError: إذا كان القاطع مفتوحاً
+        """
+        if self.is_open:
+            with self._lock:
+                self.stats['rejected'] += 1
+            raise CircuitOpenError(f"{self.name} معطل مؤقتاً (القاطع مفتوح)")
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record(not is_failure(e))
+            raise
+        self.record(True)
+        return result
+
+    async def call_async(self, func: Callable[..., Any], *args,
+                         is_failure: Callable[[BaseException], bool] = lambda e: True,
+                         **kwargs) -> Any:
+        """نسخة غير متزامنة من call (func دالة async)"""
+        if self.is_open:
+            with self._lock:
+                self.stats['rejected'] += 1
+            raise CircuitOpenError(f"{self.name} معطل مؤقتاً (القاطع مفتوح)")
+
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            self.record(not is_failure(e))
+            raise
+        self.record(True)
+        return result
+
+    def get_stats(self) -> dict:
+        """حالة القاطع وعداداته للمراقبة"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['state'] = self._state
+            stats['error_rate'] = self._failure_rate()
+            stats['window_calls'] = len(self._results)
+            stats['open_for'] = (
+                time.monotonic() - self._opened_at if self._state != self.CLOSED else 0.0
+            )
+        return stats
+
+    def shutdown(self) -> None:
+        """إيقاف خيط الفحص"""
+        self._stop.set()
@@ -9,8 +9,19 @@ Cobalt API Downloader - Universal media downloader
 import os
 import logging
 import requests
-from typing import Optional, Dict, Any
-from config import DOWNLOAD_FOLDER, SOCKET_TIMEOUT
+from typing import Optional, Dict, Any, Tuple, Union
+from config import (
+    SOCKET_TIMEOUT, MAX_FILE_SIZE, BREAKER_PROBE_TIMEOUT, TIKTOK_SLIDESHOW_AUDIO,
+)
+from disk_cache import DiskMediaCache, media_cache
+from url_router import URLRouter
+from media_stream import StreamedMedia
+from media_album import MediaAlbum
+from job_workspace import job_folder
+from chunked_downloader import ChunkedDownloader
+from cobalt_pool import CobaltPool, CobaltInstance
+from http_client import http_client
+from hedged_race import wait_for_guard
 
 logger = logging.getLogger(__name__)
 
@@ -18,86 +29,138 @@ logger = logging.getLogger(__name__)
 class CobaltDownloader:
     """معالج تنزيل شامل باستخدام Cobalt API"""
     
-    # Cobalt API endpoint (public instance)
-    API_URL = "https://api.cobalt.tools/"
-    
     # User Agent
     USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     
     @staticmethod
-    def download(url: str, download_mode: str = "auto") -> Dict[str, Any]:
+    def download(url: str, download_mode: str = "auto",
+                 max_bytes: int = MAX_FILE_SIZE) -> Dict[str, Any]:
         """
         تنزيل وسائط من أي منصة مدعومة باستخدام Cobalt
         
         Args:
             url: رابط المحتوى
             download_mode: نوع التنزيل (auto/audio/mute)
+            max_bytes: أقصى حجم يُكتب على القرص
             
         Returns:
             dict: معلومات الملف المنزل
             
         Raises:
+            MediaTooLargeError: إذا تجاوز الحجم max_bytes
             Exception: إذا فشل التنزيل
         """
         try:
             logger.info(f"جاري التنزيل باستخدام Cobalt API: {url}")
             
-            # إعداد الطلب
-            headers = {
-                'Accept': 'application/json',
-                'Content-Type': 'application/json',
-                'User-Agent': CobaltDownloader.USER_AGENT,
-            }
-            
-            # بيانات الطلب
-            payload = {
-                'url': url,
-                'downloadMode': download_mode,
-                'videoQuality': '1080',
-                'audioFormat': 'mp3',
-                'audioBitrate': '192',
-                'filenameStyle': 'basic',
-                'disableMetadata': False,
-            }
-            
-            # إرسال الطلب إلى Cobalt API
-            response = requests.post(
-                CobaltDownloader.API_URL,
-                json=payload,
-                headers=headers,
-                timeout=SOCKET_TIMEOUT
-            )
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            logger.info(f"استجابة Cobalt: {data.get('status')}")
-            
-            # معالجة الاستجابة حسب النوع
-            status = data.get('status')
-            
-            if status == 'tunnel' or status == 'redirect':
-                # تنزيل مباشر
-                return CobaltDownloader._download_direct(data, url)
-            
-            elif status == 'picker':
-                # عدة ملفات (مثل ألبوم انستقرام)
-                return CobaltDownloader._download_picker(data, url)
-            
-            elif status == 'error':
-                # خطأ
-                error_code = data.get('error', {}).get('code', 'unknown')
-                raise Exception(f"خطأ من Cobalt: {error_code}")
-            
-            else:
-                raise Exception(f"حالة غير معروفة من Cobalt: {status}")
+            # المكان على الخادم محجوز حتى نهاية التنزيل (tunnel يمر عبر الخادم)
+            with cobalt_pool.acquire() as instance:
+                data = CobaltDownloader._request(instance, url, download_mode)
+                
+                # معالجة الاستجابة حسب النوع
+                status = data.get('status')
+                
+                if status == 'tunnel' or status == 'redirect':
+                    # تنزيل مباشر بعد نجاح فحص الحجم
+                    wait_for_guard()
+                    return CobaltDownloader._download_direct(data, url, max_bytes)
+                
+                elif status == 'picker':
+                    # عدة ملفات (مثل ألبوم انستقرام)
+                    wait_for_guard()
+                    return CobaltDownloader._download_picker(data, url, max_bytes)
+                
+                elif status == 'error':
+                    # خطأ
+                    error_code = data.get('error', {}).get('code', 'unknown')
+                    raise Exception(f"خطأ من Cobalt: {error_code}")
+                
+                else:
+                    raise Exception(f"حالة غير معروفة من Cobalt: {status}")
         
         except Exception as e:
             logger.error(f"خطأ في Cobalt API: {str(e)}")
             raise
     
     @staticmethod
-    def _download_direct(data: Dict[str, Any], original_url: str) -> Dict[str, Any]:
+    def _request(instance: CobaltInstance, url: str, download_mode: str) -> Dict[str, Any]:
+        """
+        إرسال الطلب إلى خادم Cobalt عبر قاطع الدائرة الخاص به
+        
+        Raises:
+            CircuitOpenError: إذا استُبعد الخادم (بدون انتظار المهلة)
+        """
+        return instance.request(
+            CobaltDownloader._post, url, download_mode,
+            is_failure=CobaltDownloader._is_instance_failure
+        )
+    
+    @staticmethod
+    def _is_instance_failure(error: BaseException) -> bool:
+        """
+        هل الخطأ يدل على تعطل الخادم نفسه
+        
+        أخطاء الاتصال والمهلة و 5xx و 429 والاستجابة غير JSON تُحسب على الخادم،
+        أما 4xx الأخرى فهي رفض لرابط بعينه والخادم سليم.
+        """
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            status = error.response.status_code
+            return status >= 500 or status == 429
+        return isinstance(error, (requests.RequestException, ValueError))
+    
+    @staticmethod
+    def _probe(api_url: str) -> None:
+        """طلب فحص خفيف لقاطع الدائرة (GET يُرجع معلومات الخادم)"""
+        response = http_client.get(
+            api_url,
+            headers={'Accept': 'application/json', 'User-Agent': CobaltDownloader.USER_AGENT},
+            timeout=BREAKER_PROBE_TIMEOUT
+        )
+        if response.status_code >= 500 or response.status_code == 429:
+            response.raise_for_status()
+    
+    @staticmethod
+    def _api_headers() -> Dict[str, str]:
+        """ترويسات طلب Cobalt API"""
+        return {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+            'User-Agent': CobaltDownloader.USER_AGENT,
+        }
+    
+    @staticmethod
+    def _payload(url: str, download_mode: str) -> Dict[str, Any]:
+        """بيانات طلب Cobalt API"""
+        return {
+            'url': url,
+            'downloadMode': download_mode,
+            'videoQuality': '1080',
+            'audioFormat': 'mp3',
+            'audioBitrate': '192',
+            'filenameStyle': 'basic',
+            'disableMetadata': False,
+        }
+    
+    @staticmethod
+    def _post(api_url: str, url: str, download_mode: str) -> Dict[str, Any]:
+        """إرسال الطلب إلى Cobalt API وإرجاع الاستجابة"""
+        response = http_client.post(
+            api_url,
+            json=CobaltDownloader._payload(url, download_mode),
+            headers=CobaltDownloader._api_headers(),
+            timeout=SOCKET_TIMEOUT
+        )
+        
+        response.raise_for_status()
+        data = response.json()
+        
+        logger.info(f"استجابة Cobalt: {data.get('status')}")
+        
+        return data
+    
+    @staticmethod
+    def _download_direct(data: Dict[str, Any], original_url: str,
+                         max_bytes: Optional[int] = None) -> Dict[str, Any]:
         """تنزيل ملف مباشر"""
         try:
             download_url = data.get('url')
@@ -110,7 +173,7 @@ class CobaltDownloader:
             file_ext = CobaltDownloader._get_file_extension(filename, download_url)
             
             # مسار الحفظ
-            save_path = os.path.join(DOWNLOAD_FOLDER, f'{filename}{file_ext}')
+            save_path = os.path.join(job_folder(), f'{filename}{file_ext}')
             
             # تنزيل الملف
             logger.info(f"جاري تنزيل الملف من: {download_url}")
@@ -120,14 +183,8 @@ class CobaltDownloader:
                 'Referer': original_url,
             }
             
-            response = requests.get(download_url, headers=headers, stream=True, timeout=SOCKET_TIMEOUT)
-            response.raise_for_status()
-            
-            # حفظ الملف
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            # تنزيل مجزأ بالتوازي إذا دعم الخادم Range
+            ChunkedDownloader.download(download_url, save_path, headers=headers, max_bytes=max_bytes)
             
             logger.info(f"تم تنزيل الملف بنجاح: {save_path}")
             
@@ -143,64 +200,120 @@ class CobaltDownloader:
             raise
     
     @staticmethod
-    def _download_picker(data: Dict[str, Any], original_url: str) -> Dict[str, Any]:
-        """تنزيل أول عنصر من picker (ألبوم)"""
+    def _download_picker(data: Dict[str, Any], original_url: str,
+                         max_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """تنزيل جميع عناصر picker (ألبوم) بالتوازي في مجلد خاص بالمهمة"""
         try:
-            picker_items = data.get('picker', [])
+            picker_items = [item for item in data.get('picker', []) if item.get('url')]
             if not picker_items:
                 raise Exception("لا توجد عناصر في picker")
             
-            # تنزيل أول عنصر
-            first_item = picker_items[0]
-            item_url = first_item.get('url')
-            item_type = first_item.get('type', 'unknown')
-            
-            if not item_url:
-                raise Exception("لم يتم العثور على رابط العنصر")
-            
-            logger.info(f"جاري تنزيل عنصر من picker (نوع: {item_type})")
-            
-            # تحديد الامتداد حسب النوع
-            ext_map = {
-                'photo': '.jpg',
-                'video': '.mp4',
-                'gif': '.gif',
-            }
-            file_ext = ext_map.get(item_type, '.jpg')
+            logger.info(f"جاري تنزيل {len(picker_items)} عنصر من picker")
             
-            # مسار الحفظ
-            filename = f'picker_item_{item_type}'
-            save_path = os.path.join(DOWNLOAD_FOLDER, f'{filename}{file_ext}')
-            
-            # تنزيل الملف
             headers = {
                 'User-Agent': CobaltDownloader.USER_AGENT,
                 'Referer': original_url,
             }
             
-            response = requests.get(item_url, headers=headers, stream=True, timeout=SOCKET_TIMEOUT)
-            response.raise_for_status()
-            
-            # حفظ الملف
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            sources = [(item['url'], item.get('type', 'photo')) for item in picker_items]
+            # موسيقى شرائح تيك توك (اختيارية)
+            if data.get('audio') and TIKTOK_SLIDESHOW_AUDIO:
+                sources.append((data['audio'], 'audio'))
             
-            logger.info(f"تم تنزيل عنصر picker بنجاح: {save_path}")
+            album = MediaAlbum.download(
+                'picker', sources,
+                lambda item_url, save_path, _: ChunkedDownloader.download(
+                    item_url, save_path, headers=headers, max_bytes=max_bytes
+                ),
+            )
             
             return {
                 'status': 'success',
-                'filepath': save_path,
-                'filename': filename,
+                'filepath': album.items[0][0],
+                'filename': os.path.basename(album.items[0][0]),
                 'type': 'picker',
-                'item_type': item_type,
+                'album': album,
             }
         
         except Exception as e:
             logger.error(f"خطأ في تنزيل picker: {str(e)}")
             raise
     
+    @staticmethod
+    def download_stream(url: str, download_mode: str = "auto",
+                        max_bytes: int = MAX_FILE_SIZE) -> Union[StreamedMedia, MediaAlbum]:
+        """
+        تنزيل إلى مخزن مؤقت محدود بدلاً من ملف على القرص
+        
+        Args:
+            url: رابط المحتوى
+            download_mode: نوع التنزيل (auto/audio/mute)
+            max_bytes: أقصى حجم يُقرأ من الاستجابة
+            
+        Returns:
+            StreamedMedia: المحتوى جاهز للرفع (يجب إغلاقه بعد الإرسال)
+            MediaAlbum: لاستجابة picker (عدة ملفات في مجلد المهمة)
+            
+        Raises:
+            MediaTooLargeError: إذا تجاوز الحجم max_bytes
+            Exception: إذا فشل التنزيل
+        """
+        try:
+            logger.info(f"جاري التنزيل المباشر باستخدام Cobalt API: {url}")
+            
+            with cobalt_pool.acquire() as instance:
+                data = CobaltDownloader._request(instance, url, download_mode)
+                # طلب API يعمل بالتوازي مع فحص الحجم، وقراءة البايتات تنتظر نجاحه
+                if data.get('status') == 'picker':
+                    wait_for_guard()
+                    return CobaltDownloader._download_picker(data, url, max_bytes)['album']
+                
+                download_url, filename = CobaltDownloader._resolve_target(data)
+                wait_for_guard()
+                
+                headers = {
+                    'User-Agent': CobaltDownloader.USER_AGENT,
+                    'Referer': url,
+                }
+                
+                response = http_client.get(download_url, headers=headers, stream=True, timeout=SOCKET_TIMEOUT)
+                response.raise_for_status()
+                
+                return StreamedMedia.from_response(response, filename, max_bytes)
+        
+        except Exception as e:
+            logger.error(f"خطأ في التنزيل المباشر من Cobalt: {str(e)}")
+            raise
+    
+    @staticmethod
+    def _resolve_target(data: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        رابط الملف واسمه (مع الامتداد) من استجابة Cobalt (tunnel/redirect)
+        
+        Raises:
+            Exception: إذا كانت الاستجابة خطأ أو بدون رابط
+        """
+        status = data.get('status')
+        
+        if status == 'tunnel' or status == 'redirect':
+            download_url = data.get('url')
+            filename = data.get('filename', 'download')
+            file_ext = CobaltDownloader._get_file_extension(filename, download_url or '')
+            if not filename.endswith(file_ext):
+                filename += file_ext
+        
+        elif status == 'error':
+            error_code = data.get('error', {}).get('code', 'unknown')
+            raise Exception(f"خطأ من Cobalt: {error_code}")
+        
+        else:
+            raise Exception(f"حالة غير معروفة من Cobalt: {status}")
+        
+        if not download_url:
+            raise Exception("لم يتم العثور على رابط التنزيل")
+        
+        return download_url, filename
+    
     @staticmethod
     def _get_file_extension(filename: str, url: str) -> str:
         """تحديد امتداد الملف"""
@@ -226,46 +339,65 @@ class CobaltDownloader:
         return '.mp4'
     
     @staticmethod
-    def download_video(url: str) -> str:
+    def _download_filepath(url: str, download_mode: str, max_bytes: int) -> Union[str, MediaAlbum]:
+        """تنزيل عبر Cobalt وإرجاع مسار الملف (أو الألبوم لاستجابة picker)"""
+        result = CobaltDownloader.download(url, download_mode=download_mode, max_bytes=max_bytes)
+        return result.get('album') or result['filepath']
+    
+    @staticmethod
+    def download_video(url: str, max_bytes: int = MAX_FILE_SIZE) -> Union[str, MediaAlbum]:
         """
         تنزيل فيديو
         
         Args:
             url: رابط الفيديو
+            max_bytes: أقصى حجم يُكتب على القرص
             
         Returns:
-            str: مسار الملف المحفوظ
+            str: مسار الملف المحفوظ (أو MediaAlbum لاستجابة picker)
         """
-        result = CobaltDownloader.download(url, download_mode='auto')
-        return result['filepath']
+        return media_cache.get_or_download(
+            DiskMediaCache.key_for_url(url, 'video'),
+            CobaltDownloader._download_filepath, url, 'auto', max_bytes
+        )
     
     @staticmethod
-    def download_audio(url: str) -> str:
+    def download_audio(url: str, max_bytes: int = MAX_FILE_SIZE) -> str:
         """
         تنزيل صوت/موسيقى
         
         Args:
             url: رابط الفيديو
+            max_bytes: أقصى حجم يُكتب على القرص
             
         Returns:
             str: مسار الملف المحفوظ
         """
-        result = CobaltDownloader.download(url, download_mode='audio')
-        return result['filepath']
+        return media_cache.get_or_download(
+            DiskMediaCache.key_for_url(url, 'audio'),
+            CobaltDownloader._download_filepath, url, 'audio', max_bytes
+        )
     
     @staticmethod
-    def download_image(url: str) -> str:
+    def download_image(url: str, max_bytes: int = MAX_FILE_SIZE) -> Union[str, MediaAlbum]:
         """
         تنزيل صورة
         
         Args:
             url: رابط الصورة
+            max_bytes: أقصى حجم يُكتب على القرص
             
         Returns:
-            str: مسار الملف المحفوظ
+            str: مسار الملف المحفوظ (أو MediaAlbum لاستجابة picker)
         """
-        result = CobaltDownloader.download(url, download_mode='auto')
-        return result['filepath']
+        return media_cache.get_or_download(
+            DiskMediaCache.key_for_url(url, 'photo'),
+            CobaltDownloader._download_filepath, url, 'auto', max_bytes
+        )
+
+
+# مجموعة خوادم Cobalt المشتركة (COBALT_API_URLS)
+cobalt_pool = CobaltPool(probe=CobaltDownloader._probe)
 
 
 # للتوافق مع الكود القديم
@@ -273,20 +405,13 @@ class UniversalDownloader:
     """واجهة موحدة لجميع المنصات"""
     
     @staticmethod
-    def download_video(url: str) -> tuple:
+    def download_video(url: str, max_bytes: int = MAX_FILE_SIZE) -> tuple:
         """تنزيل فيديو من أي منصة"""
         try:
-            filepath = CobaltDownloader.download_video(url)
+            filepath = CobaltDownloader.download_video(url, max_bytes)
             
             # تحديد المنصة من الرابط
-            if 'youtube.com' in url or 'youtu.be' in url:
-                platform = 'يوتيوب'
-            elif 'tiktok.com' in url:
-                platform = 'تيك توك'
-            elif 'instagram.com' in url:
-                platform = 'انستقرام'
-            else:
-                platform = 'منصة مدعومة'
+            platform = URLRouter.get_platform_name(url)
             
             return filepath, platform
         except Exception as e:
@@ -294,18 +419,13 @@ class UniversalDownloader:
             raise
     
     @staticmethod
-    def download_audio(url: str) -> tuple:
+    def download_audio(url: str, max_bytes: int = MAX_FILE_SIZE) -> tuple:
         """تنزيل صوت/موسيقى من أي منصة"""
         try:
-            filepath = CobaltDownloader.download_audio(url)
+            filepath = CobaltDownloader.download_audio(url, max_bytes)
             
             # تحديد المنصة من الرابط
-            if 'youtube.com' in url or 'youtu.be' in url:
-                platform = 'يوتيوب'
-            elif 'tiktok.com' in url:
-                platform = 'تيك توك'
-            else:
-                platform = 'منصة مدعومة'
+            platform = URLRouter.get_platform_name(url)
             
             return filepath, platform
         except Exception as e:
@@ -313,18 +433,13 @@ class UniversalDownloader:
             raise
     
     @staticmethod
-    def download_image(url: str) -> tuple:
+    def download_image(url: str, max_bytes: int = MAX_FILE_SIZE) -> tuple:
         """تنزيل صورة من أي منصة"""
         try:
-            filepath = CobaltDownloader.download_image(url)
+            filepath = CobaltDownloader.download_image(url, max_bytes)
             
             # تحديد المنصة من الرابط
-            if 'instagram.com' in url:
-                platform = 'انستقرام'
-            elif 'tiktok.com' in url:
-                platform = 'تيك توك'
-            else:
-                platform = 'منصة مدعومة'
+            platform = URLRouter.get_platform_name(url)
             
             return filepath, platform
         except Exception as e:
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+مجموعة خوادم Cobalt مع توزيع الحمل حسب الزمن الفعلي
+Multi-instance Cobalt pool with latency-aware load balancing
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+
+from config import (
+    COBALT_API_URLS, COBALT_INSTANCE_CONCURRENCY, COBALT_EWMA_ALPHA, SOCKET_TIMEOUT,
+)
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from hedged_race import raise_if_cancelled
+
+logger = logging.getLogger(__name__)
+
+
+class CobaltInstance:
+    """خادم Cobalt واحد: عدد الطلبات الجارية ومتوسط الزمن (EWMA) وقاطع دائرة خاص به"""
+
+    def __init__(self, url: str, max_concurrent: int, alpha: float,
+                 probe: Optional[Callable[[str], Any]] = None,
+                 on_change: Optional[Callable[[CircuitBreaker], None]] = None):
+        self.url = url
+        self.max_concurrent = max_concurrent
+        self.alpha = alpha
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.breaker = CircuitBreaker(
+            f'cobalt@{url}', probe=(lambda: probe(url)) if probe else None,
+            on_change=on_change,
+        )
+
+    @property
+    def healthy(self) -> bool:
+        return not self.breaker.is_open
+
+    def observe(self, seconds: float) -> None:
+        """تحديث المتوسط المتحرك الأسي للزمن"""
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency = self.alpha * seconds + (1 - self.alpha) * self.latency
+
+    def request(self, func: Callable[..., Any], *args,
+                is_failure: Callable[[BaseException], bool] = lambda e: True) -> Any:
+        """
+        تنفيذ طلب API على هذا الخادم: func(رابط الخادم، ...args)
+
+        الزمن يُسجل للطلبات الناجحة فقط، والأخطاء تُحسب على القاطع.
+        """
+        started = time.monotonic()
+        result = self.breaker.call(func, self.url, *args, is_failure=is_failure)
+        self.observe(time.monotonic() - started)
+        return result
+
+    async def request_async(self, func: Callable[..., Any], *args,
+                            is_failure: Callable[[BaseException], bool] = lambda e: True) -> Any:
+        """نسخة غير متزامنة من request (func دالة async)"""
+        started = time.monotonic()
+        result = await self.breaker.call_async(func, self.url, *args, is_failure=is_failure)
+        self.observe(time.monotonic() - started)
+        return result
+
+
+class CobaltPool:
+    """
+    توزيع طلبات Cobalt على عدة خوادم
+
+    - كل خادم له حد للطلبات المتزامنة (يشمل تنزيل الملف عبر tunnel)
+    - الاختيار عشوائي موزون: الوزن = 1 ÷ (EWMA للزمن × (الطلبات الجارية + 1))
+      فيأخذ الخادم الأسرع والأقل انشغالاً حصة أكبر بدون أن يُهمل الباقي
+    - الخادم الذي يفتح قاطعه يُستبعد حتى ينجح فحصه الخلفي
+    - حالة جميع الخوادم تُسجل عند كل فتح أو إغلاق لقاطع (summary)
+    """
+
+    # زمن افتراضي لخادم بدون عينات (ثانية)
+    PRIOR_LATENCY = 1.0
+    # فترة فحص الإلغاء أثناء انتظار مكان شاغر
+    WAIT_SLICE = 1.0
+    # فترة إعادة المحاولة داخل حلقة الأحداث
+    ASYNC_POLL = 0.05
+
+    def __init__(self, urls: List[str] = COBALT_API_URLS,
+                 max_concurrent: int = COBALT_INSTANCE_CONCURRENCY,
+                 alpha: float = COBALT_EWMA_ALPHA,
+                 probe: Optional[Callable[[str], Any]] = None,
+                 acquire_timeout: float = SOCKET_TIMEOUT):
+        if not urls:
+            raise ValueError("يجب تحديد خادم Cobalt واحد على الأقل")
+        self.instances = [
+            CobaltInstance(url, max_concurrent, alpha, probe, on_change=self._log_transition)
+            for url in urls
+        ]
+        self.acquire_timeout = acquire_timeout
+        self._condition = threading.Condition()
+
+    @property
+    def is_open(self) -> bool:
+        """هل جميع الخوادم مستبعدة حالياً"""
+        return not any(instance.healthy for instance in self.instances)
+
+    def _weight(self, instance: CobaltInstance, prior: float) -> float:
+        latency = instance.latency if instance.latency is not None else prior
+        return 1.0 / (max(latency, 1e-3) * (instance.in_flight + 1))
+
+    def _pick(self) -> Optional[CobaltInstance]:
+        """اختيار خادم سليم لديه مكان شاغر (يُستدعى مع القفل)"""
+        healthy = [i for i in self.instances if i.healthy]
+        if not healthy:
+            raise CircuitOpenError("جميع خوادم Cobalt معطلة مؤقتاً")
+        available = [i for i in healthy if i.in_flight < i.max_concurrent]
+        if not available:
+            return None
+
+        # الخادم الجديد يأخذ متوسط الخوادم المعروفة حتى يُقاس
+        known = [i.latency for i in healthy if i.latency is not None]
+        prior = sum(known) / len(known) if known else self.PRIOR_LATENCY
+        weights = [self._weight(i, prior) for i in available]
+        return random.choices(available, weights=weights)[0]
+
+    def _try_reserve(self) -> Optional[CobaltInstance]:
+        """حجز مكان إذا توفر (يُستدعى مع القفل)"""
+        instance = self._pick()
+        if instance is not None:
+            instance.in_flight += 1
+        return instance
+
+    def _release(self, instance: CobaltInstance) -> None:
+        with self._condition:
+            instance.in_flight -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def acquire(self) -> Iterator[CobaltInstance]:
+        """
+        حجز مكان على أحد الخوادم طوال مدة الطلب والتنزيل
+
+        Raises:
+            CircuitOpenError: إذا كانت جميع الخوادم مستبعدة
+            TimeoutError: إذا بقيت جميع الخوادم ممتلئة حتى انتهاء المهلة
+        """
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._condition:
+            while True:
+                instance = self._try_reserve()
+                if instance is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("جميع خوادم Cobalt مشغولة")
+                self._condition.wait(min(remaining, self.WAIT_SLICE))
+                raise_if_cancelled()
+
+        try:
+            yield instance
+        finally:
+            self._release(instance)
+
+    @asynccontextmanager
+    async def acquire_async(self) -> AsyncIterator[CobaltInstance]:
+        """نسخة acquire لحلقة الأحداث (تنتظر المكان الشاغر بدون حجب الحلقة)"""
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._condition:
+                instance = self._try_reserve()
+            if instance is not None:
+                break
+            if time.monotonic() >= deadline:
+                raise TimeoutError("جميع خوادم Cobalt مشغولة")
+            await asyncio.sleep(self.ASYNC_POLL)
+
+        try:
+            yield instance
+        finally:
+            self._release(instance)
+
+    def get_stats(self) -> List[dict]:
+        """حالة كل خادم للمراقبة"""
+        return [
+            {
+                'url': instance.url,
+                'in_flight': instance.in_flight,
+                'latency': instance.latency,
+                'healthy': instance.healthy,
+                'breaker': instance.breaker.get_stats(),
+            }
+            for instance in self.instances
+        ]
+
+    def summary(self) -> str:
+        """سطر لكل خادم من get_stats للسجلات"""
+        lines = []
+        for stats in self.get_stats():
+            breaker = stats['breaker']
+            latency = f"{stats['latency'] * 1000:.0f}ms" if stats['latency'] is not None else '-'
+            line = (
+                f"{stats['url']}: {breaker['state']}, جارية {stats['in_flight']}, "
+                f"الزمن {latency}, الأخطاء {breaker['error_rate']:.0%} "
+                f"من {breaker['window_calls']}, مرفوضة {breaker['rejected']}"
+            )
+            if breaker['state'] != CircuitBreaker.CLOSED:
+                line += f", مفتوح منذ {breaker['open_for']:.0f}s"
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def _log_transition(self, breaker: CircuitBreaker) -> None:
+        healthy = sum(1 for instance in self.instances if instance.healthy)
+        log = logger.warning if healthy == 0 else logger.info
+        log(
+            f"🔌 خوادم Cobalt السليمة {healthy}/{len(self.instances)} بعد تغير {breaker.name}:\n"
+            f"{self.summary()}"
+        )
+
+    def shutdown(self) -> None:
+        """إيقاف خيوط الفحص"""
+        for instance in self.instances:
+            instance.breaker.shutdown()
@@ -20,14 +20,136 @@ DOWNLOAD_FOLDER = os.getenv('DOWNLOAD_FOLDER', 'downloads')
 # ==================== حدود الملفات ====================
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB
 MIN_FILE_SIZE = 100 * 1024         # 100 KB
+# فحص حجم الوسائط من بيانات yt-dlp بالتوازي مع التنزيل وإلغاؤه إذا تجاوز حد الخطة
+MEDIA_PROBE_ENABLED = os.getenv('MEDIA_PROBE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
 
 # ==================== إعدادات التنزيل ====================
 DOWNLOAD_TIMEOUT = 300  # 5 دقائق
 SOCKET_TIMEOUT = 30     # 30 ثانية
 
+# ==================== إعدادات التنفيذ المتوازي ====================
+# عدد الخيوط المخصصة للتنزيل و ffmpeg (العمليات الطويلة)
+DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', '4'))
+# عدد الخيوط المخصصة لاستعلامات قاعدة البيانات (عمليات قصيرة)
+DB_WORKERS = int(os.getenv('DB_WORKERS', '2'))
+
+# ==================== عميل HTTP المشترك ====================
+# عدد المضيفين الذين تُحفظ اتصالاتهم، وعدد الاتصالات المفتوحة لكل مضيف
+# (التنزيل المجزأ يفتح عدة اتصالات لنفس المضيف)
+HTTP_POOL_HOSTS = 20
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', str(max(10, DOWNLOAD_WORKERS * 4))))
+# إعادة محاولة أخطاء الاتصال و 502/503/504 (GET/HEAD فقط) مع تأخير عشوائي
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '2'))
+HTTP_RETRY_BACKOFF = 0.3  # ثانية
+HTTP_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# ==================== مجلدات المهام ====================
+# كل مهمة تنزيل تعمل في مجلد مستقل داخل DOWNLOAD_FOLDER يُحذف عند انتهائها؛
+# المجلدات المهجورة الأقدم من WORKSPACE_MAX_AGE تُحذف دورياً
+WORKSPACE_MAX_AGE = int(os.getenv('WORKSPACE_MAX_AGE_MIN', '30')) * 60
+WORKSPACE_JANITOR_INTERVAL = 5 * 60  # ثانية
+
+# ==================== ذاكرة الوسائط على القرص ====================
+# ذاكرة اختيارية داخل DOWNLOAD_FOLDER لتجنب إعادة تنزيل نفس الوسائط
+DISK_CACHE_ENABLED = os.getenv('DISK_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+DISK_CACHE_MAX_BYTES = int(os.getenv('DISK_CACHE_MAX_MB', '1024')) * 1024 * 1024
+DISK_CACHE_TTL = int(os.getenv('DISK_CACHE_TTL', str(6 * 60 * 60)))  # 6 ساعات
+
+# ==================== التحوط بين طرق التنزيل ====================
+# مهلة بدء yt-dlp بالتوازي مع Cobalt (بالثواني). بدون قيمة: p90 لأزمنة Cobalt
+HEDGE_DELAY = float(os.getenv('HEDGE_DELAY')) if os.getenv('HEDGE_DELAY') else None
+# المهلة قبل جمع عينات كافية لحساب p90
+HEDGE_DEFAULT_DELAY = 8.0
+# عدد أزمنة Cobalt الأخيرة المستخدمة في الحساب
+HEDGE_LATENCY_WINDOW = 100
+
+# ==================== ترتيب طرق التنزيل ====================
+# عدد المحاولات الأخيرة المحفوظة لكل (منصة، نوع، طريقة)
+BACKEND_STATS_WINDOW = 50
+# عدد الإخفاقات المتتالية التي تجعل الطريقة معطلة
+BACKEND_MIN_SAMPLES = 5
+# مدة تخطي الطريقة المعطلة قبل تجربتها مرة أخرى (بالثواني)
+BACKEND_RETRY_AFTER = int(os.getenv('BACKEND_RETRY_AFTER', '600'))
+
+# ==================== التنزيل المجزأ ====================
+# عدد الطلبات المتوازية (Range) لتنزيل الملفات الكبيرة من الروابط المباشرة
+DOWNLOAD_CHUNKS = int(os.getenv('DOWNLOAD_CHUNKS', '4'))
+# الملفات الأصغر من هذا الحجم تُنزل بطلب واحد
+CHUNKED_MIN_SIZE = 4 * 1024 * 1024  # 4 MB
+# عدد محاولات إعادة تنزيل الجزء الفاشل
+CHUNK_RETRIES = 3
+
+# ==================== الصور ====================
+# تحويل صور WebP إلى JPEG قبل الإرسال (يتطلب Pillow، بدونه تُرسل كما هي)
+CONVERT_WEBP_TO_JPEG = os.getenv('CONVERT_WEBP_TO_JPEG', 'true').lower() in ('1', 'true', 'yes')
+
+# ==================== الرفع المباشر ====================
+# تمرير ملفات Cobalt إلى تليجرام عبر مخزن مؤقت بدلاً من حفظها على القرص
+# (يُستخدم فقط عندما تكون ذاكرة القرص معطلة)
+STREAM_UPLOADS = os.getenv('STREAM_UPLOADS', 'true').lower() in ('1', 'true', 'yes')
+# حجم المخزن في الذاكرة قبل نقله إلى ملف مؤقت
+STREAM_SPOOL_MAX_BYTES = int(os.getenv('STREAM_SPOOL_MAX_MB', '20')) * 1024 * 1024
+
+# ==================== الروابط المختصرة ====================
+# مدة الاحتفاظ بتوسيع روابط تيك توك المختصرة (vm/vt) وعدد عمليات التوسيع المتزامنة
+SHORT_LINK_TTL = int(os.getenv('SHORT_LINK_TTL', str(7 * 24 * 60 * 60)))  # 7 أيام
+SHORT_LINK_CONCURRENCY = int(os.getenv('SHORT_LINK_CONCURRENCY', '8'))
+SHORT_LINK_TIMEOUT = 5  # ثوانٍ
+SHORT_LINK_MEMORY_SIZE = int(os.getenv('SHORT_LINK_MEMORY_SIZE', '10000'))  # عدد التوسيعات في الذاكرة
+
+# ==================== صفحات تيك توك ====================
+# صفحة المنشور تُنزل مرة واحدة وتُشارك بين طرق استخراج الصور لمدة قصيرة
+TIKTOK_PAGE_TTL = int(os.getenv('TIKTOK_PAGE_TTL', '60'))  # ثوانٍ
+TIKTOK_PAGE_CACHE_SIZE = 32  # عدد الصفحات في الذاكرة
+# إرسال موسيقى منشورات الصور (الشرائح) بعد مجموعة الصور
+TIKTOK_SLIDESHOW_AUDIO = os.getenv('TIKTOK_SLIDESHOW_AUDIO', 'true').lower() in ('1', 'true', 'yes')
+
+# ==================== خوادم Cobalt ====================
+# قائمة خوادم Cobalt مفصولة بفواصل (يُوزع الحمل بينها حسب الزمن والانشغال)
+COBALT_API_URLS = [
+    url.strip() for url in os.getenv('COBALT_API_URLS', 'https://api.cobalt.tools/').split(',')
+    if url.strip()
+]
+# أقصى عدد طلبات متزامنة لكل خادم
+COBALT_INSTANCE_CONCURRENCY = int(os.getenv('COBALT_INSTANCE_CONCURRENCY', '4'))
+# معامل التنعيم لمتوسط الزمن المتحرك (EWMA)
+COBALT_EWMA_ALPHA = 0.3
+# تنفيذ طلبات Cobalt داخل حلقة الأحداث (httpx) بدلاً من خيط التنزيل
+COBALT_ASYNC = os.getenv('COBALT_ASYNC', 'true').lower() in ('1', 'true', 'yes')
+# عدد عناصر الألبوم (picker وشرائح تيك توك) التي تُنزل بالتوازي
+PICKER_CONCURRENCY = int(os.getenv('PICKER_CONCURRENCY', '4'))
+
+# ==================== قاطع الدائرة ====================
+# يُفتح القاطع إذا بلغت نسبة الأخطاء هذا الحد من آخر BREAKER_WINDOW طلب
+# (بحد أدنى BREAKER_MIN_CALLS طلبات)، وتُفحص الخدمة في الخلفية كل BREAKER_COOLDOWN ثانية
+BREAKER_ERROR_RATE = float(os.getenv('BREAKER_ERROR_RATE', '0.5'))
+BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', '5'))
+BREAKER_WINDOW = 20
+BREAKER_COOLDOWN = float(os.getenv('BREAKER_COOLDOWN', '30'))
+# مهلة طلب الفحص (ثوانٍ)
+BREAKER_PROBE_TIMEOUT = 5
+
+# ==================== حسابات انستقرام (instagrapi) ====================
+# حسابات مفصولة بفواصل بالصيغة user:password (بدونها يُستخدم عميل مجهول واحد)
+INSTAGRAM_ACCOUNTS = [
+    tuple(account.strip().split(':', 1)) for account in os.getenv('INSTAGRAM_ACCOUNTS', '').split(',')
+    if ':' in account
+]
+# مجلد حفظ جلسات الحسابات (يحتوي ملفات الارتباط - لا يُرفع إلى git)
+INSTAGRAM_SESSION_DIR = os.getenv('INSTAGRAM_SESSION_DIR', 'sessions')
+# أقصى عدد طلبات لكل حساب خلال النافذة
+INSTAGRAM_ACCOUNT_BUDGET = int(os.getenv('INSTAGRAM_ACCOUNT_BUDGET', '60'))
+INSTAGRAM_BUDGET_WINDOW = 60 * 60  # ساعة
+# مدة انتظار عميل متاح قبل الفشل
+INSTAGRAM_ACQUIRE_TIMEOUT = 10  # ثوانٍ
+# مدة تخطي الحساب بعد فشل تسجيل دخوله (تكرار المحاولة يؤدي إلى قفل الحساب)
+INSTAGRAM_LOGIN_BACKOFF = int(os.getenv('INSTAGRAM_LOGIN_BACKOFF', str(30 * 60)))  # ثوانٍ
+
 # ==================== إعدادات السجلات ====================
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# فترة تسجيل حالة خوادم Cobalt وإحصائيات السباق (ثوانٍ، 0 للتعطيل)
+STATS_LOG_INTERVAL = int(os.getenv('STATS_LOG_INTERVAL', str(10 * 60)))
 
 # ==================== إعدادات المنصات ====================
 SUPPORTED_PLATFORMS = {
@@ -10,6 +10,7 @@ from datetime import datetime, timedelta
 from enum import Enum
 import sqlite3
 import json
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -117,6 +118,32 @@ class Database:
             )
         ''')
         
+        # جدول ذاكرة ملفات تليجرام (file_id لكل وسائط تم رفعها سابقاً)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS telegram_file_cache (
+                platform TEXT NOT NULL,
+                media_id TEXT NOT NULL,
+                media_kind TEXT NOT NULL,
+                quality TEXT NOT NULL DEFAULT 'default',
+                file_id TEXT NOT NULL,
+                file_unique_id TEXT,
+                hits INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (platform, media_id, media_kind, quality)
+            )
+        ''')
+        
+        # جدول توسيع الروابط المختصرة (رابط مختصر -> رابط كامل مع مدة صلاحية)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS short_link_cache (
+                short_url TEXT PRIMARY KEY,
+                canonical_url TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
         conn.commit()
         conn.close()
         logger.info("✅ تم إنشاء جداول قاعدة البيانات")
@@ -436,6 +463,92 @@ class Database:
         usage = self.get_usage(user_id)
         return usage['downloads_today'] if usage else 0
     
+    # ==================== ذاكرة ملفات تليجرام ====================
+    
+    def get_cached_file_id(self, platform: str, media_id: str, 
+                           media_kind: str, quality: str = "default") -> str:
+        """الحصول على file_id محفوظ لوسائط تم رفعها سابقاً"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT file_id FROM telegram_file_cache 
+            WHERE platform = ? AND media_id = ? AND media_kind = ? AND quality = ?
+        ''', (platform, media_id, media_kind, quality))
+        
+        result = cursor.fetchone()
+        
+        if result:
+            cursor.execute('''
+                UPDATE telegram_file_cache 
+                SET hits = hits + 1, last_used_at = CURRENT_TIMESTAMP
+                WHERE platform = ? AND media_id = ? AND media_kind = ? AND quality = ?
+            ''', (platform, media_id, media_kind, quality))
+            conn.commit()
+        
+        conn.close()
+        return result['file_id'] if result else None
+    
+    def save_cached_file_id(self, platform: str, media_id: str, media_kind: str,
+                            file_id: str, quality: str = "default",
+                            file_unique_id: str = None) -> None:
+        """حفظ file_id الناتج عن أول رفع للوسائط"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO telegram_file_cache 
+                (platform, media_id, media_kind, quality, file_id, file_unique_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (platform, media_id, media_kind, quality, file_id, file_unique_id))
+        
+        conn.commit()
+        conn.close()
+    
+    def delete_cached_file_id(self, platform: str, media_id: str, 
+                              media_kind: str, quality: str = "default") -> None:
+        """حذف file_id لم يعد صالحاً"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            DELETE FROM telegram_file_cache 
+            WHERE platform = ? AND media_id = ? AND media_kind = ? AND quality = ?
+        ''', (platform, media_id, media_kind, quality))
+        
+        conn.commit()
+        conn.close()
+    
+    # ==================== ذاكرة الروابط المختصرة ====================
+    
+    def get_short_link(self, short_url: str) -> tuple:
+        """الحصول على (الرابط الكامل، وقت الانتهاء) لرابط مختصر لم تنتهِ صلاحيته، أو None"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT canonical_url, expires_at FROM short_link_cache 
+            WHERE short_url = ? AND expires_at > ?
+        ''', (short_url, time.time()))
+        
+        result = cursor.fetchone()
+        conn.close()
+        return (result['canonical_url'], result['expires_at']) if result else None
+    
+    def save_short_link(self, short_url: str, canonical_url: str, expires_at: float) -> None:
+        """حفظ توسيع رابط مختصر مع حذف التوسيعات المنتهية"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO short_link_cache (short_url, canonical_url, expires_at)
+            VALUES (?, ?, ?)
+        ''', (short_url, canonical_url, expires_at))
+        cursor.execute('DELETE FROM short_link_cache WHERE expires_at <= ?', (time.time(),))
+        
+        conn.commit()
+        conn.close()
+    
     # ==================== عمليات الإحصائيات ====================
     
     def get_statistics(self) -> dict:
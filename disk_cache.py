@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ذاكرة الوسائط على القرص مع حد للحجم وإخلاء LRU
+Bounded on-disk media cache with LRU/TTL eviction
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Optional, Dict, Any, Tuple
+
+from config import (
+    DOWNLOAD_FOLDER, DOWNLOAD_TIMEOUT, DISK_CACHE_ENABLED, DISK_CACHE_MAX_BYTES, DISK_CACHE_TTL,
+)
+from url_router import URLRouter
+
+logger = logging.getLogger(__name__)
+
+
+class DiskMediaCache:
+    """
+    ذاكرة ملفات الوسائط داخل DOWNLOAD_FOLDER/cache
+
+    كل عنصر يُحفظ في مجلد خاص باسم مشتق من المفتاح مع الاحتفاظ باسم الملف
+    الأصلي (يظهر في تليجرام عند إرسال الصوت). الفهرس يُحفظ في index.json
+    حتى يبقى صالحاً بعد إعادة التشغيل، والملفات تدخل الذاكرة بإعادة تسمية
+    ذرية بعد اكتمالها فلا يُقرأ ملف ناقص أبداً.
+
+    كل مسار تعيده get() أو put() يُثبَّت حتى يستدعي المستخدم release() بعد
+    الإرسال، والإخلاء وانتهاء الصلاحية يتخطيان العناصر المثبتة فلا يُحذف
+    ملف أثناء رفعه. التثبيت الذي لم يُحرر خلال PIN_TTL يُهمل حتى لا يمنع
+    مستدعٍ نسي release() الإخلاء إلى الأبد. وقت آخر استخدام يُحفظ في الفهرس
+    كل INDEX_FLUSH_INTERVAL ثانية على الأكثر بدلاً من كل قراءة.
+    """
+
+    INDEX_FILE = 'index.json'
+    PART_SUFFIX = '.part'
+    # مدة صلاحية التثبيت (أطول من أي تنزيل + رفع)
+    PIN_TTL = 2 * DOWNLOAD_TIMEOUT
+    # أقصى مدة قبل حفظ أوقات الاستخدام المعدلة في الفهرس
+    INDEX_FLUSH_INTERVAL = 60
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DISK_CACHE_MAX_BYTES,
+                 ttl: int = DISK_CACHE_TTL, enabled: bool = DISK_CACHE_ENABLED):
+        self.root = os.path.abspath(root or os.path.join(DOWNLOAD_FOLDER, 'cache'))
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.RLock()
+        self._index: Dict[str, Dict[str, Any]] = {}
+        # المسار -> (عدد التثبيتات، وقت آخر تثبيت)
+        self._pins: Dict[str, Tuple[int, float]] = {}
+        self._dirty = False
+        self._last_flush = 0.0
+
+        if self.enabled:
+            os.makedirs(self.root, exist_ok=True)
+            self._load_index()
+
+    # ==================== المفاتيح ====================
+
+    @staticmethod
+    def make_key(platform: str, media_id: str, media_kind: str, quality: str = 'default') -> str:
+        """بناء مفتاح الذاكرة من معرف الوسائط"""
+        return f'{platform}:{media_id}:{media_kind}:{quality}'
+
+    @staticmethod
+    def key_for_url(url: str, media_kind: str) -> Optional[str]:
+        """مفتاح الذاكرة للرابط (None إذا تعذر تحديد معرف الوسائط)"""
+        media_key = URLRouter.get_media_key(url)
+        if not media_key:
+            return None
+        return DiskMediaCache.make_key(media_key[0], media_key[1], media_kind)
+
+    def _entry_dir(self, key: str) -> str:
+        """مجلد العنصر داخل الذاكرة"""
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.root, digest)
+
+    # ==================== الفهرس ====================
+
+    def _load_index(self) -> None:
+        """تحميل الفهرس وحذف العناصر التالفة أو الملفات الناقصة"""
+        path = os.path.join(self.root, self.INDEX_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+        except FileNotFoundError:
+            self._index = {}
+        except Exception as e:
+            logger.warning(f"فهرس ذاكرة القرص تالف، سيتم إعادة بنائه: {str(e)}")
+            self._index = {}
+
+        # حذف العناصر التي فُقدت ملفاتها
+        for key in list(self._index):
+            if not os.path.exists(self._index[key].get('path', '')):
+                del self._index[key]
+
+        # حذف المجلدات غير المفهرسة (بقايا تنزيلات لم تكتمل)
+        known = {os.path.dirname(entry['path']) for entry in self._index.values()}
+        for name in os.listdir(self.root):
+            full = os.path.join(self.root, name)
+            if os.path.isdir(full) and full not in known:
+                shutil.rmtree(full, ignore_errors=True)
+
+        self._evict()
+        self._save_index()
+        logger.info(f"✅ ذاكرة القرص: {len(self._index)} عنصر ({self.total_bytes() / (1024 * 1024):.1f} MB)")
+
+    def _save_index(self) -> None:
+        """حفظ الفهرس بكتابة ذرية"""
+        path = os.path.join(self.root, self.INDEX_FILE)
+        tmp_path = path + self.PART_SUFFIX
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, path)
+            self._dirty = False
+            self._last_flush = time.time()
+        except Exception as e:
+            logger.warning(f"فشل حفظ فهرس ذاكرة القرص: {str(e)}")
+
+    def flush(self) -> None:
+        """حفظ أوقات الاستخدام المعدلة في الفهرس"""
+        with self._lock:
+            if self.enabled and self._dirty:
+                self._save_index()
+
+    # ==================== التثبيت ====================
+
+    def _pin(self, path: str) -> None:
+        count, _ = self._pins.get(path, (0, 0.0))
+        self._pins[path] = (count + 1, time.time())
+
+    def _is_pinned(self, path: str) -> bool:
+        pin = self._pins.get(path)
+        if pin is None:
+            return False
+        if time.time() - pin[1] > self.PIN_TTL:
+            logger.warning(f"تثبيت منتهٍ في ذاكرة القرص (release() لم يُستدعَ): {path}")
+            del self._pins[path]
+            return False
+        return True
+
+    def release(self, path: str) -> None:
+        """تحرير مسار أعادته get() أو put() بعد انتهاء استخدامه"""
+        with self._lock:
+            pin = self._pins.get(path)
+            if pin is None:
+                return
+            if pin[0] <= 1:
+                del self._pins[path]
+            else:
+                self._pins[path] = (pin[0] - 1, pin[1])
+
+    # ==================== العمليات ====================
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        البحث عن ملف في الذاكرة وتثبيته (يجب استدعاء release() بعد استخدامه)
+
+        Returns:
+            str: مسار الملف أو None إذا لم يوجد أو انتهت صلاحيته
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._index.get(key)
+            if not entry:
+                return None
+
+            now = time.time()
+            if now - entry['created_at'] > self.ttl or not os.path.exists(entry['path']):
+                # العنصر المثبت يبقى على القرص حتى يُحرر ويُحذف في إخلاء لاحق
+                if self._remove(key):
+                    self._save_index()
+                return None
+
+            entry['last_access'] = now
+            self._dirty = True
+            if now - self._last_flush >= self.INDEX_FLUSH_INTERVAL:
+                self._save_index()
+            self._pin(entry['path'])
+            logger.info(f"⚡ من ذاكرة القرص: {key}")
+            return entry['path']
+
+    def put(self, key: str, src_path: str) -> str:
+        """
+        نقل ملف مكتمل إلى الذاكرة
+
+        Args:
+            key: مفتاح الذاكرة
+            src_path: مسار الملف المنزل
+
+        Returns:
+            str: المسار الجديد داخل الذاكرة مثبتاً كما في get() (أو المسار الأصلي
+                 إذا كانت الذاكرة معطلة أو لم يُضف الملف)
+        """
+        # الألبومات (MediaAlbum) لا تُحفظ في الذاكرة
+        if not self.enabled or not isinstance(src_path, str) or not os.path.exists(src_path):
+            return src_path
+
+        size = os.path.getsize(src_path)
+        if size > self.max_bytes:
+            return src_path
+
+        entry_dir = self._entry_dir(key)
+        final_path = os.path.join(entry_dir, os.path.basename(src_path))
+
+        try:
+            with self._lock:
+                # نسخة صالحة موجودة (مثل نتيجة الطريقة الفائزة في السباق): تبقى كما هي
+                existing = self.get(key)
+                if existing:
+                    os.remove(src_path)
+                    return existing
+
+                # نسخة منتهية ما زالت قيد الإرسال: الملف الجديد لا يحل محلها
+                if not self._remove(key):
+                    return src_path
+                os.makedirs(entry_dir, exist_ok=True)
+
+                # النقل إلى ملف مؤقت ثم إعادة تسمية ذرية
+                part_path = final_path + self.PART_SUFFIX
+                shutil.move(src_path, part_path)
+                os.replace(part_path, final_path)
+
+                now = time.time()
+                self._index[key] = {
+                    'path': final_path,
+                    'size': size,
+                    'created_at': now,
+                    'last_access': now,
+                }
+                self._evict(keep=key)
+                self._save_index()
+                self._pin(final_path)
+            return final_path
+        except Exception as e:
+            logger.warning(f"فشل إضافة الملف إلى ذاكرة القرص: {str(e)}")
+            return src_path if os.path.exists(src_path) else final_path
+
+    def get_or_download(self, key: Optional[str], download_func, *args, **kwargs) -> str:
+        """
+        إرجاع الملف من الذاكرة أو تنزيله وإضافته إليها
+
+        Args:
+            key: مفتاح الذاكرة (None لتجاوز الذاكرة)
+            download_func: دالة التنزيل التي تُرجع مسار الملف
+            *args, **kwargs: معاملات دالة التنزيل
+
+        Returns:
+            str: مسار الملف
+        """
+        if key:
+            cached = self.get(key)
+            if cached:
+                return cached
+
+        filename = download_func(*args, **kwargs)
+        return self.put(key, filename) if key else filename
+
+    def owns(self, path: str) -> bool:
+        """التحقق من أن الملف مملوك للذاكرة (يجب عدم حذفه بعد الإرسال)"""
+        if not self.enabled or not path:
+            return False
+        return os.path.abspath(path).startswith(self.root + os.sep)
+
+    def total_bytes(self) -> int:
+        """الحجم الكلي للملفات المخزنة"""
+        return sum(entry['size'] for entry in self._index.values())
+
+    # ==================== الإخلاء ====================
+
+    def _remove(self, key: str) -> bool:
+        """حذف عنصر من الذاكرة والقرص (False إذا كان مثبتاً فيبقى كما هو)"""
+        entry = self._index.get(key)
+        if not entry:
+            return True
+        if self._is_pinned(entry['path']):
+            return False
+        del self._index[key]
+        shutil.rmtree(os.path.dirname(entry['path']), ignore_errors=True)
+        return True
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """حذف العناصر المنتهية ثم الأقدم استخداماً حتى يعود الحجم ضمن الحد"""
+        now = time.time()
+        for key in [k for k, e in self._index.items() if now - e['created_at'] > self.ttl]:
+            self._remove(key)
+
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            if key == keep or not self._remove(key):
+                continue
+            total -= entry['size']
+            logger.info(f"🧹 إخلاء من ذاكرة القرص: {key}")
+
+
+# نسخة مشتركة تستخدمها وحدات التنزيل
+media_cache = DiskMediaCache()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+منفذ العمليات الحاجبة خارج حلقة الأحداث
+Bounded executor for blocking download, ffmpeg and SQLite calls
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from config import DOWNLOAD_WORKERS, DB_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadExecutor:
+    """
+    مجمعات خيوط محدودة لتشغيل العمليات الحاجبة
+
+    التنزيلات (yt-dlp / Cobalt / ffmpeg) تعمل على مجمع منفصل عن استعلامات
+    SQLite حتى لا تنتظر الاستعلامات القصيرة خلف تنزيل يستغرق دقائق.
+    """
+
+    _download_pool: Optional[ThreadPoolExecutor] = None
+    _db_pool: Optional[ThreadPoolExecutor] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_download_pool(cls) -> ThreadPoolExecutor:
+        """الحصول على مجمع خيوط التنزيل (يُنشأ عند أول استخدام)"""
+        with cls._lock:
+            if cls._download_pool is None:
+                cls._download_pool = ThreadPoolExecutor(
+                    max_workers=max(1, DOWNLOAD_WORKERS),
+                    thread_name_prefix='download'
+                )
+                logger.info(f"✅ تم إنشاء مجمع التنزيل ({DOWNLOAD_WORKERS} خيوط)")
+            return cls._download_pool
+
+    @classmethod
+    def get_db_pool(cls) -> ThreadPoolExecutor:
+        """الحصول على مجمع خيوط قاعدة البيانات (يُنشأ عند أول استخدام)"""
+        with cls._lock:
+            if cls._db_pool is None:
+                cls._db_pool = ThreadPoolExecutor(
+                    max_workers=max(1, DB_WORKERS),
+                    thread_name_prefix='db'
+                )
+            return cls._db_pool
+
+    @staticmethod
+    async def _run(pool: ThreadPoolExecutor, func: Callable, *args, **kwargs) -> Any:
+        """تشغيل دالة حاجبة على مجمع معين وانتظار نتيجتها"""
+        loop = asyncio.get_running_loop()
+        if kwargs:
+            func = functools.partial(func, **kwargs)
+        return await loop.run_in_executor(pool, func, *args)
+
+    @classmethod
+    async def run_download(cls, func: Callable, *args, **kwargs) -> Any:
+        """
+        تشغيل عملية تنزيل/تحويل حاجبة دون تجميد حلقة الأحداث
+
+        Args:
+            func: الدالة الحاجبة (مثل MediaDownloader.download_video)
+            *args, **kwargs: معاملات الدالة
+
+        Returns:
+            نتيجة الدالة
+        """
+        return await cls._run(cls.get_download_pool(), func, *args, **kwargs)
+
+    @classmethod
+    async def run_db(cls, func: Callable, *args, **kwargs) -> Any:
+        """تشغيل استعلام SQLite حاجب دون تجميد حلقة الأحداث"""
+        return await cls._run(cls.get_db_pool(), func, *args, **kwargs)
+
+    @classmethod
+    def shutdown(cls, wait: bool = True) -> None:
+        """إيقاف مجمعات الخيوط"""
+        with cls._lock:
+            for pool in (cls._download_pool, cls._db_pool):
+                if pool is not None:
+                    pool.shutdown(wait=wait, cancel_futures=True)
+            cls._download_pool = None
+            cls._db_pool = None
+        logger.info("⏹️ تم إيقاف مجمعات التنفيذ")
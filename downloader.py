@@ -9,10 +9,18 @@ Video, Image, and Audio downloader module
 import os
 import logging
 from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple, Union
 import yt_dlp
-import requests
-from config import DOWNLOAD_FOLDER, SOCKET_TIMEOUT
+from config import SOCKET_TIMEOUT, MAX_FILE_SIZE
+from disk_cache import DiskMediaCache, media_cache
+from url_router import URLRouter
+from job_workspace import job_folder
+from short_link_resolver import short_link_resolver
+from media_probe import SizeConstrainedFormat
+from video_compat import VideoCompat
+from hedged_race import DownloadCancelled, ytdlp_cancel_hook
+from backend_stats import backend_stats
+from media_album import MediaAlbum
 
 logger = logging.getLogger(__name__)
 
@@ -36,54 +44,42 @@ class MediaDownloader:
     @staticmethod
     def is_youtube_url(url: str) -> bool:
         """التحقق من أن الرابط من يوتيوب"""
-        return 'youtube.com' in url or 'youtu.be' in url
+        return URLRouter.get_platform(url) == 'youtube'
 
     @staticmethod
     def is_tiktok_url(url: str) -> bool:
         """التحقق من أن الرابط من تيك توك"""
-        return 'tiktok.com' in url or 'vm.tiktok.com' in url or 'vt.tiktok.com' in url
+        return URLRouter.get_platform(url) == 'tiktok'
 
     @staticmethod
     def is_instagram_url(url: str) -> bool:
         """التحقق من أن الرابط من انستقرام"""
-        return 'instagram.com' in url or 'ig.me' in url
+        return URLRouter.get_platform(url) == 'instagram'
     
     @staticmethod
     def is_valid_url(url: str) -> bool:
         """التحقق من صحة الرابط"""
-        return (MediaDownloader.is_youtube_url(url) or 
-                MediaDownloader.is_tiktok_url(url) or 
-                MediaDownloader.is_instagram_url(url))
+        return URLRouter.parse(url) is not None
 
     @staticmethod
     def _expand_tiktok_url(url: str) -> str:
-        """توسيع رابط تيك توك المختصر إلى الرابط الكامل"""
-        try:
-            if 'vt.tiktok.com' in url or 'vm.tiktok.com' in url:
-                response = requests.head(url, allow_redirects=True, timeout=5)
-                if response.status_code == 200:
-                    logger.info(f"تم توسيع رابط تيك توك من {url} إلى {response.url}")
-                    return response.url
-        except Exception as e:
-            logger.warning(f"فشل توسيع رابط تيك توك: {str(e)}")
-        return url
+        """توسيع رابط تيك توك المختصر إلى الرابط الكامل (مع ذاكرة التوسيعات)"""
+        return short_link_resolver.resolve_sync(url)
 
     @staticmethod
-    def _get_ydl_opts_video(output_template: str) -> dict:
-        """الحصول على خيارات yt-dlp لتنزيل الفيديو"""
+    def _get_ydl_opts_video(output_template: str, max_bytes: int = MAX_FILE_SIZE) -> dict:
+        """الحصول على خيارات yt-dlp لتنزيل الفيديو (أعلى جودة ضمن ميزانية الحجم)"""
         return {
-            'format': 'best[ext=mp4]/best',
-            'outtmpl': os.path.join(DOWNLOAD_FOLDER, output_template),
+            'format': SizeConstrainedFormat(max_bytes),
+            'outtmpl': os.path.join(job_folder(), output_template),
             'quiet': True,
             'no_warnings': True,
             'socket_timeout': SOCKET_TIMEOUT,
+            'progress_hooks': [ytdlp_cancel_hook],
             'http_headers': {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             },
-            'postprocessors': [{
-                'key': 'FFmpegVideoConvertor',
-                'preferedformat': 'mp4'
-            }],
+            # بدون FFmpegVideoConvertor: التحويل يتم بعد التنزيل عبر VideoCompat عند الحاجة فقط
         }
 
     @staticmethod
@@ -91,10 +87,11 @@ class MediaDownloader:
         """الحصول على خيارات yt-dlp لتنزيل الصور"""
         return {
             'format': 'best',
-            'outtmpl': os.path.join(DOWNLOAD_FOLDER, output_template),
+            'outtmpl': os.path.join(job_folder(), output_template),
             'quiet': True,
             'no_warnings': True,
             'socket_timeout': SOCKET_TIMEOUT,
+            'progress_hooks': [ytdlp_cancel_hook],
             'http_headers': {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             },
@@ -109,10 +106,11 @@ class MediaDownloader:
         """الحصول على خيارات yt-dlp لتنزيل الأصوات"""
         return {
             'format': 'bestaudio/best',
-            'outtmpl': os.path.join(DOWNLOAD_FOLDER, output_template),
+            'outtmpl': os.path.join(job_folder(), output_template),
             'quiet': True,
             'no_warnings': True,
             'socket_timeout': SOCKET_TIMEOUT,
+            'progress_hooks': [ytdlp_cancel_hook],
             'http_headers': {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             },
@@ -124,15 +122,28 @@ class MediaDownloader:
         }
 
     @staticmethod
-    def download_youtube_video(url: str) -> str:
+    def _extract(ydl: yt_dlp.YoutubeDL, url: str, info: Optional[dict] = None) -> dict:
+        """التنزيل بـ yt-dlp، بإعادة استخدام بيانات الفحص إذا توفرت بدلاً من استخراج الصفحة مرة أخرى"""
+        if info:
+            try:
+                return ydl.process_ie_result(ydl.sanitize_info(info, remove_private_keys=True), download=True)
+            except DownloadCancelled:
+                raise
+            except Exception as e:
+                logger.warning(f"فشل التنزيل من بيانات الفحص، إعادة الاستخراج: {str(e)}")
+        return ydl.extract_info(url, download=True)
+
+    @staticmethod
+    def download_youtube_video(url: str, max_bytes: int = MAX_FILE_SIZE,
+                               info: Optional[dict] = None) -> str:
         """تنزيل فيديو من يوتيوب"""
         try:
             logger.info(f"جاري تنزيل فيديو يوتيوب: {url}")
-            ydl_opts = MediaDownloader._get_ydl_opts_video('youtube_video_%(title)s.%(ext)s')
+            ydl_opts = MediaDownloader._get_ydl_opts_video('youtube_video_%(title)s.%(ext)s', max_bytes)
 
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                filename = ydl.prepare_filename(info)
+                info = MediaDownloader._extract(ydl, url, info)
+                filename = VideoCompat.ensure_compatible(ydl.prepare_filename(info))
                 logger.info(f"تم تنزيل فيديو يوتيوب بنجاح: {filename}")
                 return filename
         except Exception as e:
@@ -140,14 +151,14 @@ class MediaDownloader:
             raise
 
     @staticmethod
-    def download_youtube_audio(url: str) -> str:
+    def download_youtube_audio(url: str, info: Optional[dict] = None) -> str:
         """تنزيل صوت/موسيقى من يوتيوب"""
         try:
             logger.info(f"جاري تنزيل صوت يوتيوب: {url}")
             ydl_opts = MediaDownloader._get_ydl_opts_audio('youtube_audio_%(title)s.%(ext)s')
 
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+                info = MediaDownloader._extract(ydl, url, info)
                 base_filename = os.path.splitext(ydl.prepare_filename(info))[0]
                 mp3_file = base_filename + '.mp3'
                 
@@ -162,15 +173,16 @@ class MediaDownloader:
             raise
 
     @staticmethod
-    def download_tiktok_video(url: str) -> str:
+    def download_tiktok_video(url: str, max_bytes: int = MAX_FILE_SIZE,
+                              info: Optional[dict] = None) -> str:
         """تنزيل فيديو من تيك توك"""
         try:
             logger.info(f"جاري تنزيل فيديو تيك توك: {url}")
-            ydl_opts = MediaDownloader._get_ydl_opts_video('tiktok_video_%(id)s.%(ext)s')
+            ydl_opts = MediaDownloader._get_ydl_opts_video('tiktok_video_%(id)s.%(ext)s', max_bytes)
 
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                filename = ydl.prepare_filename(info)
+                info = MediaDownloader._extract(ydl, url, info)
+                filename = VideoCompat.ensure_compatible(ydl.prepare_filename(info))
                 logger.info(f"تم تنزيل فيديو تيك توك بنجاح: {filename}")
                 return filename
         except Exception as e:
@@ -178,14 +190,14 @@ class MediaDownloader:
             raise
 
     @staticmethod
-    def download_tiktok_audio(url: str) -> str:
+    def download_tiktok_audio(url: str, info: Optional[dict] = None) -> str:
         """تنزيل صوت/موسيقى من تيك توك"""
         try:
             logger.info(f"جاري تنزيل صوت تيك توك: {url}")
             ydl_opts = MediaDownloader._get_ydl_opts_audio('tiktok_audio_%(id)s.%(ext)s')
 
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+                info = MediaDownloader._extract(ydl, url, info)
                 base_filename = os.path.splitext(ydl.prepare_filename(info))[0]
                 mp3_file = base_filename + '.mp3'
                 
@@ -200,54 +212,51 @@ class MediaDownloader:
             raise
 
     @staticmethod
-    def download_tiktok_image(url: str) -> str:
-        """تنزيل صورة من تيك توك باستخدام طرق متعددة"""
+    def download_tiktok_image(url: str) -> Union[str, MediaAlbum]:
+        """تنزيل صورة من تيك توك باستخدام طرق متعددة (منشور الصور يُنزل كاملاً كألبوم)"""
         try:
             logger.info(f"جاري تنزيل صورة تيك توك: {url}")
             
-            # الطريقة 1: معالج TikTok Photo API (الأفضل)
+            methods = []
+            
+            # معالج TikTok Photo API
             if TIKTOK_PHOTO_API_AVAILABLE:
-                try:
-                    logger.info("محاولة TikTok Photo API...")
-                    filename = TikTokPhotoDownloader.download(url)
-                    logger.info(f"تم تنزيل الصورة بنجاح: {filename}")
-                    return filename
-                except Exception as e:
-                    logger.warning(f"فشل TikTok Photo API: {str(e)}")
+                methods.append(('photo_api', lambda: TikTokPhotoDownloader.download(url)))
             
-            # الطريقة 2: معالج الصور البديل
+            # معالج الصور البديل
             if TIKTOK_IMAGE_HANDLER_AVAILABLE:
-                try:
-                    logger.info("محاولة TikTok Image Handler...")
-                    filename = TikTokImageHandler.download_tiktok_image(url)
-                    logger.info(f"تم تنزيل الصورة بنجاح: {filename}")
-                    return filename
-                except Exception as e:
-                    logger.warning(f"فشل TikTok Image Handler: {str(e)}")
+                methods.append(('image_handler', lambda: TikTokImageHandler.download_tiktok_image(url)))
             
-            # الطريقة 3: yt-dlp (البديل الأخير)
-            logger.info("محاولة yt-dlp...")
-            ydl_opts = MediaDownloader._get_ydl_opts_image('tiktok_image_%(id)s.%(ext)s')
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                filename = ydl.prepare_filename(info)
-                logger.info(f"تم تنزيل الصورة بنجاح: {filename}")
-                return filename
+            # yt-dlp
+            methods.append(('ytdlp', lambda: MediaDownloader._download_tiktok_image_ytdlp(url)))
+            
+            filename = backend_stats.run('tiktok', 'photo', methods)
+            logger.info(f"تم تنزيل الصورة بنجاح: {filename}")
+            return filename
         except Exception as e:
             logger.error(f"خطأ في تنزيل صورة تيك توك: {str(e)}")
             raise
 
     @staticmethod
-    def download_instagram_video(url: str) -> str:
+    def _download_tiktok_image_ytdlp(url: str) -> str:
+        """تنزيل صورة تيك توك عبر yt-dlp"""
+        ydl_opts = MediaDownloader._get_ydl_opts_image('tiktok_image_%(id)s.%(ext)s')
+
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+            return ydl.prepare_filename(info)
+
+    @staticmethod
+    def download_instagram_video(url: str, max_bytes: int = MAX_FILE_SIZE,
+                                 info: Optional[dict] = None) -> str:
         """تنزيل فيديو من انستقرام"""
         try:
             logger.info(f"جاري تنزيل فيديو انستقرام: {url}")
-            ydl_opts = MediaDownloader._get_ydl_opts_video('instagram_video_%(id)s.%(ext)s')
+            ydl_opts = MediaDownloader._get_ydl_opts_video('instagram_video_%(id)s.%(ext)s', max_bytes)
 
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                filename = ydl.prepare_filename(info)
+                info = MediaDownloader._extract(ydl, url, info)
+                filename = VideoCompat.ensure_compatible(ydl.prepare_filename(info))
                 logger.info(f"تم تنزيل فيديو انستقرام بنجاح: {filename}")
                 return filename
         except Exception as e:
@@ -271,12 +280,15 @@ class MediaDownloader:
             raise
 
     @staticmethod
-    def download_video(url: str) -> Tuple[str, str]:
+    def download_video(url: str, max_bytes: int = MAX_FILE_SIZE,
+                       info: Optional[dict] = None) -> Tuple[str, str]:
         """
         تنزيل الفيديو من المنصة المناسبة
         
         Args:
             url: رابط الفيديو
+            max_bytes: ميزانية حجم الملف لاختيار الصيغة
+            info: بيانات yt-dlp من الفحص المسبق (إن وجدت)
             
         Returns:
             tuple: (اسم الملف، اسم المنصة)
@@ -285,14 +297,23 @@ class MediaDownloader:
             ValueError: إذا كان الرابط غير مدعوم
         """
         if MediaDownloader.is_youtube_url(url):
-            filename = MediaDownloader.download_youtube_video(url)
+            filename = media_cache.get_or_download(
+                DiskMediaCache.key_for_url(url, 'video'),
+                MediaDownloader.download_youtube_video, url, max_bytes, info
+            )
             return filename, "يوتيوب"
         elif MediaDownloader.is_tiktok_url(url):
             expanded_url = MediaDownloader._expand_tiktok_url(url)
-            filename = MediaDownloader.download_tiktok_video(expanded_url)
+            filename = media_cache.get_or_download(
+                DiskMediaCache.key_for_url(expanded_url, 'video'),
+                MediaDownloader.download_tiktok_video, expanded_url, max_bytes, info
+            )
             return filename, "تيك توك"
         elif MediaDownloader.is_instagram_url(url):
-            filename = MediaDownloader.download_instagram_video(url)
+            filename = media_cache.get_or_download(
+                DiskMediaCache.key_for_url(url, 'video'),
+                MediaDownloader.download_instagram_video, url, max_bytes, info
+            )
             return filename, "انستقرام"
         else:
             raise ValueError(
@@ -300,12 +321,13 @@ class MediaDownloader:
             )
 
     @staticmethod
-    def download_audio(url: str) -> Tuple[str, str]:
+    def download_audio(url: str, info: Optional[dict] = None) -> Tuple[str, str]:
         """
         تنزيل الصوت/الموسيقى من المنصة المناسبة
         
         Args:
             url: رابط الفيديو
+            info: بيانات yt-dlp من الفحص المسبق (إن وجدت)
             
         Returns:
             tuple: (اسم الملف، اسم المنصة)
@@ -314,11 +336,17 @@ class MediaDownloader:
             ValueError: إذا كان الرابط غير مدعوم
         """
         if MediaDownloader.is_youtube_url(url):
-            filename = MediaDownloader.download_youtube_audio(url)
+            filename = media_cache.get_or_download(
+                DiskMediaCache.key_for_url(url, 'audio'),
+                MediaDownloader.download_youtube_audio, url, info
+            )
             return filename, "يوتيوب"
         elif MediaDownloader.is_tiktok_url(url):
             expanded_url = MediaDownloader._expand_tiktok_url(url)
-            filename = MediaDownloader.download_tiktok_audio(expanded_url)
+            filename = media_cache.get_or_download(
+                DiskMediaCache.key_for_url(expanded_url, 'audio'),
+                MediaDownloader.download_tiktok_audio, expanded_url, info
+            )
             return filename, "تيك توك"
         else:
             raise ValueError(
@@ -340,11 +368,17 @@ class MediaDownloader:
             ValueError: إذا كان الرابط غير مدعوم
         """
         if MediaDownloader.is_instagram_url(url):
-            filename = MediaDownloader.download_instagram_image(url)
+            filename = media_cache.get_or_download(
+                DiskMediaCache.key_for_url(url, 'photo'),
+                MediaDownloader.download_instagram_image, url
+            )
             return filename, "انستقرام"
         elif MediaDownloader.is_tiktok_url(url):
             expanded_url = MediaDownloader._expand_tiktok_url(url)
-            filename = MediaDownloader.download_tiktok_image(expanded_url)
+            filename = media_cache.get_or_download(
+                DiskMediaCache.key_for_url(expanded_url, 'photo'),
+                MediaDownloader.download_tiktok_image, expanded_url
+            )
             return filename, "تيك توك"
         else:
             raise ValueError(
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+سباق متحوّط بين طرق التنزيل (Cobalt ثم yt-dlp بعد مهلة)
+Hedged racing of download backends with cooperative cancellation
+"""
+
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import (
+    DOWNLOAD_WORKERS, SOCKET_TIMEOUT,
+    HEDGE_DELAY, HEDGE_DEFAULT_DELAY, HEDGE_LATENCY_WINDOW,
+)
+from media_probe import MediaTooLargeError
+
+logger = logging.getLogger(__name__)
+
+# حدث الإلغاء الخاص بالطريقة التي تعمل في الخيط الحالي
+_cancel_event: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar(
+    'hedge_cancel_event', default=None
+)
+
+# المهمة الحارسة للسباق الحالي (فحص الحجم): الطرق تنتظرها قبل قراءة بايتات الوسائط
+_guard: contextvars.ContextVar[Optional[Future]] = contextvars.ContextVar(
+    'hedge_guard', default=None
+)
+
+# فترة فحص الإلغاء أثناء انتظار الحارس
+GUARD_POLL = 0.5
+
+
+class DownloadCancelled(Exception):
+    """تم إلغاء التنزيل لأن طريقة أخرى فازت بالسباق"""
+
+
+def current_cancel_event() -> Optional[threading.Event]:
+    """حدث الإلغاء للطريقة الحالية (None خارج السباق)"""
+    return _cancel_event.get()
+
+
+def raise_if_cancelled(event: Optional[threading.Event] = None) -> None:
+    """إيقاف التنزيل الخاسر عند أول نقطة فحص"""
+    event = event or _cancel_event.get()
+    if event is not None and event.is_set():
+        raise DownloadCancelled("تم إلغاء التنزيل (فازت طريقة أخرى)")
+
+
+@contextmanager
+def bind_guard(guard: Optional[Future]) -> Iterator[None]:
+    """ربط حارس السباق بالسياق الحالي (خيط أو مهمة asyncio)"""
+    token = _guard.set(guard)
+    try:
+        yield
+    finally:
+        _guard.reset(token)
+
+
+def current_guard() -> Optional[Future]:
+    """حارس السباق الحالي (None خارج السباق أو بدون فحص)"""
+    return _guard.get()
+
+
+def wait_for_guard() -> None:
+    """
+    انتظار نجاح الحارس قبل تنزيل البايتات (طلب API يمكن أن يسبقه بالتوازي)
+
+    Raises:
+        DownloadCancelled: إذا أُلغيت الطريقة أثناء الانتظار
+        خطأ الحارس (مثل MediaTooLargeError) إذا رفض الوسائط
+    """
+    guard = _guard.get()
+    if guard is None:
+        return
+    while not wait([guard], timeout=GUARD_POLL).done:
+        raise_if_cancelled()
+    guard.result()
+
+
+async def wait_for_guard_async() -> None:
+    """wait_for_guard داخل حلقة الأحداث (الإلغاء يتم بإلغاء المهمة)"""
+    guard = _guard.get()
+    if guard is None:
+        return
+    while not guard.done():
+        await asyncio.sleep(GUARD_POLL)
+    guard.result()
+
+
+def ytdlp_cancel_hook(status: dict) -> None:
+    """progress_hook لـ yt-dlp يوقف التنزيل الخاسر"""
+    raise_if_cancelled()
+
+
+class LatencyTracker:
+    """نافذة منزلقة لأزمنة الطريقة الأساسية لحساب النسب المئوية"""
+
+    MIN_SAMPLES = 10
+
+    def __init__(self, window: int = HEDGE_LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """النسبة المئوية، أو None إذا لم تكفِ العينات"""
+        with self._lock:
+            if len(self._samples) < self.MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[int(fraction * (len(ordered) - 1))]
+
+
+class _LegSlot:
+    """
+    مكان خيط طريقة في حد الخيوط الحية، يُحرر مرة واحدة عند خروج الخيط فقط
+
+    الطريقة الملغاة تنتقل إلى حد الخاسرات العالقة إذا وُجد فيه مكان، فيعود
+    مكانها في max_workers للسباقات الجديدة مع بقاء خيطها محسوباً.
+    """
+
+    def __init__(self, slots: threading.Semaphore, stragglers: threading.Semaphore):
+        slots.acquire()
+        self._slots = slots
+        self._stragglers = stragglers
+        self._held: Optional[threading.Semaphore] = slots
+        self._lock = threading.Lock()
+
+    def detach(self) -> None:
+        """نقل الطريقة الملغاة إلى حد الخاسرات (تبقى في مكانها إذا امتلأ)"""
+        with self._lock:
+            if self._held is not self._slots or not self._stragglers.acquire(blocking=False):
+                return
+            self._held = self._stragglers
+        self._slots.release()
+
+    def release(self) -> None:
+        with self._lock:
+            held, self._held = self._held, None
+        if held is not None:
+            held.release()
+
+
+class HedgedRace:
+    """
+    تشغيل الطريقة الأساسية، ثم بدء البديلة إذا لم تنتهِ خلال مهلة التحوط
+
+    المهلة ثابتة من HEDGE_DELAY أو تساوي p90 لأزمنة الطريقة الأساسية. إذا
+    فشلت الأساسية مبكراً تبدأ البديلة فوراً. أول نتيجة ناجحة تفوز، والخاسرة
+    تُلغى تعاونياً (raise_if_cancelled) وتُحذف نتيجتها إذا اكتملت لاحقاً.
+    مهمة حارسة اختيارية (فحص الحجم) تعمل بالتوازي، وفشلها يلغي الطريقتين،
+    والطرق لا تقرأ بايتات الوسائط قبل نجاحها (wait_for_guard).
+
+    كل طريقة تعمل في خيط خاص يشغل مكاناً من max_workers حتى يخرج الخيط.
+    الطريقة الخاسرة قد لا تصل إلى نقطة فحص الإلغاء لدقائق (داخل extract_info
+    أو ffmpeg)، لذلك تنتقل عند إلغائها إلى حد منفصل max_stragglers فلا تؤخر
+    السباقات الجديدة، وإذا امتلأ تبقى في مكانها. عدد الخيوط الحية لا يتجاوز
+    max_workers + max_stragglers.
+    """
+
+    def __init__(self, delay: Optional[float] = HEDGE_DELAY,
+                 default_delay: float = HEDGE_DEFAULT_DELAY,
+                 window: int = HEDGE_LATENCY_WINDOW,
+                 max_workers: int = DOWNLOAD_WORKERS * 3,
+                 max_stragglers: int = DOWNLOAD_WORKERS):
+        self.fixed_delay = delay
+        self.default_delay = default_delay
+        self.latency = LatencyTracker(window)
+        # حد منفصل عن مجمع التنزيل: الطريقتان والحارس لا تنتظر عاملاً يشغله السباق نفسه
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._stragglers = threading.BoundedSemaphore(max_stragglers)
+        self._threads: set = set()
+        self._threads_lock = threading.Lock()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self.stats = {'races': 0, 'hedged': 0, 'primary_wins': 0, 'fallback_wins': 0, 'failures': 0}
+
+    def hedge_delay(self) -> float:
+        """مهلة بدء الطريقة البديلة"""
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+        p90 = self.latency.percentile(0.9)
+        if p90 is None:
+            return self.default_delay
+        return min(max(p90, 1.0), SOCKET_TIMEOUT)
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def _run_leg(event: threading.Event, guard: Optional[Future], func: Callable[[], Any]) -> Any:
+        token = _cancel_event.set(event)
+        try:
+            with bind_guard(guard):
+                return func()
+        finally:
+            _cancel_event.reset(token)
+
+    def _spawn(self, func: Callable, *args) -> Tuple[Future, _LegSlot]:
+        """تشغيل دالة في خيط خاص بنسخة من سياق المستدعي بعد حجز مكان لها"""
+        if self._closed:
+            raise RuntimeError("تم إيقاف السباق")
+        slot = _LegSlot(self._slots, self._stragglers)
+        future: Future = Future()
+        context = contextvars.copy_context()
+
+        def target():
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(context.run(func, *args))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                slot.release()
+                with self._threads_lock:
+                    self._threads.discard(thread)
+
+        thread = threading.Thread(target=target, name='hedge', daemon=True)
+        with self._threads_lock:
+            self._threads.add(thread)
+        thread.start()
+        return future, slot
+
+    def submit(self, func: Callable, *args) -> Future:
+        """تشغيل مهمة مرافقة للسباق (مثل الحارس) بنسخة من سياق المستدعي"""
+        return self._spawn(func, *args)[0]
+
+    def run(self, primary: Callable[[], Any], fallback: Callable[[], Any],
+            discard: Optional[Callable[[Any], None]] = None,
+            guard: Optional[Future] = None) -> Any:
+        """
+        تشغيل السباق (دالة حاجبة - تُشغَّل على مجمع التنزيل)
+
+        Args:
+            primary: الطريقة الأساسية (Cobalt)
+            fallback: الطريقة البديلة (yt-dlp)
+            discard: تنظيف نتيجة الطريقة الخاسرة إذا اكتملت بعد الفائزة
+            guard: مهمة تعمل بالتوازي (من submit)؛ إذا انتهت بخطأ قبل الفائز
+                   تُلغى الطريقتان ويُرفع خطؤها. الطرق تنتظرها عبر
+                   wait_for_guard() قبل قراءة بايتات الوسائط
+
+        Returns:
+            نتيجة أول طريقة ناجحة
+
+        Raises:
+            خطأ الحارس، أو MediaTooLargeError أو آخر خطأ إذا فشلت الطريقتان
+        """
+        self._count('races')
+        started = time.monotonic()
+        delay = self.hedge_delay()
+        events: Dict[Any, threading.Event] = {}
+        slots: Dict[Any, _LegSlot] = {}
+        names: Dict[Any, str] = {}
+
+        def start(name: str, func: Callable[[], Any]):
+            event = threading.Event()
+            # كل طريقة تعمل بنسخة من سياق المستدعي (مثل مجلد المهمة)
+            future, slot = self._spawn(self._run_leg, event, guard, func)
+            events[future], slots[future], names[future] = event, slot, name
+            return future
+
+        pending = {start('primary', primary)}
+        hedged = False
+        errors: List[BaseException] = []
+
+        while pending:
+            timeout = None if hedged else max(0.0, started + delay - time.monotonic())
+            watched = pending | {guard} if guard is not None else pending
+            done, _ = wait(watched, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if guard in done:
+                done.discard(guard)
+                if guard.exception() is not None:
+                    self._abort(pending | done, events, slots, discard)
+                    raise guard.exception()
+                guard = None
+            pending -= done
+
+            succeeded = [f for f in done if f.exception() is None]
+            errors.extend(f.exception() for f in done if f.exception() is not None)
+
+            if succeeded:
+                winner = succeeded[0]
+                elapsed = time.monotonic() - started
+                for other in succeeded[1:]:
+                    if discard:
+                        discard(other.result())
+                self._finish(winner, names[winner], elapsed, pending, events, slots, discard, hedged)
+                return winner.result()
+
+            # انتهت المهلة أو فشلت الأساسية: بدء البديلة
+            if not hedged and (not pending or time.monotonic() >= started + delay):
+                hedged = True
+                if pending:
+                    self._count('hedged')
+                    logger.info(f"⏱️ تحوط: بدء yt-dlp بعد {delay:.1f}s بالتوازي مع Cobalt")
+                pending.add(start('fallback', fallback))
+
+        self._count('failures')
+        too_large = [e for e in errors if isinstance(e, MediaTooLargeError)]
+        raise too_large[0] if too_large else errors[-1]
+
+    def _finish(self, winner, name: str, elapsed: float, pending: set,
+                events: Dict[Any, threading.Event], slots: Dict[Any, _LegSlot],
+                discard, hedged: bool) -> None:
+        """تسجيل الفائز وإلغاء الخاسر"""
+        if name == 'primary':
+            self._count('primary_wins')
+            self.latency.add(elapsed)
+        else:
+            self._count('fallback_wins')
+            # الأساسية لم تنتهِ خلال هذا الزمن: حد أدنى لزمنها حتى لا تنحاز النسبة المئوية للأسرع
+            if pending:
+                self.latency.add(elapsed)
+
+        self._abort(pending, events, slots, discard)
+
+        logger.info(
+            f"🏁 فازت {'Cobalt' if name == 'primary' else 'yt-dlp'} في {elapsed:.2f}s"
+            f"{' (بعد التحوط)' if hedged and pending else ''}"
+        )
+
+    @staticmethod
+    def _abort(legs: set, events: Dict[Any, threading.Event],
+               slots: Dict[Any, _LegSlot], discard) -> None:
+        """إلغاء الطرق المتبقية ونقلها إلى حد الخاسرات وحذف نتائجها إذا اكتملت لاحقاً"""
+        for leg in legs:
+            events[leg].set()
+            slots[leg].detach()
+            if discard:
+                leg.add_done_callback(
+                    lambda f: discard(f.result()) if f.exception() is None else None
+                )
+
+    def get_stats(self) -> dict:
+        """إحصائيات السباق ومهلة التحوط الحالية"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['hedge_delay'] = self.hedge_delay()
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        """إيقاف بدء طرق جديدة، وانتظار الخيوط الحالية (بما فيها الخاسرة الملغاة) إذا طُلب"""
+        self._closed = True
+        if wait:
+            with self._threads_lock:
+                threads = list(self._threads)
+            for thread in threads:
+                thread.join()
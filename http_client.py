@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+عميل HTTP مشترك لجميع الطلبات الخارجية
+Shared pooled HTTP client (keep-alive, bounded retries, default timeouts)
+"""
+
+import logging
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    SOCKET_TIMEOUT, HTTP_POOL_HOSTS, HTTP_POOL_SIZE,
+    HTTP_RETRIES, HTTP_RETRY_BACKOFF, HTTP_USER_AGENT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClient:
+    """
+    جلسة requests واحدة مشتركة بين جميع الوحدات
+
+    - مجمع اتصالات لكل مضيف مع keep-alive: الطلب الثاني لنفس المضيف لا يدفع
+      مصافحة TCP و TLS من جديد
+    - إعادة محاولة محدودة مع تأخير عشوائي لأخطاء الاتصال و 502/503/504،
+      للطلبات المتكررة بأمان فقط (GET/HEAD...) وليس POST
+    - مهلة افتراضية لكل طلب وترويسات افتراضية تُستبدل بترويسات الطلب
+    - الكوكيز لا تُحفظ بين الطلبات (الجلسة مشتركة بين جميع المستخدمين)
+    """
+
+    RETRY_STATUSES = (502, 503, 504)
+
+    def __init__(self, pool_hosts: int = HTTP_POOL_HOSTS, pool_size: int = HTTP_POOL_SIZE,
+                 retries: int = HTTP_RETRIES, backoff: float = HTTP_RETRY_BACKOFF,
+                 timeout: float = SOCKET_TIMEOUT):
+        self.timeout = timeout
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            backoff_jitter=backoff,
+            status_forcelist=self.RETRY_STATUSES,
+            raise_on_status=False,
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['User-Agent'] = HTTP_USER_AGENT
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """طلب عبر الجلسة المشتركة (نفس معاملات requests.request)"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('allow_redirects', False)
+        return self.request('HEAD', url, **kwargs)
+
+    def close(self) -> None:
+        """إغلاق جميع الاتصالات المفتوحة"""
+        self.session.close()
+
+
+# العميل المشترك لجميع الوحدات
+http_client = HttpClient()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+التحقق من صيغة الصور من أول بايتات الملف وتحويل WebP إلى JPEG
+Image magic-byte sniffing and optional WebP -> JPEG conversion
+"""
+
+import os
+import logging
+from typing import Optional
+
+from config import CONVERT_WEBP_TO_JPEG
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class NotAnImageError(ValueError):
+    """بداية الاستجابة ليست صورة (صفحة خطأ HTML أو محتوى آخر)"""
+
+
+class ImageFormat:
+    """
+    كشف صيغة الصورة من البصمة (magic bytes) بدلاً من الثقة بـ Content-Type
+
+    يُستخدم مع ChunkedDownloader(sniff=ImageFormat.check) فتُرفض صفحات الخطأ
+    بعد قراءة أول بضعة كيلوبايتات بدلاً من تنزيلها كاملة وحفظها كصورة.
+    """
+
+    # صيغ HEIF داخل صندوق ftyp
+    HEIF_BRANDS = (b'heic', b'heix', b'hevc', b'hevx', b'mif1', b'msf1')
+
+    @staticmethod
+    def detect(head: bytes) -> Optional[str]:
+        """الصيغة من أول البايتات: jpeg / png / webp / heic / gif أو None"""
+        if head.startswith(b'\xff\xd8\xff'):
+            return 'jpeg'
+        if head.startswith(b'\x89PNG\r\n\x1a\n'):
+            return 'png'
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            return 'webp'
+        if head[4:8] == b'ftyp' and head[8:12] in ImageFormat.HEIF_BRANDS:
+            return 'heic'
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return 'gif'
+        return None
+
+    @staticmethod
+    def check(head: bytes) -> str:
+        """
+        التحقق من أن البداية صورة
+
+        Raises:
+            NotAnImageError: إذا كانت صفحة HTML أو صيغة غير معروفة
+        """
+        image_format = ImageFormat.detect(head)
+        if image_format:
+            return image_format
+        if head.lstrip()[:1] == b'<':
+            raise NotAnImageError("الخادم أرجع صفحة HTML بدلاً من الصورة")
+        raise NotAnImageError(f"صيغة صورة غير معروفة: {head[:12]!r}")
+
+    @staticmethod
+    def detect_file(path: str) -> Optional[str]:
+        with open(path, 'rb') as f:
+            return ImageFormat.detect(f.read(16))
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        """
+        تحويل صورة WebP إلى JPEG في نفس المسار (تليجرام يعرض JPEG كصورة عادية)
+
+        بدون Pillow أو مع تعطيل CONVERT_WEBP_TO_JPEG يبقى الملف كما هو.
+        """
+        if not (CONVERT_WEBP_TO_JPEG and PIL_AVAILABLE) or ImageFormat.detect_file(path) != 'webp':
+            return path
+
+        tmp_path = path + '.jpg.part'
+        try:
+            with Image.open(path) as image:
+                image.convert('RGB').save(tmp_path, 'JPEG', quality=95)
+            os.replace(tmp_path, path)
+            logger.info(f"🖼️ تحويل WebP إلى JPEG: {path}")
+        except Exception as e:
+            logger.warning(f"فشل تحويل WebP إلى JPEG: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+مجموعة عملاء instagrapi مُهيأة مسبقاً بجلسات محفوظة وحصة طلبات لكل حساب
+Reusable instagrapi client pool with persisted sessions and per-account budgets
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Iterator, List, Optional, Tuple
+
+from config import (
+    INSTAGRAM_ACCOUNTS, INSTAGRAM_SESSION_DIR, INSTAGRAM_ACCOUNT_BUDGET,
+    INSTAGRAM_BUDGET_WINDOW, INSTAGRAM_ACQUIRE_TIMEOUT, INSTAGRAM_LOGIN_BACKOFF,
+)
+from hedged_race import raise_if_cancelled
+
+logger = logging.getLogger(__name__)
+
+
+class InstagramBudgetExceeded(Exception):
+    """جميع الحسابات استهلكت حصتها خلال النافذة الحالية"""
+
+
+class InstagramLoginBackoff(InstagramBudgetExceeded):
+    """جميع الحسابات التي بقيت لها حصة في فترة انتظار بعد فشل تسجيل الدخول"""
+
+
+class PooledClient:
+    """عميل instagrapi لحساب واحد مع سجل طلباته داخل النافذة"""
+
+    def __init__(self, username: Optional[str], password: Optional[str], settings_path: str):
+        self.username = username
+        self.password = password
+        self.settings_path = settings_path
+        self.client: Any = None
+        self.busy = False
+        self.requests: Deque[float] = deque()
+        # آخر فشل لتسجيل الدخول: الحساب يُتخطى حتى login_retry_at
+        self.login_error: Optional[str] = None
+        self.login_retry_at = 0.0
+
+    @property
+    def name(self) -> str:
+        return self.username or 'anonymous'
+
+    def backing_off(self, now: float) -> bool:
+        """هل الحساب في فترة الانتظار بعد فشل تسجيل الدخول"""
+        return now < self.login_retry_at
+
+    def used(self, now: float, window: float) -> int:
+        """عدد الطلبات داخل النافذة (بعد حذف القديمة)"""
+        while self.requests and self.requests[0] <= now - window:
+            self.requests.popleft()
+        return len(self.requests)
+
+
+class InstagramClientPool:
+    """
+    عملاء instagrapi يُعاد استخدامهم بين الطلبات
+
+    كل حساب في INSTAGRAM_ACCOUNTS له عميل واحد يُنشأ عند أول استخدام من
+    إعدادات الجلسة المحفوظة (الجهاز نفسه وملفات الارتباط) ويُسجل الدخول
+    فقط إذا لم تكن الجلسة صالحة. العميل يُحجز لطلب واحد في كل مرة، وكل
+    حساب له حصة طلبات خلال INSTAGRAM_BUDGET_WINDOW. إذا فشل تسجيل دخول حساب
+    (كلمة مرور خاطئة أو checkpoint) يُتخطى لمدة INSTAGRAM_LOGIN_BACKOFF بدلاً
+    من إعادة المحاولة مع كل طلب. بدون حسابات يُستخدم عميل مجهول واحد بجهاز
+    محفوظ بدلاً من جهاز جديد لكل طلب.
+    """
+
+    # فترة فحص الإلغاء أثناء انتظار عميل متاح
+    WAIT_SLICE = 1.0
+
+    def __init__(self, accounts: List[Tuple[str, str]] = INSTAGRAM_ACCOUNTS,
+                 session_dir: str = INSTAGRAM_SESSION_DIR,
+                 budget: int = INSTAGRAM_ACCOUNT_BUDGET,
+                 window: float = INSTAGRAM_BUDGET_WINDOW,
+                 acquire_timeout: float = INSTAGRAM_ACQUIRE_TIMEOUT,
+                 login_backoff: float = INSTAGRAM_LOGIN_BACKOFF,
+                 client_factory: Optional[Callable[[], Any]] = None):
+        self.session_dir = session_dir
+        self.budget = budget
+        self.window = window
+        self.acquire_timeout = acquire_timeout
+        self.login_backoff = login_backoff
+        self._client_factory = client_factory
+        self._condition = threading.Condition()
+        self.clients = [
+            PooledClient(username, password, self._settings_path(username))
+            for username, password in (accounts or [(None, None)])
+        ]
+
+    def _settings_path(self, username: Optional[str]) -> str:
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', username or 'anonymous')
+        return os.path.join(self.session_dir, f'{safe_name}.json')
+
+    def _new_client(self) -> Any:
+        if self._client_factory is not None:
+            return self._client_factory()
+        from instagrapi import Client
+        return Client()
+
+    def _initialize(self, pooled: PooledClient) -> None:
+        """إنشاء العميل من الجلسة المحفوظة وتسجيل الدخول عند الحاجة"""
+        client = self._new_client()
+        if os.path.exists(pooled.settings_path):
+            client.load_settings(pooled.settings_path)
+        if pooled.username:
+            # مع الإعدادات المحفوظة يُعاد استخدام الجلسة بدون تسجيل دخول جديد
+            try:
+                client.login(pooled.username, pooled.password)
+            except Exception as e:
+                pooled.login_error = f"{type(e).__name__}: {str(e)}"
+                pooled.login_retry_at = time.time() + self.login_backoff
+                logger.error(
+                    f"فشل تسجيل دخول انستقرام {pooled.name}، تخطي الحساب لمدة "
+                    f"{self.login_backoff:.0f}s: {pooled.login_error}"
+                )
+                raise
+        pooled.client = client
+        pooled.login_error = None
+        pooled.login_retry_at = 0.0
+        self._persist(pooled)
+        logger.info(f"📸 عميل انستقرام جاهز: {pooled.name}")
+
+    def _persist(self, pooled: PooledClient) -> None:
+        """حفظ إعدادات الجلسة (الجهاز وملفات الارتباط) للطلبات وإعادة التشغيل القادمة"""
+        try:
+            os.makedirs(self.session_dir, exist_ok=True)
+            pooled.client.dump_settings(pooled.settings_path)
+        except Exception as e:
+            logger.warning(f"فشل حفظ جلسة انستقرام {pooled.name}: {str(e)}")
+
+    def _try_checkout(self, now: float) -> Optional[PooledClient]:
+        """
+        حجز الحساب المتاح الأقل استخداماً (يُستدعى مع القفل)
+
+        Raises:
+            InstagramBudgetExceeded: إذا لم تبقَ حصة لأي حساب
+            InstagramLoginBackoff: إذا كانت كل الحسابات المتبقية بعد فشل تسجيل الدخول
+        """
+        with_budget = [c for c in self.clients if c.used(now, self.window) < self.budget]
+        if not with_budget:
+            raise InstagramBudgetExceeded("تم استهلاك حصة طلبات انستقرام لجميع الحسابات")
+        usable = [c for c in with_budget if not c.backing_off(now)]
+        if not usable:
+            raise InstagramLoginBackoff("فشل تسجيل الدخول لجميع حسابات انستقرام المتاحة")
+        idle = [c for c in usable if not c.busy]
+        if not idle:
+            return None
+        pooled = min(idle, key=lambda c: len(c.requests))
+        pooled.busy = True
+        pooled.requests.append(now)
+        return pooled
+
+    def _checkin(self, pooled: PooledClient) -> None:
+        with self._condition:
+            pooled.busy = False
+            self._condition.notify()
+
+    @contextmanager
+    def acquire(self) -> Iterator[Any]:
+        """
+        حجز عميل لطلب واحد (دالة حاجبة)
+
+        Raises:
+            InstagramBudgetExceeded: إذا استهلكت جميع الحسابات حصتها
+            InstagramLoginBackoff: إذا فشل تسجيل الدخول مؤخراً لجميع الحسابات المتبقية
+            TimeoutError: إذا بقيت جميع العملاء محجوزة حتى انتهاء المهلة
+            ImportError: إذا لم تكن instagrapi مثبتة
+        """
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._condition:
+            while True:
+                pooled = self._try_checkout(time.time())
+                if pooled is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("جميع عملاء انستقرام مشغولة")
+                self._condition.wait(min(remaining, self.WAIT_SLICE))
+                raise_if_cancelled()
+
+        try:
+            if pooled.client is None:
+                self._initialize(pooled)
+            yield pooled.client
+        except Exception as e:
+            # الجلسة انتهت: عميل جديد من الإعدادات المحفوظة في الطلب القادم
+            if type(e).__name__ in ('LoginRequired', 'ClientLoginRequired'):
+                logger.warning(f"انتهت جلسة انستقرام {pooled.name}")
+                pooled.client = None
+            raise
+        else:
+            self._persist(pooled)
+        finally:
+            self._checkin(pooled)
+
+    def get_stats(self) -> List[dict]:
+        """حالة كل حساب للمراقبة"""
+        now = time.time()
+        with self._condition:
+            return [
+                {
+                    'account': pooled.name,
+                    'busy': pooled.busy,
+                    'ready': pooled.client is not None,
+                    'login_error': pooled.login_error if pooled.backing_off(now) else None,
+                    'used': pooled.used(now, self.window),
+                    'budget': self.budget,
+                }
+                for pooled in self.clients
+            ]
+
+
+# المجموعة المشتركة
+instagram_clients = InstagramClientPool()
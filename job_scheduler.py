@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+مجدول مهام التنزيل حسب أولوية الاشتراك
+Tier-aware priority job scheduler for downloads
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from config import DOWNLOAD_WORKERS
+from download_executor import DownloadExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadJob:
+    """مهمة تنزيل في قائمة الانتظار"""
+
+    def __init__(self, job_id: int, tier: str, func: Callable, args: tuple,
+                 kwargs: dict, future: asyncio.Future):
+        self.job_id = job_id
+        self.tier = tier
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+
+    def __await__(self):
+        return self.future.__await__()
+
+
+class PriorityJobScheduler:
+    """
+    مجدول مهام بفئات أولوية مشتقة من مستوى الاشتراك
+
+    يستخدم توزيعاً عادلاً موزوناً (Smooth Weighted Round Robin) بين الفئات
+    غير الفارغة: الخطط المدفوعة تحصل على حصة أكبر من العمال، لكن المستخدم
+    المجاني يحصل دائماً على دوره ولا يُحرم من التنفيذ.
+    """
+
+    # أوزان الفئات (بترتيب الأولوية عند التعادل)
+    PRIORITY_WEIGHTS = {
+        "premium": 8,
+        "pro": 6,
+        "basic": 3,
+        "free": 1,
+    }
+
+    def __init__(self, workers: int = DOWNLOAD_WORKERS,
+                 weights: Optional[Dict[str, int]] = None):
+        self.workers = max(1, workers)
+        self.weights = dict(weights or self.PRIORITY_WEIGHTS)
+        self._queues: Dict[str, Deque[DownloadJob]] = {tier: deque() for tier in self.weights}
+        self._credits: Dict[str, int] = {tier: 0 for tier in self.weights}
+        self._available: Optional[asyncio.Semaphore] = None
+        self._worker_tasks = []
+        self._counter = itertools.count(1)
+        self.active_jobs = 0
+
+    def priority_class(self, tier: str) -> str:
+        """تحديد فئة الأولوية من مستوى الاشتراك"""
+        return tier if tier in self.weights else "free"
+
+    # ==================== التشغيل والإيقاف ====================
+
+    def start(self) -> None:
+        """تشغيل العمال داخل حلقة الأحداث الحالية"""
+        if self._worker_tasks:
+            return
+        self._available = asyncio.Semaphore(0)
+        for i in range(self.workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker(i)))
+        logger.info(f"✅ تم تشغيل مجدول التنزيل ({self.workers} عمال)")
+
+    async def stop(self) -> None:
+        """إيقاف العمال وإلغاء المهام المنتظرة"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        for queue in self._queues.values():
+            while queue:
+                queue.popleft().future.cancel()
+        logger.info("⏹️ تم إيقاف مجدول التنزيل")
+
+    # ==================== إضافة المهام ====================
+
+    def submit(self, tier: str, func: Callable, *args, **kwargs) -> DownloadJob:
+        """
+        إضافة مهمة تنزيل إلى قائمة الانتظار
+
+        Args:
+            tier: مستوى اشتراك المستخدم (free/basic/pro/premium)
+            func: الدالة الحاجبة التي ستُشغَّل على مجمع التنزيل
+            *args, **kwargs: معاملات الدالة
+
+        Returns:
+            DownloadJob: المهمة (يمكن انتظارها مباشرة بـ await)
+        """
+        self.start()
+        priority = self.priority_class(tier)
+        job = DownloadJob(
+            job_id=next(self._counter),
+            tier=priority,
+            func=func,
+            args=args,
+            kwargs=kwargs,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._queues[priority].append(job)
+        self._available.release()
+        return job
+
+    # ==================== الجدولة ====================
+
+    def _select_class(self, lengths: Dict[str, int], credits: Dict[str, int]) -> Optional[str]:
+        """اختيار الفئة التالية بالتوزيع العادل الموزون (يعدّل credits)"""
+        active = [tier for tier in self.weights if lengths[tier] > 0]
+        if not active:
+            return None
+
+        total = 0
+        for tier in active:
+            credits[tier] += self.weights[tier]
+            total += self.weights[tier]
+
+        chosen = max(active, key=lambda tier: credits[tier])
+        credits[chosen] -= total
+
+        # الفئة التي ستفرغ تبدأ من الصفر عند عودتها
+        if lengths[chosen] == 1:
+            credits[chosen] = 0
+        return chosen
+
+    def _pick_next(self) -> Optional[DownloadJob]:
+        """سحب المهمة التالية من قائمة الانتظار"""
+        self._drop_cancelled()
+        lengths = {tier: len(queue) for tier, queue in self._queues.items()}
+        tier = self._select_class(lengths, self._credits)
+        if tier is None:
+            return None
+        return self._queues[tier].popleft()
+
+    def _drop_cancelled(self) -> None:
+        """إزالة المهام التي ألغاها أصحابها قبل بدئها"""
+        for queue in self._queues.values():
+            if any(job.future.done() for job in queue):
+                alive = [job for job in queue if not job.future.done()]
+                queue.clear()
+                queue.extend(alive)
+
+    def position(self, job: DownloadJob) -> int:
+        """
+        موقع المهمة في ترتيب التنفيذ المتوقع (1 = التالية)
+
+        Returns:
+            int: الموقع، أو 0 إذا بدأت المهمة أو لم تعد في قائمة الانتظار
+        """
+        self._drop_cancelled()
+        queue = self._queues.get(job.tier)
+        if queue is None or job not in queue:
+            return 0
+
+        remaining = list(queue).index(job)
+        lengths = {tier: len(q) for tier, q in self._queues.items()}
+        credits = dict(self._credits)
+        position = 0
+
+        while True:
+            tier = self._select_class(lengths, credits)
+            position += 1
+            if tier == job.tier:
+                if remaining == 0:
+                    return position
+                remaining -= 1
+            lengths[tier] -= 1
+
+    def idle_workers(self) -> int:
+        """عدد العمال غير المشغولين"""
+        return max(0, self.workers - self.active_jobs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات المجدول"""
+        return {
+            "workers": self.workers,
+            "active_jobs": self.active_jobs,
+            "queued": {tier: len(queue) for tier, queue in self._queues.items()},
+        }
+
+    # ==================== العمال ====================
+
+    async def _worker(self, worker_id: int) -> None:
+        """حلقة العامل: سحب المهام وتشغيلها على مجمع التنزيل"""
+        while True:
+            await self._available.acquire()
+            job = self._pick_next()
+            if job is None:
+                continue
+
+            self.active_jobs += 1
+            job.started_at = time.monotonic()
+            waited = job.started_at - job.enqueued_at
+            logger.info(f"▶️ بدء المهمة #{job.job_id} ({job.tier}) بعد انتظار {waited:.1f} ث")
+
+            try:
+                result = await DownloadExecutor.run_download(job.func, *job.args, **job.kwargs)
+                if not job.future.done():
+                    job.future.set_result(result)
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                self.active_jobs -= 1
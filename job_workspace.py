@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+مجلد عمل مستقل لكل مهمة تنزيل مع تنظيف مضمون
+Per-job isolated download workspace and orphan janitor
+"""
+
+import os
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, Optional, Set
+
+from config import DOWNLOAD_FOLDER, WORKSPACE_MAX_AGE, WORKSPACE_JANITOR_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# مجلد المهمة الحالية (يُنسخ مع السياق إلى خيوط السباق)
+_job_folder: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    'job_folder', default=None
+)
+
+
+def job_folder() -> str:
+    """مجلد حفظ الملفات: مجلد المهمة الحالية أو DOWNLOAD_FOLDER خارج المهام"""
+    return _job_folder.get() or DOWNLOAD_FOLDER
+
+
+@contextmanager
+def bind_job_folder(path: Optional[str]) -> Iterator[None]:
+    """ربط مجلد مهمة بالسياق الحالي (خيط أو مهمة asyncio)"""
+    token = _job_folder.set(path)
+    try:
+        yield
+    finally:
+        _job_folder.reset(token)
+
+
+class JobWorkspace:
+    """
+    مجلد DOWNLOAD_FOLDER/job_<id> لمهمة تنزيل واحدة
+
+    جميع المعالجات تحفظ ملفاتها في job_folder() فلا تتداخل أسماء ملفات
+    مهمتين متزامنتين. المجلد يُحذف بالكامل عند الخروج من السياق أو عند
+    close()، وما يبقى بعد تعطل العملية يحذفه WorkspaceJanitor. المجلدات
+    المفتوحة مسجلة فلا يحذفها المنظف مهما طال انتظار المهمة أو تنزيلها.
+    """
+
+    PREFIX = 'job_'
+
+    # مسارات المجلدات المفتوحة في هذه العملية
+    _open: Set[str] = set()
+    _open_lock = threading.Lock()
+
+    def __init__(self, root: str = DOWNLOAD_FOLDER):
+        self.path = os.path.join(root, f'{self.PREFIX}{uuid.uuid4().hex[:12]}')
+        with self._open_lock:
+            self._open.add(os.path.abspath(self.path))
+        os.makedirs(self.path, exist_ok=True)
+
+    @classmethod
+    def is_open(cls, path: str) -> bool:
+        """هل المجلد لمهمة لم تُغلق بعد"""
+        with cls._open_lock:
+            return os.path.abspath(path) in cls._open
+
+    def activate(self):
+        """ربط المجلد بالسياق الحالي (داخل خيط التنزيل)"""
+        return bind_job_folder(self.path)
+
+    def owns(self, path: Optional[str]) -> bool:
+        """هل الملف داخل مجلد المهمة"""
+        return bool(path) and os.path.abspath(path).startswith(os.path.abspath(self.path) + os.sep)
+
+    def close(self) -> None:
+        """حذف المجلد وكل ما فيه"""
+        shutil.rmtree(self.path, ignore_errors=True)
+        with self._open_lock:
+            self._open.discard(os.path.abspath(self.path))
+
+    def __enter__(self) -> 'JobWorkspace':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class WorkspaceJanitor:
+    """
+    حذف مجلدات المهام المهجورة (أقدم من WORKSPACE_MAX_AGE) في الخلفية
+
+    المجلدات المفتوحة (JobWorkspace.is_open) لا تُحذف أبداً، فالعمر يخص فقط
+    بقايا عملية سابقة أو مهمة لم تُغلق. الفحص يعمل على خيط خاص حتى لا يشغل
+    عاملاً من مجمع قاعدة البيانات أو التنزيل.
+    """
+
+    def __init__(self, root: str = DOWNLOAD_FOLDER, max_age: float = WORKSPACE_MAX_AGE,
+                 interval: float = WORKSPACE_JANITOR_INTERVAL):
+        self.root = root
+        self.max_age = max_age
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def sweep(self) -> int:
+        """حذف المجلدات القديمة وإرجاع عددها (دالة حاجبة)"""
+        if not os.path.isdir(self.root):
+            return 0
+        cutoff = time.time() - self.max_age
+        removed = 0
+        for entry in os.scandir(self.root):
+            if not (entry.name.startswith(JobWorkspace.PREFIX) and entry.is_dir()):
+                continue
+            if JobWorkspace.is_open(entry.path):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            logger.info(f"🧹 حذف {removed} مجلد مهمة مهجور")
+        return removed
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(self._executor, self.sweep)
+            except Exception as e:
+                logger.warning(f"فشل تنظيف مجلدات المهام: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """بدء التنظيف الدوري داخل حلقة الأحداث الحالية"""
+        if self._task is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='janitor')
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ألبوم وسائط (عدة صور/فيديوهات) منزل في مجلد خاص بالمهمة
+Multi-item album downloaded into a per-job directory
+"""
+
+import os
+import uuid
+import shutil
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from config import PICKER_CONCURRENCY
+from job_workspace import job_folder
+from hedged_race import DownloadCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class MediaAlbum:
+    """
+    عناصر ألبوم مرتبة: (المسار، النوع photo/video) مع صوت اختياري
+
+    كل مهمة لها مجلد مستقل فلا تتداخل ملفات طلبين متزامنين، والمجلد
+    يُحذف بالكامل عند الإغلاق. الصوت (موسيقى شرائح تيك توك) يُرسل بعد
+    المجموعة لأن تليجرام لا يخلط الصوت مع الصور في مجموعة واحدة.
+    """
+
+    # أقصى عدد عناصر في رسالة send_media_group واحدة
+    MAX_GROUP = 10
+
+    # امتداد كل نوع من عناصر picker في Cobalt
+    EXTENSIONS = {
+        'photo': '.jpg',
+        'video': '.mp4',
+        'gif': '.gif',
+        'audio': '.mp3',
+    }
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.items: List[Tuple[str, str]] = []
+        self.audio: Optional[str] = None
+
+    @classmethod
+    def create(cls, prefix: str = 'album') -> 'MediaAlbum':
+        """إنشاء ألبوم فارغ بمجلد جديد داخل مجلد المهمة الحالية"""
+        directory = os.path.join(job_folder(), f'{prefix}_{uuid.uuid4().hex[:12]}')
+        os.makedirs(directory, exist_ok=True)
+        return cls(directory)
+
+    @classmethod
+    def download(cls, prefix: str, sources: List[Tuple[str, str]],
+                 fetch: Callable[[str, str, str], None],
+                 concurrency: int = PICKER_CONCURRENCY) -> 'MediaAlbum':
+        """
+        تنزيل عناصر (الرابط، النوع) بالتوازي بحد concurrency مع حفظ الترتيب
+
+        Args:
+            prefix: بادئة مجلد الألبوم
+            sources: العناصر بالترتيب (النوع photo/video/gif/audio)
+            fetch: دالة حاجبة fetch(الرابط، مسار الحفظ، النوع)
+            concurrency: أقصى عدد تنزيلات متزامنة
+
+        Raises:
+            DownloadCancelled: إذا أُلغي السباق (بعد حذف المجلد)
+            Exception: إذا فشلت جميع الصور/الفيديوهات
+        """
+        album = cls.create(prefix)
+
+        def fetch_item(index: int, item_url: str, item_type: str) -> str:
+            save_path = album.item_path(index, item_type)
+            fetch(item_url, save_path, item_type)
+            return save_path
+
+        try:
+            # كل عنصر في خيط مع نسخة من السياق (حدث إلغاء السباق ومجلد المهمة)
+            workers = max(1, min(concurrency, len(sources)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='album') as pool:
+                futures = [
+                    pool.submit(contextvars.copy_context().run, fetch_item, index, item_url, item_type)
+                    for index, (item_url, item_type) in enumerate(sources)
+                ]
+                for index, ((_, item_type), future) in enumerate(zip(sources, futures)):
+                    try:
+                        album.add(future.result(), item_type)
+                    except DownloadCancelled:
+                        for other in futures:
+                            other.cancel()
+                        raise
+                    except Exception as e:
+                        # عنصر فاشل لا يُسقط بقية الألبوم
+                        logger.warning(f"فشل تنزيل عنصر الألبوم رقم {index + 1}: {str(e)}")
+
+            if not album.items:
+                raise Exception("فشل تنزيل جميع عناصر الألبوم")
+        except BaseException:
+            album.close()
+            raise
+
+        logger.info(f"تم تنزيل {len(album)}/{len(sources)} عنصر: {album.directory}")
+        return album
+
+    def add(self, path: str, item_type: str) -> None:
+        """إضافة عنصر منزل (الصوت يُحفظ منفصلاً عن عناصر المجموعة)"""
+        if item_type == 'audio':
+            self.audio = path
+        else:
+            self.items.append((path, self.kind_for(item_type)))
+
+    def item_path(self, index: int, item_type: str) -> str:
+        """مسار العنصر داخل المجلد (الترتيب محفوظ في الاسم)"""
+        return os.path.join(
+            self.directory, f'{index:02d}_{item_type}{self.EXTENSIONS.get(item_type, ".jpg")}'
+        )
+
+    @staticmethod
+    def kind_for(item_type: str) -> str:
+        """نوع الإرسال داخل المجموعة (gif يُرسل كفيديو)"""
+        return 'video' if item_type in ('video', 'gif') else 'photo'
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @property
+    def size(self) -> int:
+        """حجم أكبر عنصر (حد الحجم يُطبق على كل ملف)"""
+        paths = [path for path, _ in self.items] + ([self.audio] if self.audio else [])
+        return max((os.path.getsize(path) for path in paths), default=0)
+
+    def chunks(self) -> Iterator[List[Tuple[str, str]]]:
+        """العناصر مقسمة إلى مجموعات من MAX_GROUP"""
+        for start in range(0, len(self.items), self.MAX_GROUP):
+            yield self.items[start:start + self.MAX_GROUP]
+
+    def close(self) -> None:
+        """حذف مجلد الألبوم"""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -8,9 +8,15 @@ Advanced Media Handler using specialized libraries
 
 import os
 import logging
-import requests
 from typing import Optional, List, Tuple
-from config import DOWNLOAD_FOLDER, SOCKET_TIMEOUT
+from config import SOCKET_TIMEOUT, MAX_FILE_SIZE
+from url_router import URLRouter
+from job_workspace import job_folder
+from http_client import http_client
+from media_probe import SizeConstrainedFormat
+from video_compat import VideoCompat
+from chunked_downloader import ChunkedDownloader
+from instagram_client_pool import instagram_clients, InstagramBudgetExceeded
 
 logger = logging.getLogger(__name__)
 
@@ -21,98 +27,80 @@ class InstagramMediaHandler:
     @staticmethod
     def extract_post_id(url: str) -> Optional[str]:
         """استخراج معرف المنشور من رابط انستقرام"""
-        import re
-        
-        patterns = [
-            r'/p/([A-Za-z0-9_-]+)',
-            r'/reel/([A-Za-z0-9_-]+)',
-            r'/tv/([A-Za-z0-9_-]+)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
+        descriptor = URLRouter.parse(url)
+        if descriptor and descriptor.platform == 'instagram' and descriptor.kind != 'story':
+            return descriptor.media_id
         
         return None
     
     @staticmethod
     def download_with_instagrapi(url: str) -> Optional[str]:
-        """تنزيل من انستقرام باستخدام instagrapi"""
+        """تنزيل من انستقرام باستخدام instagrapi (عميل من المجموعة المشتركة)"""
         try:
-            from instagrapi import Client
-            
             logger.info("محاولة استخدام instagrapi...")
             
-            client = Client()
-            
             # استخراج معرف المنشور
             post_id = InstagramMediaHandler.extract_post_id(url)
             if not post_id:
                 raise Exception("فشل استخراج معرف المنشور")
             
-            # محاولة الوصول إلى المنشور
+            # محاولة الوصول إلى المنشور (العميل محجوز لهذا الطلب فقط)
             try:
-                # محاولة كـ post عادي
-                media = client.media_info(post_id)
+                with instagram_clients.acquire() as client:
+                    media = client.media_info(client.media_pk_from_code(post_id))
+            except (ImportError, InstagramBudgetExceeded):
+                raise
+            except Exception as e:
+                logger.warning(f"فشل الوصول إلى المنشور: {str(e)}")
+                raise
+            
+            # تنزيل الملف بعد إعادة العميل إلى المجموعة
+            if media.media_type == 1:  # صورة
+                image_url = media.image_versions2.candidates[0].url
+                filename = os.path.join(job_folder(), f'instagram_photo_{post_id}.jpg')
                 
-                if media.media_type == 1:  # صورة
-                    # تنزيل الصورة
-                    image_url = media.image_versions2.candidates[0].url
-                    filename = os.path.join(DOWNLOAD_FOLDER, f'instagram_photo_{post_id}.jpg')
-                    
-                    response = requests.get(image_url, timeout=SOCKET_TIMEOUT)
-                    with open(filename, 'wb') as f:
-                        f.write(response.content)
-                    
-                    logger.info(f"تم تنزيل صورة انستقرام: {filename}")
-                    return filename
+                ChunkedDownloader.download(image_url, filename)
                 
-                elif media.media_type == 2:  # فيديو
-                    # تنزيل الفيديو
-                    video_url = media.video_url
-                    filename = os.path.join(DOWNLOAD_FOLDER, f'instagram_video_{post_id}.mp4')
+                logger.info(f"تم تنزيل صورة انستقرام: {filename}")
+                return filename
+            
+            elif media.media_type == 2:  # فيديو
+                video_url = media.video_url
+                filename = os.path.join(job_folder(), f'instagram_video_{post_id}.mp4')
+                
+                ChunkedDownloader.download(video_url, filename)
+                
+                logger.info(f"تم تنزيل فيديو انستقرام: {filename}")
+                return filename
+            
+            elif media.media_type == 8:  # ألبوم (صور/فيديوهات متعددة)
+                # تنزيل أول عنصر
+                first_item = media.carousel_media[0]
+                
+                if first_item.media_type == 1:  # صورة
+                    image_url = first_item.image_versions2.candidates[0].url
+                    filename = os.path.join(job_folder(), f'instagram_carousel_{post_id}.jpg')
                     
-                    response = requests.get(video_url, timeout=SOCKET_TIMEOUT)
-                    with open(filename, 'wb') as f:
-                        f.write(response.content)
+                    ChunkedDownloader.download(image_url, filename)
                     
-                    logger.info(f"تم تنزيل فيديو انستقرام: {filename}")
+                    logger.info(f"تم تنزيل صورة من ألبوم انستقرام: {filename}")
                     return filename
                 
-                elif media.media_type == 8:  # ألبوم (صور/فيديوهات متعددة)
-                    # تنزيل أول عنصر
-                    first_item = media.carousel_media[0]
+                elif first_item.media_type == 2:  # فيديو
+                    video_url = first_item.video_url
+                    filename = os.path.join(job_folder(), f'instagram_carousel_{post_id}.mp4')
                     
-                    if first_item.media_type == 1:  # صورة
-                        image_url = first_item.image_versions2.candidates[0].url
-                        filename = os.path.join(DOWNLOAD_FOLDER, f'instagram_carousel_{post_id}.jpg')
-                        
-                        response = requests.get(image_url, timeout=SOCKET_TIMEOUT)
-                        with open(filename, 'wb') as f:
-                            f.write(response.content)
-                        
-                        logger.info(f"تم تنزيل صورة من ألبوم انستقرام: {filename}")
-                        return filename
+                    ChunkedDownloader.download(video_url, filename)
                     
-                    elif first_item.media_type == 2:  # فيديو
-                        video_url = first_item.video_url
-                        filename = os.path.join(DOWNLOAD_FOLDER, f'instagram_carousel_{post_id}.mp4')
-                        
-                        response = requests.get(video_url, timeout=SOCKET_TIMEOUT)
-                        with open(filename, 'wb') as f:
-                            f.write(response.content)
-                        
-                        logger.info(f"تم تنزيل فيديو من ألبوم انستقرام: {filename}")
-                        return filename
-            
-            except Exception as e:
-                logger.warning(f"فشل الوصول إلى المنشور: {str(e)}")
-                raise
+                    logger.info(f"تم تنزيل فيديو من ألبوم انستقرام: {filename}")
+                    return filename
         
         except ImportError:
             logger.warning("مكتبة instagrapi غير مثبتة")
             return None
+        except InstagramBudgetExceeded as e:
+            logger.warning(str(e))
+            return None
         except Exception as e:
             logger.error(f"خطأ في استخدام instagrapi: {str(e)}")
             return None
@@ -134,14 +122,14 @@ class InstagramMediaHandler:
             scraper = ig.InstagramScraper()
             
             # تنزيل إلى مجلد مؤقت
-            temp_dir = os.path.join(DOWNLOAD_FOLDER, 'temp_ig')
+            temp_dir = os.path.join(job_folder(), 'temp_ig')
             os.makedirs(temp_dir, exist_ok=True)
             
             # البحث عن الملفات المنزلة
             files = os.listdir(temp_dir)
             if files:
                 src = os.path.join(temp_dir, files[0])
-                dst = os.path.join(DOWNLOAD_FOLDER, f'instagram_media_{post_id}_{files[0]}')
+                dst = os.path.join(job_folder(), f'instagram_media_{post_id}_{files[0]}')
                 os.rename(src, dst)
                 
                 logger.info(f"تم تنزيل وسائط انستقرام: {dst}")
@@ -202,17 +190,16 @@ class TikTokMediaHandler:
             api = TikTokApi()
             
             # استخراج معرف الفيديو
-            import re
-            video_id_match = re.search(r'/video/(\d+)', url)
-            if not video_id_match:
+            descriptor = URLRouter.parse(url)
+            if descriptor and descriptor.is_short_link:
                 # محاولة من رابط مختصر
-                response = requests.head(url, allow_redirects=True, timeout=SOCKET_TIMEOUT)
-                video_id_match = re.search(r'/video/(\d+)', response.url)
+                response = http_client.head(url, allow_redirects=True, timeout=SOCKET_TIMEOUT)
+                descriptor = URLRouter.parse(response.url)
             
-            if not video_id_match:
+            if not descriptor or not descriptor.media_id:
                 raise Exception("فشل استخراج معرف الفيديو")
             
-            video_id = video_id_match.group(1)
+            video_id = descriptor.media_id
             
             # الحصول على معلومات الفيديو
             video_info = api.getVideoInfo(video_id)
@@ -225,11 +212,9 @@ class TikTokMediaHandler:
             if not video_url:
                 raise Exception("لم يتم العثور على رابط التنزيل")
             
-            filename = os.path.join(DOWNLOAD_FOLDER, f'tiktok_video_{video_id}.mp4')
+            filename = os.path.join(job_folder(), f'tiktok_video_{video_id}.mp4')
             
-            response = requests.get(video_url, timeout=SOCKET_TIMEOUT)
-            with open(filename, 'wb') as f:
-                f.write(response.content)
+            ChunkedDownloader.download(video_url, filename)
             
             logger.info(f"تم تنزيل فيديو تيك توك: {filename}")
             return filename
@@ -252,17 +237,16 @@ class TikTokMediaHandler:
             tiktok = PyTikTok()
             
             # استخراج معرف الفيديو
-            import re
-            video_id_match = re.search(r'/video/(\d+)', url)
-            if not video_id_match:
+            descriptor = URLRouter.parse(url)
+            if descriptor and descriptor.is_short_link:
                 # محاولة من رابط مختصر
-                response = requests.head(url, allow_redirects=True, timeout=SOCKET_TIMEOUT)
-                video_id_match = re.search(r'/video/(\d+)', response.url)
+                response = http_client.head(url, allow_redirects=True, timeout=SOCKET_TIMEOUT)
+                descriptor = URLRouter.parse(response.url)
             
-            if not video_id_match:
+            if not descriptor or not descriptor.media_id:
                 raise Exception("فشل استخراج معرف الفيديو")
             
-            video_id = video_id_match.group(1)
+            video_id = descriptor.media_id
             
             # الحصول على معلومات الفيديو
             video_data = tiktok.getVideoInfo(video_id)
@@ -275,11 +259,9 @@ class TikTokMediaHandler:
             if not video_url:
                 raise Exception("لم يتم العثور على رابط التنزيل")
             
-            filename = os.path.join(DOWNLOAD_FOLDER, f'tiktok_video_{video_id}.mp4')
+            filename = os.path.join(job_folder(), f'tiktok_video_{video_id}.mp4')
             
-            response = requests.get(video_url, timeout=SOCKET_TIMEOUT)
-            with open(filename, 'wb') as f:
-                f.write(response.content)
+            ChunkedDownloader.download(video_url, filename)
             
             logger.info(f"تم تنزيل فيديو تيك توك: {filename}")
             return filename
@@ -329,13 +311,14 @@ class YouTubeMediaHandler:
     """معالج متقدم لتنزيل الوسائط من يوتيوب"""
     
     @staticmethod
-    def download(url: str, audio_only: bool = False) -> str:
+    def download(url: str, audio_only: bool = False, max_bytes: int = MAX_FILE_SIZE) -> str:
         """
         تنزيل من يوتيوب
         
         Args:
             url: رابط الفيديو من يوتيوب
             audio_only: تنزيل الصوت فقط
+            max_bytes: ميزانية حجم الفيديو لاختيار الصيغة
             
         Returns:
             str: اسم الملف المحفوظ
@@ -351,7 +334,7 @@ class YouTubeMediaHandler:
             if audio_only:
                 ydl_opts = {
                     'format': 'bestaudio/best',
-                    'outtmpl': os.path.join(DOWNLOAD_FOLDER, 'youtube_audio_%(title)s.%(ext)s'),
+                    'outtmpl': os.path.join(job_folder(), 'youtube_audio_%(title)s.%(ext)s'),
                     'quiet': True,
                     'no_warnings': True,
                     'postprocessors': [{
@@ -362,8 +345,8 @@ class YouTubeMediaHandler:
                 }
             else:
                 ydl_opts = {
-                    'format': 'best[ext=mp4]/best',
-                    'outtmpl': os.path.join(DOWNLOAD_FOLDER, 'youtube_video_%(title)s.%(ext)s'),
+                    'format': SizeConstrainedFormat(max_bytes),
+                    'outtmpl': os.path.join(job_folder(), 'youtube_video_%(title)s.%(ext)s'),
                     'quiet': True,
                     'no_warnings': True,
                 }
@@ -371,6 +354,8 @@ class YouTubeMediaHandler:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 info = ydl.extract_info(url, download=True)
                 filename = ydl.prepare_filename(info)
+                if not audio_only:
+                    filename = VideoCompat.ensure_compatible(filename)
                 logger.info(f"تم تنزيل من يوتيوب: {filename}")
                 return filename
         
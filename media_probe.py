@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+فحص بيانات الوسائط قبل التنزيل
+Metadata probe that rejects oversized media before download
+"""
+
+import logging
+from typing import Iterator, List, NamedTuple, Optional
+
+import yt_dlp
+
+from config import MAX_FILE_SIZE, SOCKET_TIMEOUT
+from subscription_system import Subscription, SubscriptionType
+from url_router import URLRouter
+
+logger = logging.getLogger(__name__)
+
+# معدل mp3 الناتج عن FFmpegExtractAudio (preferredquality = 192)
+AUDIO_OUTPUT_BITRATE = 192 * 1000
+
+
+class MediaTooLargeError(Exception):
+    """حجم الوسائط أكبر من الحد المسموح للمستخدم"""
+
+    def __init__(self, size_bytes: int, max_bytes: int):
+        self.size_bytes = size_bytes
+        self.max_bytes = max_bytes
+        super().__init__(
+            f"حجم الملف ({size_bytes / (1024 * 1024):.1f} MB) "
+            f"أكبر من الحد المسموح ({max_bytes / (1024 * 1024):.0f} MB)"
+        )
+
+
+class SizeConstrainedFormat:
+    """
+    محدد صيغ yt-dlp يختار أعلى جودة يناسب حجمها ميزانية الحجم
+
+    يُمرَّر كقيمة 'format' في خيارات yt-dlp. الحجم يُقرأ من filesize أو
+    filesize_approx (الذي يملؤه yt-dlp من معدل البت × المدة). إذا لم يتوفر
+    حجم لأي صيغة يُنزل إلى دقات أقل تدريجياً بدلاً من أعلى جودة.
+    """
+
+    # الدقات البديلة عندما لا يتوفر حجم للصيغ
+    FALLBACK_HEIGHTS = (720, 480, 360)
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def format_size(fmt: dict) -> Optional[int]:
+        """الحجم المعروف أو المقدر للصيغة"""
+        return fmt.get('filesize') or fmt.get('filesize_approx')
+
+    @staticmethod
+    def _quality(fmt: dict) -> tuple:
+        # عند تساوي الدقة تُفضّل h264/mp4 لأنها لا تحتاج إلى إعادة ترميز قبل الإرسال
+        is_h264 = (fmt.get('vcodec') or '').startswith(('avc1', 'h264'))
+        return (fmt.get('height') or 0, is_h264, fmt.get('ext') == 'mp4', fmt.get('tbr') or 0)
+
+    @staticmethod
+    def _candidates(formats: List[dict]) -> List[dict]:
+        """الصيغ التي لا تحتاج إلى دمج (فيديو مع صوت)"""
+        candidates = [f for f in formats
+                      if f.get('vcodec') != 'none' and f.get('acodec') != 'none']
+        return candidates or list(formats)
+
+    def select(self, formats: List[dict]) -> Optional[dict]:
+        """اختيار صيغة واحدة من قائمة الصيغ"""
+        ranked = sorted(self._candidates(formats), key=self._quality, reverse=True)
+        if not ranked:
+            return None
+
+        # أعلى جودة حجمها ضمن الميزانية
+        for fmt in ranked:
+            size = self.format_size(fmt)
+            if size is not None and size <= self.max_bytes:
+                return fmt
+
+        # صيغ بدون حجم معروف: أعلى جودة ضمن أول دقة بديلة متاحة
+        unknown = [f for f in ranked if self.format_size(f) is None]
+        if unknown:
+            for height in self.FALLBACK_HEIGHTS:
+                for fmt in unknown:
+                    if (fmt.get('height') or 0) <= height:
+                        return fmt
+            return unknown[-1]
+
+        # كل الصيغ أكبر من الميزانية: الأصغر (يرفضه فحص الحجم لاحقاً)
+        return min(ranked, key=self.format_size)
+
+    def __call__(self, ctx: dict) -> Iterator[dict]:
+        fmt = self.select(ctx['formats'])
+        if fmt is not None:
+            logger.info(
+                f"🎚️ صيغة ضمن الميزانية: {fmt.get('format_id')} "
+                f"({fmt.get('height') or '-'}p, {self.format_size(fmt) or '?'} / {self.max_bytes} بايت)"
+            )
+            yield fmt
+
+
+class ProbeResult(NamedTuple):
+    """نتيجة الفحص (القيم None عندما لا تتوفر في البيانات)"""
+
+    size_bytes: Optional[int]
+    duration: Optional[float]
+    title: Optional[str]
+    # ناتج extract_info لإعادة استخدامه في تنزيل yt-dlp بدون استخراج الصفحة مرة أخرى
+    info: Optional[dict] = None
+
+
+class MediaProbe:
+    """قراءة الحجم والمدة من بيانات yt-dlp بدون تنزيل أي بايت من الوسائط"""
+
+    # أنواع الروابط التي لا معنى لفحصها (قوائم تشغيل، صور، قصص)
+    SKIP_KINDS = ('playlist', 'photo', 'story', 'short_link')
+
+    @staticmethod
+    def max_bytes_for_tier(tier: str) -> int:
+        """الحد الأقصى لحجم الملف: الأصغر بين حد تليجرام وحد خطة الاشتراك"""
+        try:
+            plan = Subscription.PLANS[SubscriptionType(tier)]
+        except ValueError:
+            plan = Subscription.PLANS[SubscriptionType.FREE]
+        return min(MAX_FILE_SIZE, int(plan.features['max_file_size_mb'] * 1024 * 1024))
+
+    @staticmethod
+    def _extract_info(url: str, media_type: str, max_bytes: int) -> dict:
+        """استخراج البيانات فقط (download=False) بنفس الصيغة المستخدمة في التنزيل"""
+        ydl_opts = {
+            'format': 'bestaudio/best' if media_type == 'audio' else SizeConstrainedFormat(max_bytes),
+            'quiet': True,
+            'no_warnings': True,
+            'noplaylist': True,
+            'socket_timeout': SOCKET_TIMEOUT,
+            'http_headers': {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            },
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    @staticmethod
+    def estimate_size(info: dict, media_type: str) -> Optional[int]:
+        """
+        تقدير حجم الملف الناتج من بيانات yt-dlp
+
+        Args:
+            info: ناتج extract_info
+            media_type: نوع المحتوى (audio/video/...)
+
+        Returns:
+            int: الحجم المقدر بالبايت، أو None إذا لم تكفِ البيانات
+        """
+        duration = info.get('duration')
+
+        # الصوت يُحوّل إلى mp3 بمعدل ثابت، فالمدة تكفي للتقدير
+        if media_type == 'audio' and duration:
+            return int(duration * AUDIO_OUTPUT_BITRATE / 8)
+
+        total = 0
+        for fmt in info.get('requested_formats') or [info]:
+            size = fmt.get('filesize') or fmt.get('filesize_approx')
+            if not size and fmt.get('tbr') and duration:
+                size = fmt['tbr'] * 1000 / 8 * duration
+            if not size:
+                return None
+            total += size
+        return int(total)
+
+    @staticmethod
+    def probe(url: str, media_type: str, max_bytes: int = MAX_FILE_SIZE) -> ProbeResult:
+        """
+        فحص الوسائط (دالة حاجبة - تُشغَّل على مجمع التنزيل)
+
+        فشل الفحص لا يمنع التنزيل: تُعاد نتيجة فارغة ويستمر التنزيل كالمعتاد.
+        """
+        descriptor = URLRouter.parse(url)
+        if media_type == 'image' or not descriptor or descriptor.kind in MediaProbe.SKIP_KINDS:
+            return ProbeResult(None, None, None)
+
+        try:
+            info = MediaProbe._extract_info(url, media_type, max_bytes)
+        except Exception as e:
+            logger.warning(f"تعذر فحص بيانات الوسائط: {str(e)}")
+            return ProbeResult(None, None, None)
+
+        if not info or info.get('_type') == 'playlist':
+            return ProbeResult(None, None, None)
+
+        return ProbeResult(
+            size_bytes=MediaProbe.estimate_size(info, media_type),
+            duration=info.get('duration'),
+            title=info.get('title'),
+            info=info,
+        )
+
+    @staticmethod
+    def check(url: str, media_type: str, max_bytes: int) -> ProbeResult:
+        """
+        فحص الوسائط ورفضها إذا تجاوز حجمها الحد
+
+        Raises:
+            MediaTooLargeError: إذا كان الحجم المقدر أكبر من max_bytes
+        """
+        result = MediaProbe.probe(url, media_type, max_bytes)
+        if result.size_bytes is not None and result.size_bytes > max_bytes:
+            logger.info(f"🚫 رفض قبل التنزيل: {url} ({result.size_bytes} > {max_bytes} بايت)")
+            raise MediaTooLargeError(result.size_bytes, max_bytes)
+        return result
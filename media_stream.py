@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+وسائط منزلة في مخزن مؤقت محدود بدلاً من ملف على القرص
+Bounded in-memory spool for streaming downloads into the upload
+"""
+
+import os
+import logging
+import tempfile
+from typing import BinaryIO
+
+from config import MAX_FILE_SIZE, STREAM_SPOOL_MAX_BYTES
+from media_probe import MediaTooLargeError
+from hedged_race import raise_if_cancelled
+from job_workspace import job_folder
+
+logger = logging.getLogger(__name__)
+
+
+class StreamedMedia:
+    """
+    محتوى استجابة HTTP محفوظ في SpooledTemporaryFile
+
+    يبقى المحتوى في الذاكرة حتى STREAM_SPOOL_MAX_BYTES ثم يُنقل تلقائياً إلى
+    ملف مؤقت داخل مجلد المهمة يُحذف عند الإغلاق. الحجم الكلي محدود
+    بميزانية الحجم فلا يُقرأ أكثر مما يمكن إرساله.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, filename: str, spool_bytes: int = STREAM_SPOOL_MAX_BYTES):
+        self.filename = filename
+        self.size = 0
+        folder = job_folder()
+        os.makedirs(folder, exist_ok=True)
+        self._buffer = tempfile.SpooledTemporaryFile(max_size=spool_bytes, dir=folder)
+
+    @classmethod
+    def from_response(cls, response, filename: str, max_bytes: int = MAX_FILE_SIZE) -> 'StreamedMedia':
+        """
+        قراءة جسم الاستجابة (stream=True) إلى المخزن
+
+        Raises:
+            MediaTooLargeError: من Content-Length قبل القراءة، أو أثناء القراءة
+        """
+        try:
+            length = response.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > max_bytes:
+                raise MediaTooLargeError(int(length), max_bytes)
+
+            media = cls(filename)
+            try:
+                for chunk in response.iter_content(chunk_size=cls.CHUNK_SIZE):
+                    raise_if_cancelled()
+                    media._append(chunk, max_bytes)
+            except BaseException:
+                media.close()
+                raise
+        finally:
+            response.close()
+
+        media._log_done()
+        return media
+
+    @classmethod
+    async def from_async_response(cls, response, filename: str,
+                                  max_bytes: int = MAX_FILE_SIZE) -> 'StreamedMedia':
+        """
+        نسخة from_response لاستجابة httpx مفتوحة بـ client.stream
+
+        الإلغاء يتم بإلغاء المهمة (asyncio)، وإغلاق الاستجابة مسؤولية المستدعي.
+        """
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit() and int(length) > max_bytes:
+            raise MediaTooLargeError(int(length), max_bytes)
+
+        media = cls(filename)
+        try:
+            async for chunk in response.aiter_bytes(cls.CHUNK_SIZE):
+                media._append(chunk, max_bytes)
+        except BaseException:
+            media.close()
+            raise
+
+        media._log_done()
+        return media
+
+    def _append(self, chunk: bytes, max_bytes: int) -> None:
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.size > max_bytes:
+            raise MediaTooLargeError(self.size, max_bytes)
+        self._buffer.write(chunk)
+
+    def _log_done(self) -> None:
+        logger.info(
+            f"تم تمرير {self.size} بايت إلى المخزن "
+            f"({'الذاكرة' if self.in_memory else 'ملف مؤقت'}): {self.filename}"
+        )
+
+    @property
+    def in_memory(self) -> bool:
+        """هل المحتوى ما زال في الذاكرة"""
+        return not self._buffer._rolled
+
+    def rewind(self) -> BinaryIO:
+        """إرجاع المخزن من البداية للقراءة"""
+        self._buffer.seek(0)
+        return self._buffer
+
+    def close(self) -> None:
+        """تحرير الذاكرة أو حذف الملف المؤقت"""
+        self._buffer.close()
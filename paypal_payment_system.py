@@ -6,7 +6,7 @@
 Payment System with PayPal
 """
 
-import requests
+from http_client import http_client
 import logging
 from typing import Optional, Dict
 from datetime import datetime, timedelta
@@ -74,7 +74,7 @@ class PayPalPaymentProcessor:
             
             data = {"grant_type": "client_credentials"}
             
-            response = requests.post(
+            response = http_client.post(
                 f"{PAYPAL_API_URL}/v1/oauth2/token",
                 headers=headers,
                 data=data,
@@ -142,7 +142,7 @@ class PayPalPaymentProcessor:
                 },
             }
             
-            response = requests.post(
+            response = http_client.post(
                 f"{PAYPAL_API_URL}/v2/checkout/orders",
                 headers=headers,
                 json=payload,
@@ -182,7 +182,7 @@ class PayPalPaymentProcessor:
                 "Content-Type": "application/json",
             }
             
-            response = requests.post(
+            response = http_client.post(
                 f"{PAYPAL_API_URL}/v2/checkout/orders/{order_id}/capture",
                 headers=headers,
                 timeout=10
@@ -232,7 +232,7 @@ class PayPalPaymentProcessor:
                 "Authorization": f"Bearer {access_token}",
             }
             
-            response = requests.get(
+            response = http_client.get(
                 f"{PAYPAL_API_URL}/v2/checkout/orders/{order_id}",
                 headers=headers,
                 timeout=10
@@ -285,7 +285,7 @@ class PayPalPaymentProcessor:
                 "category": "SOFTWARE",
             }
             
-            product_response = requests.post(
+            product_response = http_client.post(
                 f"{PAYPAL_API_URL}/v1/billing/products",
                 headers=headers,
                 json=product_payload,
@@ -327,7 +327,7 @@ class PayPalPaymentProcessor:
                 },
             }
             
-            plan_response = requests.post(
+            plan_response = http_client.post(
                 f"{PAYPAL_API_URL}/v1/billing/plans",
                 headers=headers,
                 json=plan_payload,
@@ -359,7 +359,7 @@ class PayPalPaymentProcessor:
                 },
             }
             
-            subscription_response = requests.post(
+            subscription_response = http_client.post(
                 f"{PAYPAL_API_URL}/v1/billing/subscriptions",
                 headers=headers,
                 json=subscription_payload,
@@ -398,7 +398,7 @@ class PayPalPaymentProcessor:
                 "Authorization": f"Bearer {access_token}",
             }
             
-            response = requests.get(
+            response = http_client.get(
                 f"{PAYPAL_API_URL}/v1/billing/subscriptions/{subscription_id}",
                 headers=headers,
                 timeout=10
@@ -439,7 +439,7 @@ class PayPalPaymentProcessor:
                 "reason": reason,
             }
             
-            response = requests.post(
+            response = http_client.post(
                 f"{PAYPAL_API_URL}/v1/billing/subscriptions/{subscription_id}/cancel",
                 headers=headers,
                 json=payload,
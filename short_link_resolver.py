@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+توسيع روابط تيك توك المختصرة مع ذاكرة بمدة صلاحية
+Async TikTok short-link resolver with a persisted TTL cache
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import httpx
+import requests
+
+from config import (
+    SHORT_LINK_TTL, SHORT_LINK_CONCURRENCY, SHORT_LINK_TIMEOUT, SHORT_LINK_MEMORY_SIZE,
+)
+from download_executor import DownloadExecutor
+from url_router import URLRouter
+from http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+
+class ShortLinkResolver:
+    """
+    توسيع روابط vm/vt.tiktok.com إلى الرابط الكامل
+
+    التوسيعات تُحفظ في الذاكرة (استجابة فورية للروابط المكررة، بحد أقصى
+    max_entries مع حذف الأقدم استخداماً) وفي جدول short_link_cache حتى تبقى
+    بعد إعادة التشغيل. عدد الطلبات المتزامنة
+    إلى تيك توك محدود، والطلبات المتزامنة لنفس الرابط تنتظر توسيعاً واحداً.
+    """
+
+    def __init__(self, db=None, ttl: int = SHORT_LINK_TTL,
+                 max_concurrent: int = SHORT_LINK_CONCURRENCY,
+                 timeout: float = SHORT_LINK_TIMEOUT,
+                 max_entries: int = SHORT_LINK_MEMORY_SIZE):
+        self.db = db
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_concurrent = max_concurrent
+        self.max_entries = max_entries
+        self._memory: 'OrderedDict[str, Tuple[str, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def bind_database(self, db) -> None:
+        """ربط قاعدة البيانات لحفظ التوسيعات بشكل دائم"""
+        self.db = db
+
+    # ==================== الذاكرة ====================
+
+    def _get_memory(self, short_url: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(short_url)
+            if entry is None:
+                return None
+            canonical_url, expires_at = entry
+            if expires_at <= time.time():
+                del self._memory[short_url]
+                return None
+            self._memory.move_to_end(short_url)
+            return canonical_url
+
+    def _remember(self, short_url: str, canonical_url: str, expires_at: float) -> None:
+        with self._lock:
+            self._memory[short_url] = (canonical_url, expires_at)
+            self._memory.move_to_end(short_url)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _lookup_db(self, short_url: str) -> Optional[str]:
+        """البحث في قاعدة البيانات ونسخ النتيجة إلى الذاكرة"""
+        if self.db is None:
+            return None
+        try:
+            row = self.db.get_short_link(short_url)
+        except Exception as e:
+            logger.warning(f"فشل قراءة ذاكرة الروابط المختصرة: {str(e)}")
+            return None
+        if row is None:
+            return None
+        canonical_url, expires_at = row
+        self._remember(short_url, canonical_url, expires_at)
+        return canonical_url
+
+    def _store(self, short_url: str, canonical_url: str) -> None:
+        """حفظ التوسيع في الذاكرة وقاعدة البيانات"""
+        expires_at = time.time() + self.ttl
+        self._remember(short_url, canonical_url, expires_at)
+        if self.db is not None:
+            try:
+                self.db.save_short_link(short_url, canonical_url, expires_at)
+            except Exception as e:
+                logger.warning(f"فشل حفظ توسيع الرابط المختصر: {str(e)}")
+
+    @staticmethod
+    def _canonical(final_url: str) -> Optional[str]:
+        """الرابط الكامل إذا انتهت التحويلات برابط تيك توك له معرف"""
+        descriptor = URLRouter.parse(final_url)
+        if descriptor and descriptor.platform == 'tiktok' and descriptor.media_id:
+            return descriptor.url
+        return None
+
+    # ==================== التوسيع ====================
+
+    async def resolve(self, url: str) -> str:
+        """
+        توسيع الرابط المختصر بدون حجب حلقة الأحداث
+
+        Args:
+            url: رابط المحتوى (الروابط غير المختصرة تُعاد كما هي)
+
+        Returns:
+            str: الرابط الكامل، أو الرابط الأصلي إذا فشل التوسيع
+        """
+        descriptor = URLRouter.parse(url)
+        if not descriptor or not descriptor.is_short_link:
+            return url
+
+        short_url = descriptor.url
+        canonical_url = self._get_memory(short_url)
+        if canonical_url:
+            return canonical_url
+
+        # طلب متزامن لنفس الرابط: انتظار نفس التوسيع
+        pending = self._pending.get(short_url)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[short_url] = future
+        try:
+            canonical_url = await DownloadExecutor.run_db(self._lookup_db, short_url)
+            if not canonical_url:
+                canonical_url = await self._fetch(short_url)
+                if canonical_url:
+                    await DownloadExecutor.run_db(self._store, short_url, canonical_url)
+            result = canonical_url or url
+            future.set_result(result)
+            return result
+        except BaseException:
+            # المنتظرون يكملون بالرابط الأصلي كما في حالة فشل التوسيع
+            future.set_result(url)
+            raise
+        finally:
+            del self._pending[short_url]
+
+    async def _fetch(self, short_url: str) -> Optional[str]:
+        """تتبع تحويلات الرابط المختصر مع حد لعدد الطلبات المتزامنة"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=self.timeout,
+                headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'},
+            )
+
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await self._client.head(short_url)
+                final_url = str(response.url)
+            except httpx.HTTPError as e:
+                logger.warning(f"فشل توسيع رابط تيك توك {short_url}: {str(e)}")
+                return None
+
+        canonical_url = self._canonical(final_url)
+        if canonical_url:
+            elapsed = (time.perf_counter() - started) * 1000
+            logger.info(f"تم توسيع رابط تيك توك من {short_url} إلى {canonical_url} ({elapsed:.0f}ms)")
+        else:
+            logger.warning(f"توسيع رابط تيك توك لم ينتهِ برابط فيديو: {short_url} -> {final_url}")
+        return canonical_url
+
+    def resolve_sync(self, url: str) -> str:
+        """نسخة حاجبة لمسارات التنزيل التي تعمل في خيوط العمال"""
+        descriptor = URLRouter.parse(url)
+        if not descriptor or not descriptor.is_short_link:
+            return url
+
+        short_url = descriptor.url
+        canonical_url = self._get_memory(short_url) or self._lookup_db(short_url)
+        if canonical_url:
+            return canonical_url
+
+        try:
+            response = http_client.head(short_url, allow_redirects=True, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.warning(f"فشل توسيع رابط تيك توك {short_url}: {str(e)}")
+            return url
+
+        canonical_url = self._canonical(response.url)
+        if not canonical_url:
+            return url
+        self._store(short_url, canonical_url)
+        logger.info(f"تم توسيع رابط تيك توك من {short_url} إلى {canonical_url}")
+        return canonical_url
+
+    async def close(self) -> None:
+        """إغلاق عميل HTTP"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# الموسّع المشترك للبوت ومسارات التنزيل
+short_link_resolver = ShortLinkResolver()
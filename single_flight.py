@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+دمج الطلبات المتزامنة لنفس الوسائط في تنزيل واحد
+In-flight request coalescing (single-flight) for identical media
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class InFlightDownload:
+    """
+    تنزيل قيد التنفيذ يشترك فيه عدة طلبات
+
+    الطلب الأول (القائد) يربط مستقبل التنزيل، وبقية الطلبات تنتظر نفس
+    النتيجة. بعد أول رفع ناجح ينشر القائد file_id حتى ترسله بقية الطلبات
+    مباشرة بدلاً من رفع الملف مرة أخرى.
+    """
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.future: Optional[asyncio.Future] = None
+        self.file_id: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.participants = 0
+        # مجلد المهمة الذي يحذفه آخر مشارك
+        self.workspace: Optional[Any] = None
+
+    async def wait_result(self) -> Any:
+        """انتظار نتيجة التنزيل المشترك (إلغاء المنتظر لا يلغي التنزيل)"""
+        return await asyncio.shield(self.future)
+
+    def publish_file_id(self, file_id: Optional[str]) -> None:
+        """نشر file_id الناتج عن الرفع (أو None عند فشل الرفع)"""
+        if not self.file_id.done():
+            self.file_id.set_result(file_id)
+
+    async def wait_file_id(self, timeout: float) -> Optional[str]:
+        """انتظار file_id من القائد مع مهلة"""
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.file_id), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class SingleFlight:
+    """سجل التنزيلات قيد التنفيذ مفهرسة بالمفتاح الثابت للوسائط"""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, InFlightDownload] = {}
+
+    def join(self, key: Hashable) -> Tuple[InFlightDownload, bool]:
+        """
+        الانضمام إلى تنزيل قائم أو بدء تنزيل جديد
+
+        Returns:
+            tuple: (التنزيل المشترك، هل هذا الطلب هو القائد)
+        """
+        flight = self._flights.get(key)
+        is_leader = flight is None
+        if is_leader:
+            flight = InFlightDownload(key)
+            self._flights[key] = flight
+        else:
+            logger.info(f"🔗 دمج طلب مع تنزيل قائم: {key}")
+        flight.participants += 1
+        return flight, is_leader
+
+    def leave(self, flight: InFlightDownload, is_leader: bool = False) -> bool:
+        """
+        مغادرة التنزيل المشترك
+
+        مغادرة القائد تنشر None إذا لم ينشر file_id بعد (فشل أو إلغاء قبل
+        الرفع)، فيرفع المنضمون الملف بأنفسهم فوراً بدلاً من انتظار المهلة.
+
+        Returns:
+            bool: True إذا كان هذا آخر مشارك (يمكن حذف الملف الآن)
+        """
+        if is_leader:
+            flight.publish_file_id(None)
+        flight.participants -= 1
+        if flight.participants > 0:
+            return False
+
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+        flight.publish_file_id(None)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._flights)
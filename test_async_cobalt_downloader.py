@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار معالج Cobalt غير المتزامن (خادم HTTP محلي)
+Async Cobalt Downloader Test
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import job_workspace
+from async_cobalt_downloader import AsyncCobaltDownloader
+from cobalt_pool import CobaltPool
+
+PAYLOAD = b'x' * (256 * 1024)
+
+
+class CobaltStub(BaseHTTPRequestHandler):
+    """API يُرجع redirect إلى /file على نفس الخادم، و /slow يرسل ببطء"""
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        path = '/slow' if 'slow' in request['url'] else '/file'
+        body = json.dumps({
+            'status': 'redirect',
+            'url': f'http://127.0.0.1:{self.server.server_port}{path}',
+            'filename': 'clip.mp4',
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(PAYLOAD)))
+        self.end_headers()
+        try:
+            for offset in range(0, len(PAYLOAD), 16 * 1024):
+                if self.path == '/slow':
+                    time.sleep(0.05)
+                self.wfile.write(PAYLOAD[offset:offset + 16 * 1024])
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_workspace, 'DOWNLOAD_FOLDER', str(tmp_path))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CobaltStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    pool = CobaltPool([f'http://127.0.0.1:{server.server_port}/'])
+    yield AsyncCobaltDownloader(pool=pool), tmp_path
+    pool.shutdown()
+    server.shutdown()
+
+
+def test_concurrent_downloads_in_event_loop(stub):
+    """عدة تنزيلات متزامنة داخل حلقة الأحداث، والمخزن المباشر"""
+    downloader, tmp_path = stub
+
+    async def run():
+        try:
+            paths = await asyncio.gather(*[
+                downloader.download('https://youtu.be/abc') for _ in range(3)
+            ])
+            media = await downloader.download_stream('https://youtu.be/abc')
+            return paths, media
+        finally:
+            await downloader.close()
+
+    paths, media = asyncio.run(run())
+    assert all(path == str(tmp_path / 'clip.mp4') for path in paths)
+    assert os.path.getsize(paths[0]) == len(PAYLOAD)
+    assert media.size == len(PAYLOAD)
+    assert media.rewind().read() == PAYLOAD
+    media.close()
+
+
+def test_cancellation_removes_partial_file(stub):
+    """إلغاء المهمة يوقف التنزيل ويحذف الملف الجزئي"""
+    downloader, tmp_path = stub
+
+    async def run():
+        task = asyncio.create_task(downloader.download('https://youtu.be/slow'))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        try:
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        finally:
+            await downloader.close()
+
+    asyncio.run(run())
+    assert os.listdir(tmp_path) == []
+    assert downloader.pool.instances[0].in_flight == 0
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار ترتيب طرق التنزيل المتكيف
+Backend Scoreboard Test
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend_stats import BackendScoreboard
+
+METHODS = ['html_parsing', 'json_extraction', 'api_endpoint']
+
+
+def test_broken_method_is_skipped_and_retried_later():
+    """الطريقة المعطلة تُتخطى خلال مدة الاسترداد حتى لو كانت الأرخص، ثم تُجرب بعدها"""
+    board = BackendScoreboard(window=20, min_samples=3, retry_after=60)
+    # إخفاقات فورية: تكلفتها صفر فتبقى أولاً في الترتيب، فلا يبعدها إلا التخطي
+    for _ in range(3):
+        board.record('tiktok', 'photo_urls', 'html_parsing', False, 0.0)
+    board.record('tiktok', 'photo_urls', 'json_extraction', True, 2.0)
+
+    assert board.get_stats()['tiktok/photo_urls/html_parsing']['broken']
+    assert board.order('tiktok', 'photo_urls', METHODS) == ['api_endpoint', 'json_extraction']
+
+    calls = []
+    methods = [
+        ('html_parsing', lambda: calls.append('html_parsing') or ['https://example.com/0.jpg']),
+        ('json_extraction', lambda: calls.append('json_extraction') or ['https://example.com/1.jpg']),
+    ]
+    assert board.run('tiktok', 'photo_urls', methods) == ['https://example.com/1.jpg']
+    assert calls == ['json_extraction']
+
+    # بعد مدة الاسترداد تعود الطريقة إلى مكانها حسب التكلفة
+    board.retry_after = 0
+    assert not board.get_stats()['tiktok/photo_urls/html_parsing']['broken']
+    assert board.order('tiktok', 'photo_urls', METHODS)[0] == 'html_parsing'
+    assert board.run('tiktok', 'photo_urls', methods) == ['https://example.com/0.jpg']
+    assert calls == ['json_extraction', 'html_parsing']
+
+
+def test_faster_method_moves_first_and_all_broken_still_tried():
+    """الأسرع مع نفس نسبة النجاح يتقدم، وإذا تعطلت كل الطرق تبقى قابلة للتجربة"""
+    board = BackendScoreboard(window=20, min_samples=3, retry_after=60)
+    for _ in range(5):
+        board.record('tiktok', 'photo', 'photo_api', True, 3.0)
+        board.record('tiktok', 'photo', 'ytdlp', True, 0.5)
+    assert board.order('tiktok', 'photo', ['photo_api', 'ytdlp']) == ['ytdlp', 'photo_api']
+
+    for _ in range(3):
+        board.record('instagram', 'photo', 'a', False, 1.0)
+        board.record('instagram', 'photo', 'b', False, 1.0)
+    assert sorted(board.order('instagram', 'photo', ['a', 'b'])) == ['a', 'b']
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار قاطع الدائرة
+Circuit Breaker Test
+"""
+
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+def _fail():
+    raise ConnectionError('down')
+
+
+def test_opens_on_error_rate_and_rejects_without_calling():
+    """القاطع يُفتح عند بلوغ نسبة الأخطاء ويرفض الطلبات فوراً"""
+    breaker = CircuitBreaker('test', error_rate=0.5, min_calls=4, window=10, cooldown=60)
+
+    breaker.call(lambda: 'ok')
+    breaker.call(lambda: 'ok')
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: calls.append(1))
+    assert calls == []
+
+    stats = breaker.get_stats()
+    assert stats['state'] == 'open'
+    assert stats['rejected'] == 1
+    assert stats['opened'] == 1
+
+
+def test_content_errors_do_not_open_and_probe_closes():
+    """أخطاء المحتوى لا تفتح القاطع، والفحص الخلفي الناجح يغلقه"""
+    probed = threading.Event()
+    healthy = threading.Event()
+
+    def probe():
+        probed.set()
+        if not healthy.is_set():
+            raise ConnectionError('still down')
+
+    transitions = []
+    breaker = CircuitBreaker('test', probe=probe, error_rate=0.5, min_calls=2,
+                             window=10, cooldown=0.05,
+                             on_change=lambda b: transitions.append(b.get_stats()['state']))
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            breaker.call(lambda: int('x'), is_failure=lambda e: False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+    assert breaker.is_open
+
+    assert probed.wait(2)
+    assert breaker.is_open
+    healthy.set()
+
+    deadline = time.monotonic() + 2
+    while (breaker.is_open or len(transitions) < 2) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.call(lambda: 'ok') == 'ok'
+    # الإبلاغ عند الفتح والإغلاق فقط (لا عند كل فحص فاشل)
+    assert transitions == ['open', 'closed']
+    breaker.shutdown()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار توزيع الطلبات على خوادم Cobalt (خوادم HTTP محلية)
+Cobalt Pool Test
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cobalt_pool import CobaltPool
+from cobalt_downloader import CobaltDownloader
+
+
+def _stub_server(status: int = 200, delay: float = 0.0):
+    """خادم Cobalt وهمي يعد الطلبات ويرد بحالة ثابتة"""
+    class Handler(BaseHTTPRequestHandler):
+        hits = 0
+
+        def do_POST(self):
+            Handler.hits += 1
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(delay)
+            body = json.dumps({'status': 'redirect', 'url': 'http://x/v.mp4'}).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, Handler, f'http://127.0.0.1:{server.server_port}/'
+
+
+def _call(pool: CobaltPool):
+    with pool.acquire() as instance:
+        return CobaltDownloader._request(instance, 'https://youtu.be/abc', 'auto')
+
+
+def test_unhealthy_instance_is_ejected():
+    """الخادم الذي يرد بأخطاء 5xx يُستبعد وتذهب الطلبات إلى الخادم السليم"""
+    broken, broken_handler, broken_url = _stub_server(status=500)
+    healthy, healthy_handler, healthy_url = _stub_server()
+    pool = CobaltPool([broken_url, healthy_url], max_concurrent=4)
+    try:
+        for _ in range(40):
+            try:
+                _call(pool)
+            except Exception:
+                pass
+
+        stats = {s['url']: s for s in pool.get_stats()}
+        assert not stats[broken_url]['healthy']
+        assert stats[broken_url]['breaker']['state'] == 'open'
+        assert healthy_handler.hits + broken_handler.hits == 40
+        assert broken_handler.hits < 20
+        assert not pool.is_open
+
+        hits = broken_handler.hits
+        assert _call(pool)['status'] == 'redirect'
+        assert broken_handler.hits == hits
+
+        # الحالة تظهر في السجلات عبر summary()
+        lines = pool.summary().splitlines()
+        assert lines[0].startswith(f'{broken_url}: open') and 'مفتوح منذ' in lines[0]
+        assert lines[1].startswith(f'{healthy_url}: closed')
+    finally:
+        pool.shutdown()
+        broken.shutdown()
+        healthy.shutdown()
+
+
+def test_faster_instance_gets_more_requests():
+    """الاختيار الموزون بمتوسط الزمن يفضل الخادم الأسرع"""
+    slow, slow_handler, slow_url = _stub_server(delay=0.05)
+    fast, fast_handler, fast_url = _stub_server()
+    pool = CobaltPool([slow_url, fast_url], max_concurrent=4)
+    try:
+        for _ in range(30):
+            assert _call(pool)['status'] == 'redirect'
+        assert fast_handler.hits > slow_handler.hits
+    finally:
+        pool.shutdown()
+        slow.shutdown()
+        fast.shutdown()
+
+
+def test_concurrency_cap_per_instance():
+    """لا يُحجز على الخادم أكثر من حده المتزامن"""
+    pool = CobaltPool(['http://127.0.0.1:9/'], max_concurrent=1, acquire_timeout=0.2)
+    try:
+        with pool.acquire() as instance:
+            assert instance.in_flight == 1
+            with pytest.raises(TimeoutError):
+                with pool.acquire():
+                    pass
+        with pool.acquire() as instance:
+            assert instance.in_flight == 1
+    finally:
+        pool.shutdown()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار ذاكرة الوسائط على القرص
+Disk Media Cache Test
+"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import disk_cache
+from disk_cache import DiskMediaCache
+
+
+class FakeClock:
+    """ساعة يدوية حتى لا يعتمد ترتيب LRU والصلاحية على سرعة الاختبار"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def _cache(root, clock, monkeypatch, max_bytes=100, ttl=60):
+    monkeypatch.setattr(disk_cache, 'time', clock)
+    return DiskMediaCache(str(root), max_bytes=max_bytes, ttl=ttl, enabled=True)
+
+
+def _use(cache, path):
+    """انتهاء الإرسال: تحرير المسار الذي أعادته get() أو put()"""
+    cache.release(path)
+    return path
+
+
+def _download(tmp_path, name, size):
+    """ملف منزل داخل مجلد مهمة خارج الذاكرة"""
+    path = tmp_path / 'job' / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(b'x' * size)
+    return str(path)
+
+
+def test_put_moves_file_and_cache_owns_it(tmp_path, monkeypatch):
+    """الملف يُنقل إلى الذاكرة باسمه الأصلي بدون بقايا .part، والذاكرة تملكه"""
+    cache = _cache(tmp_path / 'cache', FakeClock(), monkeypatch)
+    src = _download(tmp_path, 'song.mp3', 10)
+
+    path = cache.put('tiktok:1:audio:default', src)
+    assert not os.path.exists(src)
+    assert os.path.basename(path) == 'song.mp3'
+    assert not os.path.exists(path + DiskMediaCache.PART_SUFFIX)
+    assert cache.get('tiktok:1:audio:default') == path
+    assert cache.owns(path)
+    assert not cache.owns(_download(tmp_path, 'other.mp4', 1))
+    assert not cache.owns(None)
+
+
+def test_put_keeps_existing_valid_entry(tmp_path, monkeypatch):
+    """إضافة مفتاح موجود تُبقي النسخة المخزنة وتحذف الملف الجديد"""
+    cache = _cache(tmp_path / 'cache', FakeClock(), monkeypatch)
+    first = cache.put('k', _download(tmp_path, 'a.mp4', 10))
+    second_src = _download(tmp_path, 'b.mp4', 20)
+
+    assert cache.put('k', second_src) == first
+    assert not os.path.exists(second_src)
+    assert cache.total_bytes() == 10
+
+
+def test_least_recently_used_is_evicted_first(tmp_path, monkeypatch):
+    """عند تجاوز الحد يُحذف الأقدم استخداماً، لا الأقدم إضافة"""
+    clock = FakeClock()
+    cache = _cache(tmp_path / 'cache', clock, monkeypatch, max_bytes=100)
+    a = _use(cache, cache.put('a', _download(tmp_path, 'a.mp4', 40)))
+    clock.now += 1
+    _use(cache, cache.put('b', _download(tmp_path, 'b.mp4', 40)))
+    clock.now += 1
+    assert _use(cache, cache.get('a')) == a
+    clock.now += 1
+
+    c = _use(cache, cache.put('c', _download(tmp_path, 'c.mp4', 40)))
+    assert cache.get('b') is None
+    assert _use(cache, cache.get('a')) == a
+    assert _use(cache, cache.get('c')) == c
+    assert cache.total_bytes() == 80
+
+    # ملف أكبر من الحد الكلي لا يدخل الذاكرة
+    big = _download(tmp_path, 'big.mp4', 101)
+    assert cache.put('big', big) == big
+
+
+def test_expired_entries_are_dropped(tmp_path, monkeypatch):
+    """العنصر المنتهي لا يُعاد ويُحذف من القرص"""
+    clock = FakeClock()
+    cache = _cache(tmp_path / 'cache', clock, monkeypatch, ttl=60)
+    path = _use(cache, cache.put('k', _download(tmp_path, 'a.mp4', 10)))
+
+    clock.now += 61
+    assert cache.get('k') is None
+    assert not os.path.exists(path)
+    assert cache.total_bytes() == 0
+
+
+def test_index_survives_restart_and_drops_leftovers(tmp_path, monkeypatch):
+    """بعد إعادة التشغيل يُقرأ الفهرس، وتُحذف المجلدات غير المفهرسة والعناصر المنتهية"""
+    clock = FakeClock()
+    root = tmp_path / 'cache'
+    cache = _cache(root, clock, monkeypatch, ttl=60)
+    old = _use(cache, cache.put('old', _download(tmp_path, 'a.mp4', 10)))
+    clock.now += 30
+    recent = _use(cache, cache.put('recent', _download(tmp_path, 'b.mp4', 10)))
+
+    leftover = root / 'unfinished'
+    leftover.mkdir()
+    (leftover / 'c.mp4.part').write_bytes(b'x')
+
+    clock.now += 15
+    restarted = _cache(root, clock, monkeypatch, ttl=60)
+    assert _use(restarted, restarted.get('old')) == old
+    assert _use(restarted, restarted.get('recent')) == recent
+    assert not leftover.exists()
+
+    clock.now += 20
+    reloaded = _cache(root, clock, monkeypatch, ttl=60)
+    assert not os.path.exists(old)
+    assert reloaded.get('old') is None
+    assert reloaded.get('recent') == recent
+
+
+def test_pinned_entries_survive_eviction_and_expiry(tmp_path, monkeypatch):
+    """الملف قيد الإرسال لا يُحذف بالإخلاء أو انتهاء الصلاحية حتى يُحرر"""
+    clock = FakeClock()
+    cache = _cache(tmp_path / 'cache', clock, monkeypatch, max_bytes=100, ttl=60)
+    sending = cache.put('a', _download(tmp_path, 'a.mp4', 60))
+    clock.now += 1
+
+    # الحد متجاوز لكن العنصر الأقدم مثبت: يبقى مع العنصر الجديد
+    b = _use(cache, cache.put('b', _download(tmp_path, 'b.mp4', 60)))
+    assert os.path.exists(sending) and os.path.exists(b)
+
+    clock.now += 60
+    assert cache.get('a') is None
+    assert os.path.exists(sending)
+    # نسخة جديدة لا تحل محل النسخة المنتهية أثناء إرسالها
+    fresh = _download(tmp_path, 'a2.mp4', 10)
+    assert cache.put('a', fresh) == fresh
+
+    cache.release(sending)
+    assert cache.get('a') is None
+    assert not os.path.exists(sending)
+
+    # التثبيت المنسي يُهمل بعد PIN_TTL
+    forgotten = cache.put('c', _download(tmp_path, 'c.mp4', 10))
+    clock.now += DiskMediaCache.PIN_TTL + 61
+    assert cache.get('c') is None
+    assert not os.path.exists(forgotten)
+
+
+def test_hits_flush_index_lazily(tmp_path, monkeypatch):
+    """القراءة لا تعيد كتابة الفهرس، ووقت الاستخدام يُحفظ عند flush() أو بعد الفترة"""
+    clock = FakeClock()
+    root = tmp_path / 'cache'
+    cache = _cache(root, clock, monkeypatch, ttl=600)
+    _use(cache, cache.put('k', _download(tmp_path, 'a.mp4', 10)))
+    index = root / DiskMediaCache.INDEX_FILE
+
+    def saved_access():
+        return json.loads(index.read_text())['k']['last_access']
+
+    clock.now += 5
+    _use(cache, cache.get('k'))
+    assert saved_access() == 1000.0
+    cache.flush()
+    assert saved_access() == 1005.0
+
+    clock.now += DiskMediaCache.INDEX_FLUSH_INTERVAL
+    _use(cache, cache.get('k'))
+    assert saved_access() == clock.now
+
+
+def test_disabled_cache_passes_files_through(tmp_path):
+    """الذاكرة المعطلة لا تنقل الملفات ولا تملكها"""
+    cache = DiskMediaCache(str(tmp_path / 'cache'), enabled=False)
+    src = _download(tmp_path, 'a.mp4', 10)
+    assert cache.put('k', src) == src
+    assert cache.get('k') is None
+    assert not cache.owns(src)
+    assert not (tmp_path / 'cache').exists()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار السباق المتحوط بين طرق التنزيل
+Hedged Race Test
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from hedged_race import HedgedRace, DownloadCancelled, raise_if_cancelled, wait_for_guard
+from media_probe import MediaTooLargeError
+
+
+def _slow(result, seconds):
+    def leg():
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            raise_if_cancelled()
+            time.sleep(0.005)
+        return result
+    return leg
+
+
+def _fail():
+    raise RuntimeError("cobalt down")
+
+
+def test_fast_primary_wins_without_hedging():
+    """الأساسية تنتهي قبل المهلة: البديلة لا تبدأ"""
+    race = HedgedRace(delay=0.5)
+    started = []
+    result = race.run(lambda: 'cobalt', lambda: started.append(1) or 'ytdlp')
+    assert result == 'cobalt' and started == []
+    assert race.get_stats()['primary_wins'] == 1
+    race.shutdown()
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    """بعد المهلة تبدأ البديلة وتفوز، والأساسية تُلغى"""
+    race = HedgedRace(delay=0.05)
+    cancelled = []
+
+    def primary():
+        try:
+            return _slow('cobalt', 2)()
+        except DownloadCancelled:
+            cancelled.append(True)
+            raise
+
+    started = time.monotonic()
+    assert race.run(primary, _slow('ytdlp', 0.05)) == 'ytdlp'
+    assert time.monotonic() - started < 1
+    race.shutdown(wait=True)
+    assert cancelled == [True]
+    assert race.get_stats()['hedged'] == 1
+
+
+def test_failed_primary_starts_fallback_immediately():
+    """فشل الأساسية يبدأ البديلة فوراً بدون انتظار المهلة، وفشل الطريقتين يرفع الخطأ"""
+    race = HedgedRace(delay=5)
+    started = time.monotonic()
+    assert race.run(_fail, lambda: 'ytdlp') == 'ytdlp'
+    assert time.monotonic() - started < 1
+
+    with pytest.raises(RuntimeError):
+        race.run(_fail, _fail)
+    race.shutdown()
+
+
+def test_failed_guard_cancels_race():
+    """فشل الحارس (فحص الحجم) يلغي الطريقتين ويرفع خطأه"""
+    race = HedgedRace(delay=0.05)
+    cancelled = []
+
+    def leg(name):
+        def run():
+            try:
+                return _slow(name, 2)()
+            except DownloadCancelled:
+                cancelled.append(name)
+                raise
+        return run
+
+    def too_large():
+        time.sleep(0.1)
+        raise MediaTooLargeError(80, 50)
+
+    started = time.monotonic()
+    with pytest.raises(MediaTooLargeError):
+        race.run(leg('cobalt'), leg('ytdlp'), guard=race.submit(too_large))
+    assert time.monotonic() - started < 1
+    race.shutdown(wait=True)
+    assert sorted(cancelled) == ['cobalt', 'ytdlp']
+
+
+def test_passing_guard_does_not_start_fallback_early():
+    """انتهاء الحارس بنجاح لا يبدأ البديلة قبل المهلة"""
+    race = HedgedRace(delay=0.5)
+    started = []
+    result = race.run(
+        _slow('cobalt', 0.1), lambda: started.append(1) or 'ytdlp',
+        guard=race.submit(lambda: 'probe ok'),
+    )
+    assert result == 'cobalt' and started == []
+    race.shutdown()
+
+
+def test_legs_wait_for_guard_before_fetching_bytes():
+    """الطريقة تنتظر نجاح الحارس قبل قراءة البايتات، ولا تقرأها إذا رفضها"""
+    race = HedgedRace(delay=5)
+    fetched = []
+
+    def cobalt():
+        # طلب API يسبق الحارس، والتنزيل بعده
+        wait_for_guard()
+        fetched.append(time.monotonic())
+        return 'cobalt'
+
+    def probe(error=None):
+        time.sleep(0.1)
+        if error:
+            raise error
+        return 'probe ok'
+
+    guard = race.submit(probe)
+    assert race.run(cobalt, lambda: 'ytdlp', guard=guard) == 'cobalt'
+    assert guard.done() and len(fetched) == 1
+
+    with pytest.raises(MediaTooLargeError):
+        race.run(cobalt, lambda: 'ytdlp', guard=race.submit(probe, MediaTooLargeError(80, 50)))
+    race.shutdown(wait=True)
+    assert len(fetched) == 1
+
+    # خارج السباق لا يوجد حارس
+    wait_for_guard()
+
+
+def test_cancelled_loser_keeps_a_slot_until_it_exits():
+    """الخاسرة العالقة تنتقل إلى حد الخاسرات فلا تؤخر السباق التالي، وبعد امتلائه تبقى في مكانها حتى يخرج خيطها"""
+    race = HedgedRace(delay=0.01, max_workers=2, max_stragglers=1)
+    stuck = lambda: time.sleep(1) or 'cobalt'
+    assert race.run(stuck, _slow('ytdlp', 0.05)) == 'ytdlp'
+
+    started = time.monotonic()
+    assert race.run(_fail, lambda: 'ytdlp') == 'ytdlp'
+    assert time.monotonic() - started < 0.5
+
+    # حد الخاسرات ممتلئ: الخاسرة الثانية تشغل مكاناً من max_workers
+    assert race.run(stuck, _slow('ytdlp', 0.05)) == 'ytdlp'
+    time.sleep(0.05)
+    assert race._slots._value == 1
+    assert len(race._threads) == 2
+
+    race.shutdown(wait=True)
+    assert race._slots._value == 2 and race._stragglers._value == 1
+    assert not race._threads
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار عميل HTTP المشترك (خادم HTTP محلي)
+Shared HTTP Client Test
+"""
+
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from http_client import HttpClient
+from config import HTTP_USER_AGENT
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """يرد بـ 503 على أول طلب لكل مسار ثم 200"""
+    protocol_version = 'HTTP/1.1'
+    seen = []
+    ports = set()
+
+    def _reply(self):
+        FlakyHandler.seen.append((self.command, self.path, self.headers.get('User-Agent')))
+        FlakyHandler.ports.add(self.client_address[1])
+        status = 503 if [p for _, p, _ in FlakyHandler.seen].count(self.path) == 1 else 200
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+def test_retries_idempotent_requests_and_reuses_connections():
+    """GET يُعاد بعد 503 و POST لا يُعاد، وجميع الطلبات على اتصال واحد"""
+    FlakyHandler.seen = []
+    FlakyHandler.ports = set()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    client = HttpClient(retries=2, backoff=0.01)
+    try:
+        assert client.get(f'{base}/a').status_code == 200
+        assert client.post(f'{base}/b', json={}).status_code == 503
+        assert client.get(f'{base}/c', headers={'User-Agent': 'custom'}).status_code == 200
+
+        assert [(m, p) for m, p, _ in FlakyHandler.seen] == [
+            ('GET', '/a'), ('GET', '/a'), ('POST', '/b'), ('GET', '/c'), ('GET', '/c'),
+        ]
+        assert FlakyHandler.seen[0][2] == HTTP_USER_AGENT
+        assert FlakyHandler.seen[-1][2] == 'custom'
+        assert len(FlakyHandler.ports) == 1
+    finally:
+        client.close()
+        server.shutdown()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار فحص بصمة الصور أثناء التنزيل وتحويل WebP
+Image Format Test
+"""
+
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chunked_downloader import ChunkedDownloader
+from image_format import ImageFormat, NotAnImageError
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * (200 * 1024)
+ERROR_PAGE = b'<!DOCTYPE html><html>' + b' ' * (2 * 1024 * 1024)
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """/image.png صورة، و /error صفحة HTML كبيرة مع Content-Type صورة"""
+
+    def do_GET(self):
+        content = PNG if self.path == '/image.png' else ERROR_PAGE
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        try:
+            self.wfile.write(content)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def test_html_rejected_from_first_bytes(tmp_path):
+    """الصورة تُكتب كاملة، وصفحة الخطأ تُرفض قبل كتابة أي ملف"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    try:
+        path = ChunkedDownloader.download(f'{base}/image.png', str(tmp_path / 'a.jpg'),
+                                          sniff=ImageFormat.check)
+        with pytest.raises(NotAnImageError):
+            ChunkedDownloader.download(f'{base}/error', str(tmp_path / 'b.jpg'),
+                                       sniff=ImageFormat.check)
+    finally:
+        server.shutdown()
+
+    assert open(path, 'rb').read() == PNG
+    assert os.listdir(tmp_path) == ['a.jpg']
+
+
+def test_webp_converted_to_jpeg(tmp_path):
+    """WebP يُحول إلى JPEG في نفس المسار عند توفر Pillow"""
+    Image = pytest.importorskip('PIL.Image')
+    path = str(tmp_path / 'slide.jpg')
+    Image.new('RGB', (8, 8), 'red').save(path, 'WEBP')
+    assert ImageFormat.detect_file(path) == 'webp'
+
+    assert ImageFormat.normalize(path) == path
+    assert ImageFormat.detect_file(path) == 'jpeg'
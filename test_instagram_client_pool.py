@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار مجموعة عملاء انستقرام (بدون اتصال بانستقرام)
+Instagram Client Pool Test
+"""
+
+import os
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from instagram_client_pool import InstagramClientPool, InstagramBudgetExceeded, InstagramLoginBackoff
+
+
+class FakeClient:
+    """يحاكي load_settings / login / dump_settings في instagrapi"""
+
+    created = []
+
+    def __init__(self):
+        self.settings = {'uuid': f'device-{len(self.created)}'}
+        self.logins = 0
+        self.active = 0
+        self.created.append(self)
+
+    def load_settings(self, path):
+        with open(path) as f:
+            self.settings = json.load(f)
+
+    def dump_settings(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.settings, f)
+
+    def login(self, username, password):
+        self.logins += 1
+
+
+def test_clients_reused_with_persisted_session(tmp_path):
+    """العميل يُنشأ مرة واحدة، والجلسة المحفوظة تُستخدم بعد إعادة التشغيل"""
+    FakeClient.created = []
+    accounts = [('alice', 'secret')]
+    pool = InstagramClientPool(accounts, str(tmp_path), budget=10, client_factory=FakeClient)
+    for _ in range(3):
+        with pool.acquire() as client:
+            assert client is FakeClient.created[0]
+    assert len(FakeClient.created) == 1 and client.logins == 1
+
+    restarted = InstagramClientPool(accounts, str(tmp_path), budget=10, client_factory=FakeClient)
+    with restarted.acquire() as client:
+        assert client.settings == {'uuid': 'device-0'}
+
+
+def test_exclusive_checkout_and_budget(tmp_path):
+    """كل عميل لطلب واحد في كل مرة، وتجاوز حصة جميع الحسابات يُرفض"""
+    FakeClient.created = []
+    pool = InstagramClientPool([('a', 'x'), ('b', 'y')], str(tmp_path), budget=3,
+                               client_factory=FakeClient)
+    overlaps = []
+
+    def use(_):
+        with pool.acquire() as client:
+            client.active += 1
+            overlaps.append(client.active)
+            time.sleep(0.05)
+            client.active -= 1
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(use, range(6)))
+
+    assert max(overlaps) == 1
+    assert [stats['used'] for stats in pool.get_stats()] == [3, 3]
+    with pytest.raises(InstagramBudgetExceeded):
+        with pool.acquire():
+            pass
+
+
+class BadPasswordClient(FakeClient):
+    """عميل يفشل تسجيل دخوله للحساب 'locked'"""
+
+    def login(self, username, password):
+        super().login(username, password)
+        if username == 'locked':
+            raise RuntimeError('bad password')
+
+
+def test_failed_login_skips_account_during_backoff(tmp_path):
+    """فشل تسجيل الدخول لا يُعاد مع كل طلب: الحساب يُتخطى حتى انتهاء مدة الانتظار"""
+    FakeClient.created = []
+    pool = InstagramClientPool([('locked', 'x'), ('ok', 'y')], str(tmp_path), budget=10,
+                               login_backoff=60, client_factory=BadPasswordClient)
+    with pytest.raises(RuntimeError):
+        with pool.acquire():
+            pass
+
+    for _ in range(3):
+        with pool.acquire() as client:
+            assert client is FakeClient.created[1]
+    assert sum(client.logins for client in FakeClient.created) == 2
+    assert pool.get_stats()[0]['login_error'] == 'RuntimeError: bad password'
+
+    # بدون حسابات أخرى يُرفض الطلب بدون محاولة تسجيل دخول جديدة
+    only_locked = InstagramClientPool([('locked', 'x')], str(tmp_path), budget=10,
+                                      login_backoff=60, client_factory=BadPasswordClient)
+    only_locked.clients[0].login_retry_at = time.time() + 60
+    with pytest.raises(InstagramLoginBackoff):
+        with only_locked.acquire():
+            pass
+    assert len(FakeClient.created) == 2
+
+    # بعد انتهاء المدة يُجرب الحساب مرة أخرى
+    pool.clients[0].login_retry_at = 0
+    with pytest.raises(RuntimeError):
+        with pool.acquire():
+            pass
+    assert len(FakeClient.created) == 3
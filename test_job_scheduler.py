@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار مجدول التنزيل حسب الأولوية
+Priority Job Scheduler Test
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from job_scheduler import PriorityJobScheduler
+
+
+def test_weighted_order_does_not_starve_free_users():
+    """الخطط المدفوعة تتقدم، لكن المستخدم المجاني يحصل على دوره"""
+    scheduler = PriorityJobScheduler(workers=1, weights={"pro": 3, "free": 1})
+    lengths = {"pro": 100, "free": 100}
+    credits = {"pro": 0, "free": 0}
+
+    order = [scheduler._select_class(lengths, credits) for _ in range(8)]
+
+    assert order.count("pro") == 6
+    assert order.count("free") == 2
+
+
+def test_position_and_execution_order():
+    """الموقع المعروض يطابق ترتيب التنفيذ الفعلي"""
+
+    async def scenario():
+        scheduler = PriorityJobScheduler(workers=1, weights={"pro": 3, "free": 1})
+        gate = threading.Event()
+        executed = []
+
+        def work(name):
+            gate.wait(5)
+            executed.append(name)
+            return name
+
+        # مهمة أولى تشغل العامل الوحيد
+        blocker = scheduler.submit("free", work, "blocker")
+        await asyncio.sleep(0.05)
+
+        free_job = scheduler.submit("free", work, "free")
+        pro_jobs = [scheduler.submit("pro", work, f"pro{i}") for i in range(3)]
+
+        expected = sorted(
+            [free_job] + pro_jobs, key=lambda job: scheduler.position(job)
+        )
+        assert scheduler.position(blocker) == 0
+        assert scheduler.position(pro_jobs[0]) == 1
+
+        gate.set()
+        await asyncio.gather(blocker, free_job, *pro_jobs)
+        await scheduler.stop()
+
+        assert executed[0] == "blocker"
+        assert executed[1:] == [job.args[0] for job in expected]
+
+    asyncio.run(scenario())
+
+
+def test_failed_job_propagates_exception():
+    """خطأ التنزيل يصل إلى من ينتظر المهمة"""
+
+    async def scenario():
+        scheduler = PriorityJobScheduler(workers=2)
+
+        def fail():
+            raise ValueError("boom")
+
+        job = scheduler.submit("basic", fail)
+        try:
+            await job
+            raised = False
+        except ValueError:
+            raised = True
+        await scheduler.stop()
+        return raised
+
+    assert asyncio.run(scenario())
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار مجلدات المهام وحذف المجلدات المهجورة
+Job Workspace Test
+"""
+
+import os
+import sys
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from job_workspace import JobWorkspace, WorkspaceJanitor, job_folder
+
+
+def test_workspace_removed_on_error_and_bound_to_threads(tmp_path):
+    """المجلد يُحذف عند الخطأ، وخيوط السياق المنسوخ ترى مجلد المهمة"""
+    with pytest.raises(RuntimeError):
+        with JobWorkspace(str(tmp_path)) as workspace, workspace.activate():
+            assert job_folder() == workspace.path
+            context = contextvars.copy_context()
+            with ThreadPoolExecutor(1) as pool:
+                assert pool.submit(context.run, job_folder).result() == workspace.path
+            open(os.path.join(job_folder(), 'clip.mp4'), 'wb').close()
+            raise RuntimeError('download failed')
+
+    assert os.listdir(tmp_path) == []
+    assert job_folder() != workspace.path
+
+
+def test_janitor_removes_only_old_abandoned_job_folders(tmp_path):
+    """تُحذف مجلدات job_ القديمة المهجورة فقط، لا المجلدات المفتوحة مهما كان عمرها"""
+    abandoned = tmp_path / f'{JobWorkspace.PREFIX}crashed'
+    abandoned.mkdir()
+    recent = tmp_path / f'{JobWorkspace.PREFIX}recent'
+    recent.mkdir()
+    waiting = JobWorkspace(str(tmp_path))
+    (tmp_path / 'cache').mkdir()
+    past = time.time() - 3600
+    for path in (abandoned, waiting.path, tmp_path / 'cache'):
+        os.utime(path, (past, past))
+
+    assert WorkspaceJanitor(str(tmp_path), max_age=600).sweep() == 1
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        ['cache', recent.name, os.path.basename(waiting.path)]
+    )
+
+    # بعد إغلاق المهمة يُحذف مجلدها (ولا يبقى مسجلاً)
+    waiting.close()
+    assert not JobWorkspace.is_open(waiting.path)
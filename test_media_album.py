@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار تنزيل جميع عناصر الألبوم (picker) بالتوازي
+Media Album Test
+"""
+
+import os
+import sys
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import job_workspace
+from media_album import MediaAlbum
+from cobalt_downloader import CobaltDownloader
+from tiktok_page import download_slideshow
+
+
+def body(name: str) -> bytes:
+    """محتوى العنصر: الصور تبدأ ببصمة JPEG"""
+    content = f'item-{name}'.encode()
+    return content if name == 'music' else b'\xff\xd8\xff' + content
+
+
+class ItemHandler(BaseHTTPRequestHandler):
+    """/item/N يُرجع محتوى العنصر N، و /missing يُرجع 404"""
+
+    def do_GET(self):
+        if self.path == '/missing':
+            self.send_error(404)
+            return
+        name = self.path.rsplit("/", 1)[-1]
+        if name.isdigit():
+            # الشرائح الأولى أبطأ: الترتيب يجب ألا يعتمد على وقت الانتهاء
+            time.sleep(0.1 / (int(name) + 1))
+        content = body(name)
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg' if name == 'music' else 'image/jpeg')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_picker_downloads_all_items_into_job_directory(tmp_path, monkeypatch):
+    """كل العناصر تُنزل بالترتيب في مجلد مستقل لكل مهمة، والعنصر الفاشل يُتخطى"""
+    monkeypatch.setattr(job_workspace, 'DOWNLOAD_FOLDER', str(tmp_path))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ItemHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    data = {'status': 'picker', 'picker': [
+        {'type': 'photo', 'url': f'{base}/item/0'},
+        {'type': 'video', 'url': f'{base}/item/1'},
+        {'type': 'photo', 'url': f'{base}/missing'},
+        {'type': 'photo', 'url': f'{base}/item/3'},
+    ]}
+    try:
+        first = CobaltDownloader._download_picker(data, 'https://instagram.com/p/x')['album']
+        second = CobaltDownloader._download_picker(data, 'https://instagram.com/p/x')['album']
+    finally:
+        server.shutdown()
+
+    assert first.directory != second.directory
+    assert [kind for _, kind in first.items] == ['photo', 'video', 'photo']
+    assert [open(path, 'rb').read() for path, _ in first.items] == [body('0'), body('1'), body('3')]
+
+    first.close()
+    second.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_tiktok_slideshow_keeps_order_and_audio(tmp_path, monkeypatch):
+    """جميع الشرائح بالترتيب الأصلي، والموسيقى منفصلة عن عناصر المجموعة"""
+    monkeypatch.setattr(job_workspace, 'DOWNLOAD_FOLDER', str(tmp_path))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ItemHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    try:
+        album = download_slideshow(
+            '7301234567890123457', [f'{base}/item/{i}' for i in range(6)], f'{base}/item/music'
+        )
+    finally:
+        server.shutdown()
+
+    assert [open(path, 'rb').read() for path, _ in album.items] == [body(str(i)) for i in range(6)]
+    assert open(album.audio, 'rb').read() == b'item-music'
+    album.close()
+
+
+def test_chunks_of_ten():
+    """الألبوم يُقسم إلى مجموعات من 10 عناصر"""
+    album = MediaAlbum('unused')
+    album.items = [(f'{i}.jpg', 'photo') for i in range(23)]
+    assert [len(chunk) for chunk in album.chunks()] == [10, 10, 3]
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار فحص حجم الوسائط قبل التنزيل
+Media Probe Test
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import MAX_FILE_SIZE
+from media_probe import MediaProbe, MediaTooLargeError, SizeConstrainedFormat
+
+VIDEO_URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+MB = 1024 * 1024
+
+
+def test_estimate_size():
+    """الحجم من filesize أو filesize_approx أو معدل البت × المدة"""
+    assert MediaProbe.estimate_size({'filesize': 10 * MB}, 'video') == 10 * MB
+    merged = {'requested_formats': [{'filesize': 8 * MB}, {'filesize_approx': 2 * MB}]}
+    assert MediaProbe.estimate_size(merged, 'video') == 10 * MB
+    assert MediaProbe.estimate_size({'tbr': 800, 'duration': 100}, 'video') == 10_000_000
+    assert MediaProbe.estimate_size({'duration': 60}, 'audio') == 60 * 192_000 // 8
+    assert MediaProbe.estimate_size({'duration': 60}, 'video') is None
+
+
+def test_check_rejects_oversized_media(monkeypatch):
+    """رفض الوسائط الكبيرة بدون تنزيل، والسماح عند عدم توفر الحجم"""
+    infos = {'info': {'filesize': 80 * MB, 'duration': 600}}
+    monkeypatch.setattr(MediaProbe, '_extract_info', staticmethod(lambda url, media_type, max_bytes: infos['info']))
+
+    max_bytes = MediaProbe.max_bytes_for_tier('premium')
+    assert max_bytes == MAX_FILE_SIZE
+
+    with pytest.raises(MediaTooLargeError) as error:
+        MediaProbe.check(VIDEO_URL, 'video', max_bytes)
+    assert error.value.size_bytes == 80 * MB
+
+    infos['info'] = {'duration': 600}
+    assert MediaProbe.check(VIDEO_URL, 'video', max_bytes).size_bytes is None
+
+
+def test_format_selector_fits_budget():
+    """أعلى جودة ضمن الميزانية، ثم دقة أقل عند عدم توفر الحجم"""
+    formats = [
+        {'format_id': '18', 'height': 360, 'ext': 'mp4', 'filesize_approx': 9 * MB},
+        {'format_id': '22', 'height': 720, 'ext': 'mp4', 'filesize_approx': 30 * MB},
+        {'format_id': '37', 'height': 1080, 'ext': 'mp4', 'filesize': 75 * MB},
+        {'format_id': '137', 'height': 1080, 'ext': 'mp4', 'acodec': 'none', 'filesize': 20 * MB},
+    ]
+    assert SizeConstrainedFormat(50 * MB).select(formats)['format_id'] == '22'
+    assert SizeConstrainedFormat(10 * MB).select(formats)['format_id'] == '18'
+    assert SizeConstrainedFormat(1 * MB).select(formats)['format_id'] == '18'
+
+    unknown = [{'format_id': str(h), 'height': h} for h in (1080, 720, 480)]
+    assert SizeConstrainedFormat(50 * MB).select(unknown)['format_id'] == '720'
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار تمرير التنزيل إلى مخزن مؤقت محدود
+Streamed Media Test
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from media_probe import MediaTooLargeError
+from media_stream import StreamedMedia
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, content_length=None):
+        self.body = body
+        self.headers = {} if content_length is None else {'Content-Length': str(content_length)}
+        self.read_bytes = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            chunk = self.body[i:i + chunk_size]
+            self.read_bytes += len(chunk)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_is_bounded():
+    """رفض الحجم الكبير من Content-Length قبل القراءة، وإيقاف القراءة عند تجاوز الحد"""
+    response = FakeResponse(b'x' * 1000, content_length=1000)
+    with pytest.raises(MediaTooLargeError):
+        StreamedMedia.from_response(response, 'video.mp4', max_bytes=500)
+    assert response.read_bytes == 0 and response.closed
+
+    response = FakeResponse(b'x' * 300_000)
+    with pytest.raises(MediaTooLargeError):
+        StreamedMedia.from_response(response, 'video.mp4', max_bytes=100_000)
+    assert response.read_bytes < 300_000
+
+    media = StreamedMedia.from_response(FakeResponse(b'abc' * 1000), 'video.mp4', max_bytes=100_000)
+    assert media.size == 3000 and media.in_memory
+    assert media.rewind().read() == b'abc' * 1000
+    media.close()
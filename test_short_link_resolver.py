@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار توسيع روابط تيك توك المختصرة
+Short Link Resolver Test
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database_models import Database
+from short_link_resolver import ShortLinkResolver
+
+SHORT_URL = 'https://vm.tiktok.com/ZMabcdEF/'
+CANONICAL_URL = 'https://www.tiktok.com/@user/video/7301234567890123456'
+
+
+def _resolver(db, calls):
+    resolver = ShortLinkResolver(db, ttl=60, max_concurrent=2)
+
+    async def fake_fetch(short_url):
+        calls.append(short_url)
+        await asyncio.sleep(0.01)
+        return CANONICAL_URL
+
+    resolver._fetch = fake_fetch
+    return resolver
+
+
+def test_concurrent_and_repeated_links_resolve_once():
+    """الطلبات المتزامنة والمكررة لنفس الرابط المختصر تُوسّع مرة واحدة"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'test.db'))
+        calls = []
+        resolver = _resolver(db, calls)
+
+        async def scenario():
+            results = await asyncio.gather(*[resolver.resolve(SHORT_URL) for _ in range(5)])
+            results.append(await resolver.resolve('https://vm.tiktok.com/ZMabcdEF'))
+            return results
+
+        assert asyncio.run(scenario()) == [CANONICAL_URL] * 6
+        assert calls == [SHORT_URL]
+
+        # بعد إعادة التشغيل: التوسيع يُقرأ من قاعدة البيانات
+        restarted_calls = []
+        restarted = _resolver(db, restarted_calls)
+        assert restarted.resolve_sync(SHORT_URL) == CANONICAL_URL
+        assert restarted_calls == []
+
+
+def test_non_short_links_are_untouched():
+    """الروابط غير المختصرة تُعاد كما هي بدون أي طلب"""
+    calls = []
+    resolver = _resolver(None, calls)
+    url = 'https://www.tiktok.com/@user/video/7301234567890123456?lang=ar'
+    assert asyncio.run(resolver.resolve(url)) == url
+    assert resolver.resolve_sync('https://youtu.be/dQw4w9WgXcQ') == 'https://youtu.be/dQw4w9WgXcQ'
+    assert calls == []
+
+
+def test_memory_keeps_most_recently_used_links():
+    """ذاكرة التوسيعات محدودة وتحذف الأقدم استخداماً (قاعدة البيانات تبقى المرجع)"""
+    resolver = ShortLinkResolver(None, ttl=60, max_entries=2)
+    expires_at = time.time() + 60
+    resolver._remember('a', CANONICAL_URL, expires_at)
+    resolver._remember('b', CANONICAL_URL, expires_at)
+    assert resolver._get_memory('a') == CANONICAL_URL
+    resolver._remember('c', CANONICAL_URL, expires_at)
+
+    assert list(resolver._memory) == ['a', 'c']
+    assert resolver._get_memory('b') is None
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار دمج الطلبات المتزامنة لنفس الوسائط
+Single Flight Test
+"""
+
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from single_flight import SingleFlight
+
+KEY = (('tiktok', '7301234567890123456'), 'video')
+
+
+def test_only_first_request_leads_and_last_leave_releases():
+    """أول طلب فقط هو القائد، والملف يُحرر عند مغادرة آخر مشارك فقط"""
+    async def scenario():
+        flights = SingleFlight()
+        leader, is_leader = flights.join(KEY)
+        followers = [flights.join(KEY) for _ in range(2)]
+
+        assert is_leader
+        assert [lead for _, lead in followers] == [False, False]
+        assert all(flight is leader for flight, _ in followers)
+        assert leader.participants == 3
+        assert len(flights) == 1
+
+        assert flights.leave(leader) is False
+        assert flights.leave(leader) is False
+        assert len(flights) == 1
+        assert flights.leave(leader) is True
+        assert len(flights) == 0
+
+        # بعد انتهاء التنزيل يبدأ طلب جديد تنزيلاً جديداً
+        fresh, is_leader = flights.join(KEY)
+        assert is_leader and fresh is not leader
+
+    asyncio.run(scenario())
+
+
+def test_followers_share_result_and_file_id():
+    """التابعون ينتظرون نفس النتيجة ويستلمون file_id الذي ينشره القائد"""
+    async def scenario():
+        flights = SingleFlight()
+        leader, _ = flights.join(KEY)
+        follower, _ = flights.join(KEY)
+        leader.future = asyncio.get_running_loop().create_future()
+
+        waiters = [asyncio.ensure_future(f.wait_result()) for f in (leader, follower)]
+        await asyncio.sleep(0)
+        # إلغاء أحد المنتظرين لا يلغي التنزيل المشترك
+        waiters[0].cancel()
+        leader.future.set_result(('/tmp/a.mp4', 'TikTok', 'فيديو'))
+        assert await waiters[1] == ('/tmp/a.mp4', 'TikTok', 'فيديو')
+
+        pending = asyncio.ensure_future(follower.wait_file_id(timeout=1))
+        leader.publish_file_id('FILE-1')
+        leader.publish_file_id('FILE-2')
+        assert await pending == 'FILE-1'
+
+    asyncio.run(scenario())
+
+
+def test_last_leave_publishes_none_and_follower_times_out():
+    """التابع يتوقف بعد المهلة إذا لم يُنشر file_id، ومغادرة آخر مشارك تنشر None"""
+    async def scenario():
+        flights = SingleFlight()
+        leader, _ = flights.join(KEY)
+        follower, _ = flights.join(KEY)
+
+        assert await follower.wait_file_id(timeout=0.05) is None
+        assert not leader.file_id.done()
+
+        pending = asyncio.ensure_future(follower.wait_file_id(timeout=1))
+        flights.leave(leader)
+        await asyncio.sleep(0)
+        assert not pending.done()
+        flights.leave(follower)
+        assert await pending is None
+
+    asyncio.run(scenario())
+
+
+def test_leader_failing_before_upload_releases_followers():
+    """فشل القائد قبل الرفع (مثل خطأ في رسالة الانتظار) لا يترك المنضمين حتى المهلة"""
+    async def scenario():
+        flights = SingleFlight()
+        leader, is_leader = flights.join(KEY)
+        follower, _ = flights.join(KEY)
+
+        async def leader_request():
+            try:
+                raise RuntimeError('RetryAfter')
+            finally:
+                flights.leave(leader, is_leader)
+
+        pending = asyncio.ensure_future(follower.wait_file_id(timeout=5))
+        with pytest.raises(RuntimeError):
+            await leader_request()
+        assert await asyncio.wait_for(pending, 0.5) is None
+        assert flights.leave(follower) is True
+
+    asyncio.run(scenario())
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار ذاكرة file_id لملفات تليجرام
+Telegram File Cache Test
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database_models import Database
+
+MEDIA = ('tiktok', '7301234567890123456')
+
+
+def test_file_id_is_stored_and_reused():
+    """file_id المحفوظ يُعاد لنفس الوسائط ونوعها فقط، ويُحسب كل استخدام"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'test.db'))
+        assert db.get_cached_file_id(*MEDIA, 'video') is None
+
+        db.save_cached_file_id(*MEDIA, 'video', 'FILE-1', file_unique_id='U-1')
+        assert db.get_cached_file_id(*MEDIA, 'video') == 'FILE-1'
+        assert db.get_cached_file_id(*MEDIA, 'video') == 'FILE-1'
+        assert db.get_cached_file_id(*MEDIA, 'audio') is None
+        assert db.get_cached_file_id(*MEDIA, 'video', quality='720p') is None
+
+        # إعادة الرفع تستبدل file_id القديم
+        db.save_cached_file_id(*MEDIA, 'video', 'FILE-2')
+        assert db.get_cached_file_id(*MEDIA, 'video') == 'FILE-2'
+
+        # الذاكرة دائمة عبر إعادة التشغيل
+        restarted = Database(os.path.join(tmp, 'test.db'))
+        assert restarted.get_cached_file_id(*MEDIA, 'video') == 'FILE-2'
+
+        # عداد الاستخدام يبدأ من جديد مع file_id الجديد
+        conn = db.get_connection()
+        hits = conn.execute('SELECT hits FROM telegram_file_cache').fetchone()['hits']
+        conn.close()
+        assert hits == 2
+
+
+def test_rejected_file_id_is_evicted():
+    """بعد رفض تليجرام للـ file_id يُحذف ولا يؤثر على الأنواع الأخرى"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'test.db'))
+        db.save_cached_file_id(*MEDIA, 'video', 'STALE')
+        db.save_cached_file_id(*MEDIA, 'audio', 'AUDIO')
+
+        db.delete_cached_file_id(*MEDIA, 'video')
+        assert db.get_cached_file_id(*MEDIA, 'video') is None
+        assert db.get_cached_file_id(*MEDIA, 'audio') == 'AUDIO'
+
+        # حذف مدخل غير موجود لا يفشل
+        db.delete_cached_file_id(*MEDIA, 'video')
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار مشاركة صفحة تيك توك بين طرق الاستخراج
+TikTok Page Cache Test
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from tiktok_page import tiktok_pages, TikTokPageCache
+from tiktok_photo_api import TikTokPhotoDownloader
+from tiktok_image_handler import TikTokImageHandler
+
+URL = 'https://www.tiktok.com/@someone/photo/7301234567890123457'
+HTML = '<html><script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">%s</script></html>' % (
+    json.dumps({'imagePost': {'images': [{'imageURL': {'urlList': ['https://cdn.example/1.jpg']}}]}})
+)
+
+
+def test_page_fetched_once_for_all_methods(monkeypatch):
+    """الطريقتان 1 و 2 ومعالج الصور البديل يستخدمون تنزيلاً واحداً للصفحة"""
+    fetched = []
+    monkeypatch.setattr(tiktok_pages, '_fetch', lambda url: fetched.append(url) or HTML)
+    tiktok_pages.clear()
+
+    TikTokPhotoDownloader.method_1_direct_html_parsing(URL)
+    TikTokPhotoDownloader.method_2_json_extraction(URL + '?lang=en')
+    data = TikTokImageHandler.get_tiktok_data(URL)
+
+    assert fetched == [URL]
+    assert data is tiktok_pages.get(URL).rehydration
+    tiktok_pages.clear()
+
+
+def test_page_expires_after_ttl(monkeypatch):
+    """الصفحة تُنزل من جديد بعد انتهاء المدة"""
+    cache = TikTokPageCache(ttl=0)
+    fetched = []
+    monkeypatch.setattr(cache, '_fetch', lambda url: fetched.append(url) or HTML)
+
+    cache.get(URL)
+    cache.get(URL)
+    assert len(fetched) == 2
+
+
+def test_failed_fetch_releases_post_lock(monkeypatch):
+    """فشل تنزيل الصفحة لا يترك قفل المنشور، والمحاولة التالية تنزلها من جديد"""
+    cache = TikTokPageCache()
+
+    def blocked(url):
+        raise requests.ConnectionError('blocked')
+
+    monkeypatch.setattr(cache, '_fetch', blocked)
+    with pytest.raises(requests.ConnectionError):
+        cache.get(URL)
+    assert cache._fetch_locks == {}
+
+    monkeypatch.setattr(cache, '_fetch', lambda url: HTML)
+    assert cache.get(URL).html == HTML
+
+
+def test_slides_in_order_with_generic_fallback():
+    """المسار المباشر يحفظ ترتيب الشرائح، والبحث العام يُستخدم عند غيابه"""
+    urls = [f'https://cdn.example/{i}.jpg' for i in (3, 1, 2)]
+    data = {'__DEFAULT_SCOPE__': {'webapp.video-detail': {'itemInfo': {'itemStruct': {
+        'author': {'avatarLarger': 'https://cdn.example/avatar.jpg'},
+        'imagePost': {'images': [{'imageURL': {'urlList': [url, url + '?alt']}} for url in urls]},
+    }}}}}
+    assert TikTokPhotoDownloader._extract_images_from_json(data) == urls
+
+    legacy = {'items': [{'imageUrl': url} for url in urls + urls]}
+    assert TikTokPhotoDownloader._extract_images_from_json(legacy) == urls
+
+
+def test_waiters_keep_post_lock_after_failed_fetch(monkeypatch):
+    """بعد فشل أول تنزيل يبقى القفل لمن ينتظر، فلا يبدأ طلب جديد تنزيلاً موازياً"""
+    cache = TikTokPageCache()
+    fetched = []
+    active = []
+    overlap = []
+
+    def fetch(url):
+        active.append(1)
+        overlap.append(len(active))
+        try:
+            time.sleep(0.1)
+            fetched.append(url)
+            if len(fetched) == 1:
+                raise requests.ConnectionError('blocked')
+            return HTML
+        finally:
+            active.pop()
+
+    monkeypatch.setattr(cache, '_fetch', fetch)
+    results = []
+
+    def request():
+        try:
+            results.append(cache.get(URL).post_id)
+        except requests.ConnectionError:
+            results.append(None)
+
+    first = threading.Thread(target=request)
+    waiter = threading.Thread(target=request)
+    late = threading.Thread(target=request)
+    first.start()
+    time.sleep(0.03)
+    waiter.start()
+    # يصل بعد فشل الأول وأثناء تنزيل المنتظر
+    time.sleep(0.12)
+    late.start()
+    for thread in (first, waiter, late):
+        thread.join()
+
+    assert max(overlap) == 1
+    assert len(fetched) == 2
+    assert results.count(None) == 1 and results.count('7301234567890123457') == 2
+    assert cache._fetch_locks == {}
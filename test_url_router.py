@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار موجّه الروابط
+URL Router Test
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from url_router import URLRouter
+
+
+def test_youtube_links_share_one_key():
+    """روابط youtu.be و youtube.com و shorts لنفس الفيديو لها نفس المفتاح"""
+    urls = [
+        'https://youtu.be/dQw4w9WgXcQ?si=abc',
+        'https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10s',
+        'https://m.youtube.com/watch?feature=share&v=dQw4w9WgXcQ',
+        'https://youtube.com/shorts/dQw4w9WgXcQ',
+        'https://www.youtube.com/embed/dQw4w9WgXcQ',
+    ]
+    keys = {URLRouter.get_media_key(url) for url in urls}
+    assert keys == {('youtube', 'dQw4w9WgXcQ')}
+
+    assert URLRouter.parse(urls[3]).kind == 'short'
+    assert URLRouter.parse(urls[0]).url == 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+
+def test_kinds():
+    """تحديد نوع المحتوى من الرابط"""
+    cases = {
+        'https://www.youtube.com/playlist?list=PL1234567890': ('youtube', 'playlist'),
+        'https://www.tiktok.com/@user/video/7301234567890123456': ('tiktok', 'video'),
+        'https://www.tiktok.com/@user/photo/7301234567890123456?lang=ar': ('tiktok', 'photo'),
+        'https://vm.tiktok.com/ZMabcdEF/': ('tiktok', 'short_link'),
+        'https://www.instagram.com/p/C1a2b3c4d5e/': ('instagram', 'post'),
+        'https://www.instagram.com/reels/C1a2b3c4d5e/': ('instagram', 'reel'),
+        'https://www.instagram.com/stories/user/3245678901234567890/': ('instagram', 'story'),
+    }
+    for url, (platform, kind) in cases.items():
+        descriptor = URLRouter.parse(url)
+        assert (descriptor.platform, descriptor.kind) == (platform, kind), url
+
+    assert URLRouter.parse('https://vm.tiktok.com/ZMabcdEF/').key is None
+
+
+def test_unsupported_and_lookalike_hosts():
+    """رفض الروابط من منصات غير مدعومة أو نطاقات مشابهة"""
+    assert URLRouter.parse('https://example.com/watch?v=dQw4w9WgXcQ') is None
+    assert URLRouter.parse('https://notyoutube.com/watch?v=dQw4w9WgXcQ') is None
+    assert URLRouter.parse('https://youtube.com.evil.net/watch?v=dQw4w9WgXcQ') is None
+    assert URLRouter.get_platform('https://www.youtube.com/@channel') == 'youtube'
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+اختبار اختيار مسار معالجة الفيديو
+Video Compat Test
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from video_compat import VideoCompat
+
+
+def test_plan_prefers_cheapest_path():
+    """تخطي المعالجة، ثم نسخ المسارات، ثم إعادة ترميز المسار غير المتوافق فقط"""
+    assert VideoCompat.plan('.mp4', 'h264', 'aac') == ('skip', [])
+    assert VideoCompat.plan('.mp4', 'h264', None) == ('skip', [])
+    assert VideoCompat.plan('.mkv', 'h264', 'aac') == ('remux', ['-c', 'copy'])
+
+    path, args = VideoCompat.plan('.webm', 'h264', 'opus')
+    assert path == 'transcode'
+    assert args[:2] == ['-c:v', 'copy'] and 'aac' in args
+
+    path, args = VideoCompat.plan('.webm', 'vp9', 'opus')
+    assert path == 'transcode'
+    assert 'libx264' in args and 'aac' in args
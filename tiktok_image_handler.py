@@ -8,11 +8,14 @@ TikTok Image Handler - Alternative method for downloading TikTok photos
 
 import os
 import logging
-import requests
-import json
 import re
-from typing import Optional, Tuple
-from config import DOWNLOAD_FOLDER, SOCKET_TIMEOUT
+from typing import Optional, Tuple, Union
+from url_router import URLRouter
+from job_workspace import job_folder
+from chunked_downloader import ChunkedDownloader
+from image_format import ImageFormat, NotAnImageError
+from tiktok_page import tiktok_pages, extract_slide_urls, extract_music_url, download_slideshow
+from media_album import MediaAlbum
 
 logger = logging.getLogger(__name__)
 
@@ -27,23 +30,9 @@ class TikTokImageHandler:
     def extract_video_id(url: str) -> Optional[str]:
         """استخراج معرف الفيديو/الصورة من رابط تيك توك"""
         try:
-            # محاولة استخراج ID من أشكال مختلفة من الروابط
-            patterns = [
-                r'video/(\d+)',  # /video/123456789
-                r'/(\d+)\?',     # /123456789?
-                r'v/(\d+)',      # /v/123456789
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, url)
-                if match:
-                    return match.group(1)
-            
-            # محاولة أخرى: البحث عن أي رقم طويل
-            numbers = re.findall(r'\d{15,}', url)
-            if numbers:
-                return numbers[0]
-                
+            descriptor = URLRouter.parse(url)
+            if descriptor and descriptor.platform == 'tiktok':
+                return descriptor.media_id
         except Exception as e:
             logger.error(f"خطأ في استخراج معرف تيك توك: {str(e)}")
         
@@ -53,33 +42,17 @@ class TikTokImageHandler:
     def get_tiktok_data(url: str) -> Optional[dict]:
         """الحصول على بيانات الصورة/الفيديو من تيك توك"""
         try:
-            headers = {
-                'User-Agent': TikTokImageHandler.USER_AGENT,
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Referer': 'https://www.tiktok.com/',
-            }
+            # الصفحة المشتركة مع TikTokPhotoDownloader (لا تُنزل مرة أخرى)
+            page = tiktok_pages.get(url)
             
-            # محاولة الحصول على بيانات الصفحة
-            response = requests.get(url, headers=headers, timeout=SOCKET_TIMEOUT)
-            response.raise_for_status()
-            
-            # البحث عن بيانات JSON في الصفحة
             # تيك توك تضع بيانات الصفحة في <script id="__UNIVERSAL_DATA_FOR_REHYDRATION__">
-            pattern = r'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">(.*?)</script>'
-            match = re.search(pattern, response.text, re.DOTALL)
-            
-            if match:
-                try:
-                    data = json.loads(match.group(1))
-                    logger.info("تم استخراج بيانات تيك توك بنجاح")
-                    return data
-                except json.JSONDecodeError:
-                    logger.warning("فشل تحليل بيانات JSON من تيك توك")
+            if page.rehydration:
+                logger.info("تم استخراج بيانات تيك توك بنجاح")
+                return page.rehydration
             
             # محاولة بديلة: البحث عن روابط الصور في HTML
             img_pattern = r'<img[^>]+src="([^"]*photo[^"]*)"'
-            img_matches = re.findall(img_pattern, response.text)
+            img_matches = re.findall(img_pattern, page.html)
             
             if img_matches:
                 logger.info(f"تم العثور على {len(img_matches)} صورة(صور)")
@@ -99,22 +72,22 @@ class TikTokImageHandler:
                 'Referer': 'https://www.tiktok.com/',
             }
             
-            response = requests.get(image_url, headers=headers, timeout=SOCKET_TIMEOUT)
-            response.raise_for_status()
-            
-            # حفظ الصورة
-            with open(filename, 'wb') as f:
-                f.write(response.content)
+            # كتابة تدفقية مع فحص بصمة الصورة (صفحة خطأ HTML تُرفض بعد أول البايتات)
+            ChunkedDownloader.download(image_url, filename, headers=headers, sniff=ImageFormat.check)
+            ImageFormat.normalize(filename)
             
             logger.info(f"تم تنزيل الصورة بنجاح: {filename}")
             return True
             
+        except NotAnImageError as e:
+            logger.warning(f"الملف ليس صورة: {str(e)}")
+            return False
         except Exception as e:
             logger.error(f"خطأ في تنزيل الصورة: {str(e)}")
             return False
     
     @staticmethod
-    def download_tiktok_image(url: str) -> str:
+    def download_tiktok_image(url: str) -> Union[str, MediaAlbum]:
         """
         تنزيل صورة من تيك توك باستخدام طريقة بديلة
         
@@ -122,7 +95,7 @@ class TikTokImageHandler:
             url: رابط الصورة من تيك توك
             
         Returns:
-            str: اسم الملف المحفوظ
+            str: اسم الملف المحفوظ (أو MediaAlbum لجميع شرائح منشور الصور)
             
         Raises:
             Exception: إذا فشل التنزيل
@@ -142,10 +115,17 @@ class TikTokImageHandler:
             if not data:
                 raise Exception("فشل الحصول على بيانات الصورة من تيك توك")
             
-            # محاولة استخراج رابط الصورة
+            # منشور صور: جميع الشرائح بالترتيب مع الموسيقى
+            slides = extract_slide_urls(data)
+            if slides:
+                return download_slideshow(video_id, slides, extract_music_url(data), {
+                    'User-Agent': TikTokImageHandler.USER_AGENT,
+                    'Referer': 'https://www.tiktok.com/',
+                })
+            
             image_url = None
             
-            # البحث في البيانات المستخرجة
+            # البحث العميق في البيانات إذا لم يوجد المسار المعروف
             if isinstance(data, dict):
                 # البحث العميق في البيانات
                 def find_image_url(obj, depth=0):
@@ -186,7 +166,7 @@ class TikTokImageHandler:
             logger.info(f"رابط الصورة: {image_url}")
             
             # تنزيل الصورة
-            filename = os.path.join(DOWNLOAD_FOLDER, f'tiktok_image_{video_id}.jpg')
+            filename = os.path.join(job_folder(), f'tiktok_image_{video_id}.jpg')
             
             if TikTokImageHandler.download_image_from_url(image_url, filename):
                 logger.info(f"تم تنزيل صورة تيك توك بنجاح: {filename}")
@@ -208,7 +188,7 @@ class TikTokPhotoHandler:
         return '/photo/' in url or '/photos/' in url
     
     @staticmethod
-    def download(url: str) -> str:
+    def download(url: str) -> Union[str, MediaAlbum]:
         """تنزيل صورة من تيك توك"""
         if not TikTokPhotoHandler.is_tiktok_photo_url(url):
             raise ValueError("الرابط لا يشير إلى صورة من تيك توك")
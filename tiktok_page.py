@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+صفحة منشور تيك توك تُنزل مرة واحدة وتُشارك بين طرق الاستخراج
+Shared TikTok page fetch with a short-TTL cache keyed by post id
+"""
+
+import re
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import SOCKET_TIMEOUT, TIKTOK_PAGE_TTL, TIKTOK_PAGE_CACHE_SIZE, TIKTOK_SLIDESHOW_AUDIO
+from url_router import URLRouter
+from http_client import http_client
+from chunked_downloader import ChunkedDownloader
+from image_format import ImageFormat
+from media_album import MediaAlbum
+
+logger = logging.getLogger(__name__)
+
+# بيانات الصفحة المدمجة التي تضعها تيك توك في HTML
+REHYDRATION_PATTERN = re.compile(
+    r'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">(.*?)</script>',
+    re.DOTALL
+)
+
+# مسارات itemStruct المعروفة داخل بيانات الصفحة (الأحدث أولاً)
+ITEM_STRUCT_PATHS = (
+    ('__DEFAULT_SCOPE__', 'webapp.video-detail', 'itemInfo', 'itemStruct'),
+    ('itemInfo', 'itemStruct'),
+)
+
+
+def _follow(data: Any, path: Tuple[str, ...]) -> Any:
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def extract_slide_urls(data: Any) -> Optional[List[str]]:
+    """
+    روابط شرائح منشور الصور بالترتيب من مسار itemStruct → imagePost → images
+
+    تقرأ الحقول المعروفة مباشرة بدون المرور على بقية البيانات.
+
+    Returns:
+        list: رابط لكل شريحة (أول رابط في urlList)، أو None إذا لم يوجد المسار
+    """
+    for path in ITEM_STRUCT_PATHS:
+        item = _follow(data, path)
+        images = _follow(item, ('imagePost', 'images'))
+        if not isinstance(images, list):
+            continue
+        slides = []
+        for image in images:
+            url_list = _follow(image, ('imageURL', 'urlList'))
+            if isinstance(url_list, list) and url_list and isinstance(url_list[0], str):
+                slides.append(url_list[0])
+        if slides:
+            return slides
+    return None
+
+
+def extract_music_url(data: Any) -> Optional[str]:
+    """رابط موسيقى المنشور (itemStruct → music → playUrl) أو None"""
+    for path in ITEM_STRUCT_PATHS:
+        play_url = _follow(data, path + ('music', 'playUrl'))
+        if isinstance(play_url, str) and play_url.startswith('http'):
+            return play_url
+    return None
+
+
+def download_slideshow(post_id: str, slide_urls: List[str], music_url: Optional[str] = None,
+                       headers: Optional[Dict[str, str]] = None) -> MediaAlbum:
+    """
+    تنزيل جميع شرائح منشور الصور بالتوازي (بالترتيب الأصلي) مع الموسيقى
+
+    Returns:
+        MediaAlbum: الشرائح (تُرسل كمجموعة وسائط) والموسيقى إن وُجدت
+
+    Raises:
+        Exception: إذا فشل تنزيل جميع الشرائح
+    """
+    sources = [(slide_url, 'photo') for slide_url in slide_urls]
+    if music_url and TIKTOK_SLIDESHOW_AUDIO:
+        sources.append((music_url, 'audio'))
+
+    def fetch(item_url: str, save_path: str, item_type: str) -> None:
+        if item_type != 'photo':
+            ChunkedDownloader.download(item_url, save_path, headers=headers)
+            return
+        # الشرائح يجب أن تكون صوراً فعلاً (لا صفحة خطأ HTML)
+        ChunkedDownloader.download(item_url, save_path, headers=headers, sniff=ImageFormat.check)
+        ImageFormat.normalize(save_path)
+
+    logger.info(f"جاري تنزيل {len(slide_urls)} شريحة من منشور تيك توك {post_id}")
+    return MediaAlbum.download(f'tiktok_{post_id}', sources, fetch)
+
+
+class TikTokPage:
+    """HTML صفحة منشور مع تحليل كسول لبيانات JSON (يتم مرة واحدة)"""
+
+    def __init__(self, post_id: str, url: str, html: str):
+        self.post_id = post_id
+        self.url = url
+        self.html = html
+
+    @cached_property
+    def rehydration(self) -> Optional[Dict[str, Any]]:
+        """محتوى __UNIVERSAL_DATA_FOR_REHYDRATION__ أو None"""
+        match = REHYDRATION_PATTERN.search(self.html)
+        if not match:
+            return None
+        try:
+            return json.loads(match.group(1))
+        except json.JSONDecodeError:
+            logger.warning("فشل تحليل بيانات JSON من صفحة تيك توك")
+            return None
+
+    @cached_property
+    def slides(self) -> Optional[List[str]]:
+        """روابط الشرائح بالترتيب من المسار المعروف أو None"""
+        return extract_slide_urls(self.rehydration)
+
+    @cached_property
+    def music_url(self) -> Optional[str]:
+        """رابط موسيقى المنشور أو None"""
+        return extract_music_url(self.rehydration)
+
+
+class TikTokPageCache:
+    """
+    صفحات تيك توك الأخيرة حسب معرف المنشور
+
+    كل طرق استخراج الصور (TikTokPhotoDownloader و TikTokImageHandler) تقرأ
+    الصفحة من هنا، فطلب صورة واحد ينزل الصفحة مرة واحدة بدلاً من ثلاث.
+    مدة الصلاحية قصيرة لأن روابط CDN داخل الصفحة تنتهي صلاحيتها. الطلبات
+    المتزامنة لنفس المنشور تنتظر تنزيلاً واحداً، والفشل لا يُحفظ.
+    """
+
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Referer': 'https://www.tiktok.com/',
+    }
+
+    def __init__(self, ttl: float = TIKTOK_PAGE_TTL, max_entries: int = TIKTOK_PAGE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._pages: 'OrderedDict[str, Tuple[TikTokPage, float]]' = OrderedDict()
+        # قفل التنزيل لكل منشور مع عدد الطلبات التي تستخدمه
+        self._fetch_locks: Dict[str, Tuple[threading.Lock, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _post_id(url: str) -> str:
+        descriptor = URLRouter.parse(url)
+        if not descriptor or descriptor.platform != 'tiktok' or not descriptor.media_id:
+            raise ValueError(f"رابط تيك توك بدون معرف منشور: {url}")
+        return descriptor.media_id
+
+    def _get_cached(self, post_id: str) -> Optional[TikTokPage]:
+        with self._lock:
+            entry = self._pages.get(post_id)
+            if entry is None:
+                return None
+            page, expires_at = entry
+            if expires_at <= time.time():
+                del self._pages[post_id]
+                return None
+            return page
+
+    def _remember(self, page: TikTokPage) -> None:
+        with self._lock:
+            self._pages[page.post_id] = (page, time.time() + self.ttl)
+            self._pages.move_to_end(page.post_id)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+
+    def _fetch(self, url: str) -> str:
+        response = http_client.get(url, headers=self.HEADERS, timeout=SOCKET_TIMEOUT)
+        response.raise_for_status()
+        return response.text
+
+    def get(self, url: str) -> TikTokPage:
+        """
+        صفحة المنشور من الذاكرة أو بتنزيلها (دالة حاجبة)
+
+        Raises:
+            ValueError: إذا لم يحتوِ الرابط على معرف منشور
+            requests.RequestException: إذا فشل تنزيل الصفحة
+        """
+        post_id = self._post_id(url)
+        page = self._get_cached(post_id)
+        if page is not None:
+            return page
+
+        with self._lock:
+            fetch_lock, users = self._fetch_locks.get(post_id, (None, 0))
+            fetch_lock = fetch_lock or threading.Lock()
+            self._fetch_locks[post_id] = (fetch_lock, users + 1)
+        try:
+            with fetch_lock:
+                # طلب متزامن ربما نزل الصفحة أثناء الانتظار
+                page = self._get_cached(post_id)
+                if page is None:
+                    started = time.perf_counter()
+                    page = TikTokPage(post_id, url, self._fetch(url))
+                    self._remember(page)
+                    logger.info(
+                        f"📄 صفحة تيك توك {post_id}: {len(page.html)} حرف في "
+                        f"{time.perf_counter() - started:.2f}s"
+                    )
+        finally:
+            # القفل يُحذف عند خروج آخر طلب (حتى عند الفشل) فلا تتراكم أقفال
+            # المنشورات، ولا يُنشأ قفل ثانٍ بينما ينتظر طلب على الأول
+            with self._lock:
+                fetch_lock, users = self._fetch_locks[post_id]
+                if users == 1:
+                    del self._fetch_locks[post_id]
+                else:
+                    self._fetch_locks[post_id] = (fetch_lock, users - 1)
+        return page
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+
+
+# النسخة المشتركة
+tiktok_pages = TikTokPageCache()
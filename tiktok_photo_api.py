@@ -8,11 +8,19 @@ Advanced TikTok Photo Downloader using multiple methods
 
 import os
 import logging
-import requests
 import re
 import json
-from typing import Optional, List
-from config import DOWNLOAD_FOLDER, SOCKET_TIMEOUT
+from typing import Optional, List, Union
+from config import SOCKET_TIMEOUT
+from url_router import URLRouter
+from job_workspace import job_folder
+from http_client import http_client
+from tiktok_page import tiktok_pages, extract_slide_urls, download_slideshow
+from media_album import MediaAlbum
+from chunked_downloader import ChunkedDownloader
+from image_format import ImageFormat
+from backend_stats import backend_stats
+from hedged_race import DownloadCancelled
 
 logger = logging.getLogger(__name__)
 
@@ -38,23 +46,9 @@ class TikTokPhotoDownloader:
     def extract_post_id(url: str) -> Optional[str]:
         """استخراج معرف المنشور من رابط تيك توك"""
         try:
-            # البحث عن معرف المنشور في الرابط
-            # يمكن أن يكون في أشكال مختلفة
-            patterns = [
-                r'/photo/(\d+)',           # /photo/123456789
-                r'/video/(\d+)',           # /video/123456789
-                r'tiktok\.com/.*?(\d{15,})',  # أي رقم طويل
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, url)
-                if match:
-                    return match.group(1)
-            
-            # محاولة أخرى: البحث عن أي رقم طويل (15+ أرقام)
-            numbers = re.findall(r'\d{15,}', url)
-            if numbers:
-                return numbers[0]
+            descriptor = URLRouter.parse(url)
+            if descriptor and descriptor.platform == 'tiktok':
+                return descriptor.media_id
         except Exception as e:
             logger.error(f"خطأ في استخراج معرف تيك توك: {str(e)}")
         
@@ -66,16 +60,8 @@ class TikTokPhotoDownloader:
         try:
             logger.info("محاولة الطريقة 1: تحليل HTML مباشر")
             
-            headers = {
-                'User-Agent': TikTokPhotoDownloader.get_random_user_agent(),
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'ar-SA,ar;q=0.9,en;q=0.8',
-                'Referer': 'https://www.tiktok.com/',
-                'DNT': '1',
-            }
-            
-            response = requests.get(url, headers=headers, timeout=SOCKET_TIMEOUT)
-            response.raise_for_status()
+            # الصفحة المشتركة بين جميع الطرق (تُنزل مرة واحدة)
+            page = tiktok_pages.get(url)
             
             # البحث عن روابط الصور في HTML
             # تيك توك تستخدم عدة أنماط مختلفة
@@ -91,7 +77,7 @@ class TikTokPhotoDownloader:
             
             images = []
             for pattern in patterns:
-                matches = re.findall(pattern, response.text)
+                matches = re.findall(pattern, page.html)
                 if matches:
                     images.extend(matches)
             
@@ -112,24 +98,23 @@ class TikTokPhotoDownloader:
         try:
             logger.info("محاولة الطريقة 2: استخراج JSON")
             
-            headers = {
-                'User-Agent': TikTokPhotoDownloader.get_random_user_agent(),
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Referer': 'https://www.tiktok.com/',
-            }
+            page = tiktok_pages.get(url)
             
-            response = requests.get(url, headers=headers, timeout=SOCKET_TIMEOUT)
-            response.raise_for_status()
+            # بيانات JSON المدمجة في الصفحة (محللة مرة واحدة ومشتركة)
+            if page.rehydration:
+                images = page.slides or TikTokPhotoDownloader._extract_images_from_json(page.rehydration)
+                if images:
+                    logger.info(f"تم العثور على {len(images)} صورة(صور) بالطريقة 2")
+                    return images
             
-            # البحث عن بيانات JSON المدمجة في الصفحة
+            # أجزاء JSON أخرى داخل الصفحة
             json_patterns = [
-                r'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">({.*?})</script>',
                 r'"__DEFAULT_SCOPE__":\s*({.*?})',
                 r'"itemInfo":\s*({.*?})',
             ]
             
             for pattern in json_patterns:
-                match = re.search(pattern, response.text, re.DOTALL)
+                match = re.search(pattern, page.html, re.DOTALL)
                 if match:
                     try:
                         data = json.loads(match.group(1))
@@ -145,44 +130,59 @@ class TikTokPhotoDownloader:
         
         return None
     
+    # حقول معروفة تحتوي على روابط صور (للبحث العام)
+    IMAGE_FIELDS = (
+        'imageUrl', 'image_url', 'coverUrl', 'cover_url',
+        'dynamicCover', 'dynamicCoverUrl', 'dynamic_cover_url',
+        'photo', 'photoUrl', 'photo_url', 'photoList',
+        'imageList', 'images', 'pics', 'pictures',
+        'url', 'downloadUrl', 'download_url'
+    )
+    
     @staticmethod
-    def _extract_images_from_json(obj, depth=0, max_depth=15) -> List[str]:
-        """البحث العميق عن روابط الصور في بيانات JSON"""
-        images = []
+    def _extract_images_from_json(obj, max_depth=15) -> List[str]:
+        """
+        البحث العميق عن روابط الصور في بيانات JSON
+        
+        المسار المعروف itemStruct → imagePost → images يُقرأ مباشرة أولاً؛ البحث
+        في كامل البيانات يُستخدم فقط إذا لم يوجد. الترتيب محفوظ بعد إزالة التكرارات.
+        """
+        slides = extract_slide_urls(obj)
+        if slides:
+            return slides
         
+        found = {}
+        TikTokPhotoDownloader._walk_images(obj, 0, max_depth, found)
+        return list(found)
+    
+    @staticmethod
+    def _walk_images(obj, depth: int, max_depth: int, found: dict) -> None:
+        """جمع الروابط في found (قاموس مرتب بدون تكرار) بدون قوائم وسيطة"""
         if depth > max_depth:
-            return images
+            return
         
         if isinstance(obj, dict):
-            # البحث عن حقول معروفة تحتوي على روابط صور
-            image_fields = [
-                'imageUrl', 'image_url', 'coverUrl', 'cover_url',
-                'dynamicCover', 'dynamicCoverUrl', 'dynamic_cover_url',
-                'photo', 'photoUrl', 'photo_url', 'photoList',
-                'imageList', 'images', 'pics', 'pictures',
-                'url', 'downloadUrl', 'download_url'
-            ]
-            
-            for field in image_fields:
-                if field in obj:
-                    value = obj[field]
-                    if isinstance(value, str) and ('http' in value or 'cdn' in value):
-                        images.append(value)
-                    elif isinstance(value, list):
-                        for item in value:
-                            if isinstance(item, str) and ('http' in item or 'cdn' in item):
-                                images.append(item)
-            
-            # البحث في جميع القيم
-            for value in obj.values():
-                images.extend(TikTokPhotoDownloader._extract_images_from_json(value, depth + 1, max_depth))
-        
+            for field in TikTokPhotoDownloader.IMAGE_FIELDS:
+                if field not in obj:
+                    continue
+                value = obj[field]
+                if isinstance(value, str):
+                    if 'http' in value or 'cdn' in value:
+                        found[value] = None
+                elif isinstance(value, list):
+                    for item in value:
+                        if isinstance(item, str) and ('http' in item or 'cdn' in item):
+                            found[item] = None
+            children = obj.values()
         elif isinstance(obj, list):
-            for item in obj:
-                images.extend(TikTokPhotoDownloader._extract_images_from_json(item, depth + 1, max_depth))
+            children = obj
+        else:
+            return
         
-        # إزالة التكرارات
-        return list(set(images))
+        # البحث في القيم المركبة فقط
+        for value in children:
+            if isinstance(value, (dict, list)):
+                TikTokPhotoDownloader._walk_images(value, depth + 1, max_depth, found)
     
     @staticmethod
     def method_3_api_endpoint(post_id: str) -> Optional[List[str]]:
@@ -205,7 +205,7 @@ class TikTokPhotoDownloader:
             
             for endpoint in endpoints:
                 try:
-                    response = requests.get(endpoint, headers=headers, timeout=SOCKET_TIMEOUT)
+                    response = http_client.get(endpoint, headers=headers, timeout=SOCKET_TIMEOUT)
                     if response.status_code == 200:
                         data = response.json()
                         images = TikTokPhotoDownloader._extract_images_from_json(data)
@@ -230,36 +230,33 @@ class TikTokPhotoDownloader:
                 'Accept': 'image/*',
             }
             
-            response = requests.get(image_url, headers=headers, timeout=SOCKET_TIMEOUT)
-            response.raise_for_status()
-            
-            # التحقق من أن الملف صورة فعلاً
-            content_type = response.headers.get('content-type', '').lower()
-            if 'image' not in content_type:
-                logger.warning(f"الملف ليس صورة: {content_type}")
-                return False
-            
-            # حفظ الصورة
-            with open(filename, 'wb') as f:
-                f.write(response.content)
+            # التحقق من بصمة الصورة في أول البايتات قبل قراءة بقية المحتوى
+            ChunkedDownloader.download(image_url, filename, headers=headers, sniff=ImageFormat.check)
+            ImageFormat.normalize(filename)
             
             logger.info(f"تم تنزيل الصورة بنجاح: {filename}")
             return True
-            
+        
+        except ValueError as e:
+            logger.warning(f"الملف ليس صورة: {str(e)}")
+            return False
         except Exception as e:
             logger.error(f"خطأ في تنزيل الصورة: {str(e)}")
             return False
     
     @staticmethod
-    def download(url: str) -> str:
+    def download(url: str) -> Union[str, MediaAlbum]:
         """
         تنزيل صورة من تيك توك باستخدام طرق متعددة
         
+        منشور الصور (شرائح) يُنزل كاملاً كألبوم مع الموسيقى؛ الطرق الأخرى
+        تُستخدم فقط إذا لم تحتوِ بيانات الصفحة على الشرائح.
+        
         Args:
             url: رابط الصورة من تيك توك
             
         Returns:
-            str: اسم الملف المحفوظ
+            str: اسم الملف المحفوظ (أو MediaAlbum لجميع الشرائح)
             
         Raises:
             Exception: إذا فشلت جميع الطرق
@@ -274,21 +271,28 @@ class TikTokPhotoDownloader:
             
             logger.info(f"معرف المنشور: {post_id}")
             
-            # محاولة الطرق المختلفة
-            image_urls = None
-            
-            # الطريقة 1: تحليل HTML
-            image_urls = TikTokPhotoDownloader.method_1_direct_html_parsing(url)
-            
-            # الطريقة 2: استخراج JSON
-            if not image_urls:
-                image_urls = TikTokPhotoDownloader.method_2_json_extraction(url)
-            
-            # الطريقة 3: API endpoints
-            if not image_urls:
-                image_urls = TikTokPhotoDownloader.method_3_api_endpoint(post_id)
-            
-            if not image_urls:
+            # جميع الشرائح بالترتيب من بيانات الصفحة المشتركة
+            try:
+                page = tiktok_pages.get(url)
+            except Exception as e:
+                logger.warning(f"فشل تنزيل صفحة تيك توك: {str(e)}")
+                page = None
+            if page is not None and page.slides:
+                return download_slideshow(post_id, page.slides, page.music_url, {
+                    'User-Agent': TikTokPhotoDownloader.get_random_user_agent(),
+                    'Referer': 'https://www.tiktok.com/',
+                })
+            
+            # محاولة الطرق المختلفة بالترتيب الأنسب حسب نجاحها الأخير
+            try:
+                image_urls = backend_stats.run('tiktok', 'photo_urls', [
+                    ('html_parsing', lambda: TikTokPhotoDownloader.method_1_direct_html_parsing(url)),
+                    ('json_extraction', lambda: TikTokPhotoDownloader.method_2_json_extraction(url)),
+                    ('api_endpoint', lambda: TikTokPhotoDownloader.method_3_api_endpoint(post_id)),
+                ])
+            except DownloadCancelled:
+                raise
+            except Exception:
                 raise Exception("فشل استخراج روابط الصور من تيك توك")
             
             logger.info(f"تم العثور على {len(image_urls)} صورة(صور)")
@@ -298,7 +302,7 @@ class TikTokPhotoDownloader:
             logger.info(f"رابط الصورة: {image_url}")
             
             # تحديد اسم الملف
-            filename = os.path.join(DOWNLOAD_FOLDER, f'tiktok_photo_{post_id}.jpg')
+            filename = os.path.join(job_folder(), f'tiktok_photo_{post_id}.jpg')
             
             # تنزيل الصورة
             if TikTokPhotoDownloader.download_image_from_url(image_url, filename):
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+موجّه الروابط: تحليل الرابط مرة واحدة إلى واصف وسائط ثابت
+Compiled URL router with canonical media-ID extraction
+"""
+
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+from config import SUPPORTED_PLATFORMS
+
+
+class MediaDescriptor(NamedTuple):
+    """واصف الوسائط الناتج عن تحليل الرابط"""
+
+    platform: str            # youtube / tiktok / instagram
+    media_id: Optional[str]  # المعرف الثابت (None للروابط المختصرة أو غير المعروفة)
+    kind: str                # video / short / playlist / photo / post / reel / story / short_link / unknown
+    url: str                 # الرابط الموحد
+
+    @property
+    def key(self) -> Optional[Tuple[str, str]]:
+        """المفتاح الثابت (المنصة، المعرف) المستخدم في الذاكرات ودمج الطلبات"""
+        if self.media_id is None:
+            return None
+        return self.platform, self.media_id
+
+    @property
+    def is_short_link(self) -> bool:
+        """رابط مختصر يحتاج إلى توسيع قبل معرفة المعرف"""
+        return self.kind == 'short_link'
+
+
+# المضيف -> المنصة (يُفحص مرة واحدة، ثم تُطابق أنماط المسار من نهاية المضيف)
+_HOST_RE = re.compile(
+    r'(?:https?://)?(?P<sub>(?:[\w-]+\.)*?)'
+    r'(?P<domain>youtube(?:-nocookie)?\.com|youtu\.be|tiktok\.com|instagram\.com|ig\.me)'
+    r'(?::\d+)?(?=[/?#]|$)',
+    re.IGNORECASE
+)
+
+_DOMAIN_PLATFORMS = {
+    'youtube.com': 'youtube',
+    'youtube-nocookie.com': 'youtube',
+    'youtu.be': 'youtube',
+    'tiktok.com': 'tiktok',
+    'vm.tiktok.com': 'tiktok',
+    'instagram.com': 'instagram',
+    'ig.me': 'instagram',
+}
+
+# النطاقات الفرعية للروابط المختصرة لتيك توك
+_TIKTOK_SHORT_SUBDOMAINS = ('vm.', 'vt.')
+
+# (النوع، نمط المسار، قالب الرابط الموحد) لكل نطاق بترتيب الأولوية
+_ROUTES = {
+    'youtube.com': (
+        ('short', re.compile(r'/shorts/(?P<id>[\w-]{11})'),
+         'https://www.youtube.com/shorts/{id}'),
+        ('video', re.compile(r'/watch\?(?:[^#]*&)?v=(?P<id>[\w-]{11})'),
+         'https://www.youtube.com/watch?v={id}'),
+        ('video', re.compile(r'/(?:embed|live|v)/(?P<id>[\w-]{11})'),
+         'https://www.youtube.com/watch?v={id}'),
+        ('playlist', re.compile(r'/playlist\?(?:[^#]*&)?list=(?P<id>[\w-]+)'),
+         'https://www.youtube.com/playlist?list={id}'),
+    ),
+    'youtu.be': (
+        ('video', re.compile(r'/(?P<id>[\w-]{11})'),
+         'https://www.youtube.com/watch?v={id}'),
+    ),
+    'youtube-nocookie.com': (
+        ('video', re.compile(r'/embed/(?P<id>[\w-]{11})'),
+         'https://www.youtube.com/watch?v={id}'),
+    ),
+    'tiktok.com': (
+        ('video', re.compile(r'/@(?P<user>[^/?#]+)/video/(?P<id>\d+)'),
+         'https://www.tiktok.com/@{user}/video/{id}'),
+        ('photo', re.compile(r'/@(?P<user>[^/?#]+)/photo/(?P<id>\d+)'),
+         'https://www.tiktok.com/@{user}/photo/{id}'),
+        ('video', re.compile(r'/(?:v|embed(?:/v2)?)/(?P<id>\d+)'),
+         'https://www.tiktok.com/@/video/{id}'),
+        ('short_link', re.compile(r'/t/(?P<code>[\w-]+)'),
+         'https://www.tiktok.com/t/{code}/'),
+    ),
+    'vm.tiktok.com': (
+        ('short_link', re.compile(r'/(?P<code>[\w-]+)'),
+         'https://{host}/{code}/'),
+    ),
+    'instagram.com': (
+        ('post', re.compile(r'/(?:[\w.]+/)?p/(?P<id>[\w-]+)'),
+         'https://www.instagram.com/p/{id}/'),
+        ('reel', re.compile(r'/(?:[\w.]+/)?reels?/(?P<id>[\w-]+)'),
+         'https://www.instagram.com/reel/{id}/'),
+        ('video', re.compile(r'/tv/(?P<id>[\w-]+)'),
+         'https://www.instagram.com/tv/{id}/'),
+        ('story', re.compile(r'/stories/(?P<user>[^/?#]+)/(?P<id>\d+)'),
+         'https://www.instagram.com/stories/{user}/{id}/'),
+    ),
+    'ig.me': (),
+}
+
+# رقم تيك توك طويل في أي مكان (بديل أخير للروابط غير القياسية)
+_TIKTOK_LONG_ID_RE = re.compile(r'\d{15,}')
+
+
+class URLRouter:
+    """تحليل روابط المنصات المدعومة باستخدام أنماط مُجمّعة مسبقاً"""
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def parse(url: str) -> Optional[MediaDescriptor]:
+        """
+        تحليل الرابط إلى واصف وسائط
+
+        Args:
+            url: رابط المحتوى
+
+        Returns:
+            MediaDescriptor: الواصف، أو None إذا لم يكن الرابط من منصة مدعومة
+        """
+        url = url.strip()
+        host = _HOST_RE.match(url)
+        if not host:
+            return None
+
+        domain = host.group('domain').lower()
+        if domain == 'tiktok.com' and host.group('sub').lower() in _TIKTOK_SHORT_SUBDOMAINS:
+            domain = 'vm.tiktok.com'
+        platform = _DOMAIN_PLATFORMS[domain]
+
+        host_name = (host.group('sub') + host.group('domain')).lower()
+        path_start = host.end()
+        for kind, pattern, template in _ROUTES[domain]:
+            match = pattern.match(url, path_start)
+            if match:
+                groups = match.groupdict()
+                return MediaDescriptor(
+                    platform=platform,
+                    media_id=groups.get('id'),
+                    kind=kind,
+                    url=template.format(host=host_name, **groups),
+                )
+
+        # رابط من منصة مدعومة لكن بشكل غير معروف
+        media_id = None
+        if platform == 'tiktok':
+            long_id = _TIKTOK_LONG_ID_RE.search(url)
+            if long_id:
+                media_id = long_id.group(0)
+        return MediaDescriptor(platform=platform, media_id=media_id, kind='unknown', url=url)
+
+    @staticmethod
+    def get_platform(url: str) -> Optional[str]:
+        """الحصول على مفتاح المنصة (youtube/tiktok/instagram)"""
+        descriptor = URLRouter.parse(url)
+        return descriptor.platform if descriptor else None
+
+    @staticmethod
+    def get_platform_name(url: str, default: str = 'منصة مدعومة') -> str:
+        """الحصول على اسم المنصة المعروض للمستخدم"""
+        platform = URLRouter.get_platform(url)
+        if not platform:
+            return default
+        return SUPPORTED_PLATFORMS[platform]['name']
+
+    @staticmethod
+    def get_media_key(url: str) -> Optional[Tuple[str, str]]:
+        """المفتاح الثابت (المنصة، المعرف) أو None"""
+        descriptor = URLRouter.parse(url)
+        return descriptor.key if descriptor else None
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+تجهيز الفيديو لتليجرام بأقل معالجة ممكنة
+Remux-first video post-processing (skip / stream-copy / transcode)
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import subprocess
+from typing import List, Optional, Tuple
+
+from config import DOWNLOAD_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class VideoCompat:
+    """
+    التأكد من أن الفيديو mp4 بترميز h264/aac بدون إعادة ترميز غير ضرورية
+
+    المسارات بالترتيب:
+    - skip: الملف mp4 بترميزات متوافقة، لا معالجة إطلاقاً
+    - remux: الترميزات متوافقة والحاوية فقط مختلفة، نسخ المسارات (-c copy)
+    - transcode: إعادة ترميز المسار غير المتوافق فقط (البديل الأخير)
+    """
+
+    TARGET_EXT = '.mp4'
+    COMPATIBLE_VIDEO = ('h264',)
+    COMPATIBLE_AUDIO = ('aac', 'mp3')
+
+    # خيارات إعادة الترميز (سريعة ومناسبة للخوادم الصغيرة)
+    VIDEO_ENCODE_ARGS = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-pix_fmt', 'yuv420p']
+    AUDIO_ENCODE_ARGS = ['-c:a', 'aac', '-b:a', '128k']
+
+    @staticmethod
+    def available() -> bool:
+        """هل ffmpeg و ffprobe مثبتان"""
+        return bool(shutil.which('ffmpeg') and shutil.which('ffprobe'))
+
+    @staticmethod
+    def probe_codecs(filepath: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        قراءة ترميز أول مسار فيديو وأول مسار صوت عبر ffprobe
+
+        Returns:
+            tuple: (ترميز الفيديو، ترميز الصوت) - None للمسار غير الموجود
+        """
+        output = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'stream=codec_type,codec_name',
+             '-of', 'json', filepath],
+            capture_output=True, check=True, timeout=60
+        ).stdout
+        video_codec = audio_codec = None
+        for stream in json.loads(output or b'{}').get('streams', []):
+            if stream.get('codec_type') == 'video' and video_codec is None:
+                video_codec = stream.get('codec_name')
+            elif stream.get('codec_type') == 'audio' and audio_codec is None:
+                audio_codec = stream.get('codec_name')
+        return video_codec, audio_codec
+
+    @staticmethod
+    def plan(ext: str, video_codec: Optional[str], audio_codec: Optional[str]) -> Tuple[str, List[str]]:
+        """
+        تحديد مسار المعالجة وخيارات ffmpeg لكل مسار
+
+        Returns:
+            tuple: (skip/remux/transcode، خيارات الترميز)
+        """
+        video_ok = video_codec is None or video_codec in VideoCompat.COMPATIBLE_VIDEO
+        audio_ok = audio_codec is None or audio_codec in VideoCompat.COMPATIBLE_AUDIO
+
+        if video_ok and audio_ok:
+            if ext.lower() == VideoCompat.TARGET_EXT:
+                return 'skip', []
+            return 'remux', ['-c', 'copy']
+
+        args = ['-c:v', 'copy'] if video_ok else list(VideoCompat.VIDEO_ENCODE_ARGS)
+        args += ['-c:a', 'copy'] if audio_ok else list(VideoCompat.AUDIO_ENCODE_ARGS)
+        return 'transcode', args
+
+    @staticmethod
+    def ensure_compatible(filepath: str) -> str:
+        """
+        تجهيز الفيديو لتليجرام (دالة حاجبة - تُشغَّل على مجمع التنزيل)
+
+        Args:
+            filepath: مسار الفيديو المنزل
+
+        Returns:
+            str: مسار الملف الناتج (قد يختلف الامتداد بعد إعادة التغليف)
+        """
+        if not VideoCompat.available():
+            logger.warning("ffmpeg غير مثبت، إرسال الفيديو بدون معالجة")
+            return filepath
+
+        started = time.perf_counter()
+        base, ext = os.path.splitext(filepath)
+
+        try:
+            video_codec, audio_codec = VideoCompat.probe_codecs(filepath)
+        except (subprocess.SubprocessError, ValueError) as e:
+            logger.warning(f"فشل فحص ترميز الفيديو، إرسال بدون معالجة: {str(e)}")
+            return filepath
+
+        path, codec_args = VideoCompat.plan(ext, video_codec, audio_codec)
+        if path == 'skip':
+            logger.info(
+                f"🎞️ skip ({video_codec}/{audio_codec}) "
+                f"{time.perf_counter() - started:.2f}s: {filepath}"
+            )
+            return filepath
+
+        output = base + VideoCompat.TARGET_EXT
+        temp_output = base + '.compat' + VideoCompat.TARGET_EXT
+        command = ['ffmpeg', '-y', '-v', 'error', '-i', filepath,
+                   '-map', '0:v:0?', '-map', '0:a:0?', *codec_args,
+                   '-movflags', '+faststart', temp_output]
+        try:
+            subprocess.run(command, capture_output=True, check=True, timeout=DOWNLOAD_TIMEOUT)
+        except subprocess.SubprocessError as e:
+            if os.path.exists(temp_output):
+                os.remove(temp_output)
+            logger.error(f"فشل {path} للفيديو: {str(e)}")
+            raise
+
+        os.replace(temp_output, output)
+        if output != filepath and os.path.exists(filepath):
+            os.remove(filepath)
+
+        logger.info(
+            f"🎞️ {path} ({video_codec}/{audio_codec}) "
+            f"{time.perf_counter() - started:.2f}s: {output}"
+        )
+        return output